@@ -5,6 +5,8 @@ import { defaultParameters } from '../types';
 
 // API Configuration
 const API_BASE_URL = import.meta.env.PROD ? 'https://nasaexoplanetdetection-production.up.railway.app' : 'http://localhost:5005';
+// Interval between training job status polls (GET /jobs/<id>)
+const JOB_POLL_INTERVAL_MS = 3000;
 
 interface AppContextType {
   uploadedFile: UploadedFile | null;
@@ -148,7 +150,33 @@ export function AppProvider({ children }: AppProviderProps) {
         throw new Error(errorMsg);
       }
 
-      console.log('Training completed:', trainResult);
+      // Training runs as a background job: poll its status until it finishes
+      console.log('Training queued:', trainResult);
+      let job = trainResult.job;
+      while (!job || job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        const jobResponse = await fetch(`${API_BASE_URL}${trainResult.job_url}`, {
+          headers: {
+            'user-session-id': userSessionId,
+          },
+        });
+        const jobResult = await jobResponse.json();
+        if (!jobResponse.ok || jobResult.status === 'error') {
+          const errorMsg = jobResult.message || 'Training job not found';
+          setError(`Training Error: ${errorMsg}`);
+          throw new Error(errorMsg);
+        }
+        job = jobResult.job;
+        console.log(`Training ${job.status}: ${job.stage ?? ''}`);
+      }
+
+      if (job.status === 'failed') {
+        const errorMsg = job.error || 'Training failed';
+        setError(`Training Error: ${errorMsg}`);
+        throw new Error(errorMsg);
+      }
+
+      console.log('Training completed:', job);
 
       // Call /predict endpoint (no file needed, uses saved CSV) with user-session-id header
       console.log('Starting prediction...');
@@ -1,14 +1,20 @@
 import json
 import os
 import warnings
-from typing import Dict
+from typing import NamedTuple
 
-from data_loading import load_koi_dataset
+from data_loading import load_koi_dataset, InputRows
 from data_splitting import prepare_data_for_training
+from dataset_cache import CACHE_DIR_NAME, dataset_fingerprint
+from early_stopping import EARLY_STOPPING_ROUNDS
+from feature_cache import build_engineered_dataset, feature_cache_key, load_engineered_base
 from feature_extraction import create_advanced_features
+from incremental import incremental_update, save_training_state
+from parallel import run_tasks
 from plotting import analyze_feature_importance
 from prediction import run_prediction
-from preprocessing import clean_koi_dataset
+from preprocessing import KOIPreprocessor, clean_koi_dataset
+from threshold_optimization import SERVED_THRESHOLD_SEARCH, attach_class_thresholds, optimize_class_thresholds
 from training_binary import train_binary_planet_model
 from training_ensemble import train_ensemble_models
 from training_multistep import train_multistep_nn_xgb
@@ -18,19 +24,94 @@ DATASET_PATH = "../dataset/kepler_koi.csv"
 N_SPLITS = 5
 TARGET_COLUMN = "koi_disposition"
 OUTPUT_FOLDER = "../outputs/"
+# Fold-assignment cache; None: the .cache folder next to DATASET_PATH (as the dataset and feature caches)
+CACHE_FOLDER = None
 
 
-def ensemble_pipeline(input_rows: list[Dict] = None, class_weight_penalizing: bool = True, drop_fpflags: bool = True):
-    df_raw = load_koi_dataset(path=DATASET_PATH, input_rows=input_rows, sep=",", target_column=TARGET_COLUMN)
-    df_clean = clean_koi_dataset(df_raw, drop_fpflags=drop_fpflags)
-    df_engineered = create_advanced_features(df_clean)
-    X, y_encoded, groups, cv, df_engineered, le_target = prepare_data_for_training(
+class RunContext(NamedTuple):
+    """
+    Where one pipeline / prediction run reads and writes.
+
+    Passed explicitly instead of reassigning the module settings per request, so concurrent
+    requests (threaded workers, background jobs) never see each other's folders.
+
+    Args:
+        output_folder (str): Folder for models, features.json, preprocessor and training state
+            (with trailing "/").
+        dataset_path (str): Base catalog CSV.
+        cache_folder (str): Fold-assignment cache folder.
+        n_splits (int): CV folds.
+        target_column (str): Label column.
+    """
+    output_folder: str
+    dataset_path: str
+    cache_folder: str
+    n_splits: int = N_SPLITS
+    target_column: str = TARGET_COLUMN
+
+
+def default_context(output_folder: str = None) -> RunContext:
+    """Run context from the module settings, optionally writing to another (e.g. per-session) folder."""
+    return RunContext(
+        output_folder=(output_folder or OUTPUT_FOLDER).rstrip("/") + "/",
+        dataset_path=DATASET_PATH,
+        cache_folder=CACHE_FOLDER or os.path.join(os.path.dirname(os.path.abspath(DATASET_PATH)), CACHE_DIR_NAME),
+        n_splits=N_SPLITS,
+        target_column=TARGET_COLUMN
+    )
+
+
+def load_training_data(input_rows: InputRows = None, drop_fpflags: bool = True, ctx: RunContext = None):
+    """
+    Raw and engineered training frames for the base catalog plus `input_rows`.
+
+    The base catalog is cleaned and engineered once per dataset version (see `feature_cache`);
+    only the appended rows are processed here. The preprocessor fitted on the base catalog is
+    saved for inference.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (df_raw, df_engineered)
+    """
+    ctx = ctx or default_context()
+    df_raw = load_koi_dataset(path=ctx.dataset_path, input_rows=input_rows, sep=",", target_column=ctx.target_column)
+    preprocessor, df_engineered = build_engineered_dataset(ctx.dataset_path, input_rows=input_rows,
+                                                           drop_fpflags=drop_fpflags)
+    preprocessor.save(ctx.output_folder + "preprocessor.pkl")
+    return df_raw, df_engineered
+
+
+def _appended_rows_mask(X, ctx: RunContext, drop_fpflags: bool = True):
+    # Appended rows continue the base catalog's raw index (see `build_engineered_dataset`)
+    preprocessor, _ = load_engineered_base(ctx.dataset_path, drop_fpflags=drop_fpflags, verbose=False)
+    return X.index.to_numpy() >= preprocessor.n_rows_fitted_
+
+
+def _training_data_key(ctx: RunContext, drop_fpflags: bool = True) -> str:
+    return feature_cache_key(dataset_fingerprint(ctx.dataset_path), drop_fpflags)
+
+
+def prepare_training_data(input_rows: InputRows = None, drop_fpflags: bool = True, ctx: RunContext = None):
+    """
+    Load, clean, engineer and split the training data once (shared by every model family).
+
+    Returns:
+        Tuple[pd.DataFrame, np.ndarray, np.ndarray, CachedFoldSplitter, pd.DataFrame, LabelEncoder]:
+            (X, y_encoded, groups, cv, df_engineered, label_encoder), as `prepare_data_for_training`.
+    """
+    ctx = ctx or default_context()
+    df_raw, df_engineered = load_training_data(input_rows=input_rows, drop_fpflags=drop_fpflags, ctx=ctx)
+    return prepare_data_for_training(
         df_engineered=df_engineered,
         df_original=df_raw,
-        target_column=TARGET_COLUMN,
-        n_splits=N_SPLITS,
-        save_columns_path=OUTPUT_FOLDER + "features.json"
+        target_column=ctx.target_column,
+        n_splits=ctx.n_splits,
+        save_columns_path=ctx.output_folder + "features.json",
+        fold_cache_dir=ctx.cache_folder
     )
+
+
+def _train_ensemble(X, y_encoded, groups, cv, le_target, ctx: RunContext, class_weight_penalizing: bool = True,
+                    n_jobs: int = None):
     cv_results, models, trained_models, best_model_metrics_summary = train_ensemble_models(
         X_scaled=X,
         y_encoded=y_encoded,
@@ -38,7 +119,9 @@ def ensemble_pipeline(input_rows: list[Dict] = None, class_weight_penalizing: bo
         cv=cv,
         le_target=le_target,
         class_weight_penalizing=class_weight_penalizing,
-        save_prefix=OUTPUT_FOLDER,
+        save_prefix=ctx.output_folder,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        n_jobs=n_jobs
     )
     top_features = analyze_feature_importance(
         model=trained_models["XGBoost"],
@@ -47,17 +130,6 @@ def ensemble_pipeline(input_rows: list[Dict] = None, class_weight_penalizing: bo
         model_label="XGBoost (Full Data)",
         plot=False
     )
-    # threshold_configs = optimize_class_thresholds(
-    #     y_true=y_encoded,
-    #     y_proba=cv_results['XGBoost']["oof_proba"],
-    #     class_labels=list(le_target.classes_),
-    #     conf_min_recall=0.8,
-    #     cand_range=(0.30, 0.40, 0.02),
-    #     conf_range=(0.45, 0.60, 0.05),
-    #     fp_range=(0.65, 0.75, 0.05),
-    #     save_path=OUTPUT_FOLDER + "threshold_configs.json"
-    # )
-
     # best_model_tuned, best_params, tuning_results = tune_xgboost_hyperparameters(
     #     X_data=X,
     #     y_encoded=y_encoded,
@@ -74,27 +146,31 @@ def ensemble_pipeline(input_rows: list[Dict] = None, class_weight_penalizing: bo
         cv_results=cv_results,
         best_model_name='XGBoost',
         models=models,
-        save_path=OUTPUT_FOLDER + "stacking_model.pkl"
+        save_path=ctx.output_folder + "stacking_model.pkl",
+        trained_models=trained_models
+    )
+    # Thresholds for the served ensemble package (POST /predict, /predict/rows): broadcast search over the
+    # stacking OOF probabilities for macro F1 with bounded accuracy loss; attached only if they beat argmax
+    threshold_configs = optimize_class_thresholds(
+        y_true=y_encoded,
+        y_proba=stacking_results["oof_proba"],
+        class_labels=list(le_target.classes_),
+        save_path=ctx.output_folder + "threshold_configs.json",
+        **SERVED_THRESHOLD_SEARCH
     )
+    attach_class_thresholds(ctx.output_folder + "stacking_model.pkl", threshold_configs)
+    return best_model_metrics_summary
 
 
-def binary_categories_pipeline(input_rows: list[Dict] = None, drop_fpflags: bool = True):
-    df_raw = load_koi_dataset(path=DATASET_PATH, input_rows=input_rows, sep=",", target_column=TARGET_COLUMN)
-    df_clean = clean_koi_dataset(df_raw, drop_fpflags=drop_fpflags)
-    df_engineered = create_advanced_features(df_clean)
-    X, y_encoded, groups, cv, df_engineered, le_target = prepare_data_for_training(
-        df_engineered=df_engineered,
-        df_original=df_raw,
-        target_column=TARGET_COLUMN,
-        n_splits=N_SPLITS,
-        save_columns_path=OUTPUT_FOLDER + "features.json"
-    )
-    cv_results, models, trained_models, best_model_metrics_summary, le_target = train_binary_planet_model(
+def _train_binary(X, groups, cv, df_engineered, ctx: RunContext, n_jobs: int = None):
+    cv_results, models, trained_models, best_model_metrics_summary, le_binary = train_binary_planet_model(
         df_engineered=df_engineered,
         groups=groups,
         cv=cv,
-        target_column=TARGET_COLUMN,
-        save_path=OUTPUT_FOLDER + "binary_categories_model.pkl"
+        target_column=ctx.target_column,
+        save_path=ctx.output_folder + "binary_categories_model.pkl",
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        n_jobs=n_jobs
     )
     top_features = analyze_feature_importance(
         model=trained_models["XGBoost"],
@@ -103,29 +179,20 @@ def binary_categories_pipeline(input_rows: list[Dict] = None, drop_fpflags: bool
         model_label="XGBoost (Full Data)",
         plot=False
     )
+    return best_model_metrics_summary
 
 
-def multistep_pipeline(input_rows: list[Dict] = None, drop_fpflags: bool = True):
-    df_raw = load_koi_dataset(path=DATASET_PATH, input_rows=input_rows, sep=",", target_column=TARGET_COLUMN)
-    df_clean = clean_koi_dataset(df_raw, drop_fpflags=drop_fpflags)
-    df_engineered = create_advanced_features(df_clean)
-    X, y_encoded, groups, cv, df_engineered, le_target = prepare_data_for_training(
-        df_engineered=df_engineered,
-        df_original=df_raw,
-        target_column=TARGET_COLUMN,
-        n_splits=N_SPLITS,
-        save_columns_path=OUTPUT_FOLDER + "features.json"
-    )
-
+def _train_multistep(X, y_encoded, groups, cv, le_target, ctx: RunContext, n_jobs: int = None):
     cv_results, models, trained_models, best_model_metrics_summary = train_multistep_nn_xgb(
         X_data=X,
         y_encoded=y_encoded,
         groups=groups,
         cv=cv,
         le_target=le_target,
-        save_prefix=OUTPUT_FOLDER + "multistep_nn_xgb"
+        save_prefix=ctx.output_folder + "multistep_nn_xgb",
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        n_jobs=n_jobs
     )
-
     top_features = analyze_feature_importance(
         model=trained_models["Stage2_XGB"],
         X_scaled=X,
@@ -133,17 +200,118 @@ def multistep_pipeline(input_rows: list[Dict] = None, drop_fpflags: bool = True)
         model_label="XGBoost (Full Data)",
         plot=False
     )
+    return best_model_metrics_summary
+
+
+def _train_family(family: str, X, y_encoded, groups, cv, df_engineered, le_target, ctx: RunContext,
+                  class_weight_penalizing: bool = True, n_threads: int = 1):
+    # Task of `all_pipeline`: runs in a worker process, so the run context is passed explicitly
+    if family == "ensemble":
+        return _train_ensemble(X, y_encoded, groups, cv, le_target, ctx,
+                               class_weight_penalizing=class_weight_penalizing, n_jobs=n_threads)
+    if family == "binary_categories":
+        return _train_binary(X, groups, cv, df_engineered, ctx, n_jobs=n_threads)
+    return _train_multistep(X, y_encoded, groups, cv, le_target, ctx, n_jobs=n_threads)
+
+
+def ensemble_pipeline(input_rows: InputRows = None, class_weight_penalizing: bool = True, drop_fpflags: bool = True,
+                      incremental: bool = False, ctx: RunContext = None):
+    ctx = ctx or default_context()
+    X, y_encoded, groups, cv, df_engineered, le_target = prepare_training_data(input_rows, drop_fpflags, ctx)
+    # Warm-start the session's existing models on the appended rows unless a full retrain is due
+    if incremental and incremental_update("ensemble", ctx.output_folder, X, y_encoded, le_target,
+                                          new_mask=_appended_rows_mask(X, ctx, drop_fpflags),
+                                          dataset_key=_training_data_key(ctx, drop_fpflags),
+                                          class_weight_penalizing=class_weight_penalizing,
+                                          groups=groups, cv=cv):
+        return
+    _train_ensemble(X, y_encoded, groups, cv, le_target, ctx, class_weight_penalizing=class_weight_penalizing)
+    save_training_state(ctx.output_folder, "ensemble", X, le_target, _training_data_key(ctx, drop_fpflags),
+                        class_weight_penalizing=class_weight_penalizing)
 
 
-def predict(dataset_path: str | None, input_rows: list[Dict], model_path: str, drop_fpflags: bool = True):
-    df_raw = load_koi_dataset(path=dataset_path, input_rows=input_rows, sep=",",
-                              target_column=TARGET_COLUMN, verbose=False)
-    df_clean = clean_koi_dataset(df_raw, drop_fpflags=drop_fpflags)
-    df_engineered = create_advanced_features(df_clean)
+def binary_categories_pipeline(input_rows: InputRows = None, drop_fpflags: bool = True, incremental: bool = False,
+                               ctx: RunContext = None):
+    ctx = ctx or default_context()
+    X, y_encoded, groups, cv, df_engineered, le_target = prepare_training_data(input_rows, drop_fpflags, ctx)
+    if incremental and incremental_update("binary_categories", ctx.output_folder, X, y_encoded, le_target,
+                                          new_mask=_appended_rows_mask(X, ctx, drop_fpflags),
+                                          dataset_key=_training_data_key(ctx, drop_fpflags)):
+        return
+    _train_binary(X, groups, cv, df_engineered, ctx)
+    save_training_state(ctx.output_folder, "binary_categories", X, le_target, _training_data_key(ctx, drop_fpflags))
 
-    # Load the expected feature list from training
-    with open(OUTPUT_FOLDER + "features.json", "r") as f:
+
+def multistep_pipeline(input_rows: InputRows = None, drop_fpflags: bool = True, incremental: bool = False,
+                       ctx: RunContext = None):
+    ctx = ctx or default_context()
+    X, y_encoded, groups, cv, df_engineered, le_target = prepare_training_data(input_rows, drop_fpflags, ctx)
+    if incremental and incremental_update("multistep", ctx.output_folder, X, y_encoded, le_target,
+                                          new_mask=_appended_rows_mask(X, ctx, drop_fpflags),
+                                          dataset_key=_training_data_key(ctx, drop_fpflags)):
+        return
+    _train_multistep(X, y_encoded, groups, cv, le_target, ctx)
+    save_training_state(ctx.output_folder, "multistep", X, le_target, _training_data_key(ctx, drop_fpflags))
+
+
+def all_pipeline(input_rows: InputRows = None, class_weight_penalizing: bool = True, drop_fpflags: bool = True,
+                 incremental: bool = False, n_jobs: int = None, ctx: RunContext = None):
+    """
+    Train the ensemble (+ stacking), binary and multi-step models from one data preparation.
+
+    Loading, cleaning, feature engineering, label encoding and fold assignment happen once;
+    the three families then train as concurrent tasks, sharing the available cores (see `run_tasks`).
+    The ensemble task gets the largest share of work, so it is scheduled first.
+    """
+    ctx = ctx or default_context()
+    X, y_encoded, groups, cv, df_engineered, le_target = prepare_training_data(input_rows, drop_fpflags, ctx)
+    if incremental and incremental_update("all", ctx.output_folder, X, y_encoded, le_target,
+                                          new_mask=_appended_rows_mask(X, ctx, drop_fpflags),
+                                          dataset_key=_training_data_key(ctx, drop_fpflags),
+                                          class_weight_penalizing=class_weight_penalizing,
+                                          groups=groups, cv=cv):
+        return
+
+    families = ["ensemble", "binary_categories", "multistep"]
+    summaries = run_tasks(
+        _train_family,
+        [(family, X, y_encoded, groups, cv, df_engineered, le_target, ctx, class_weight_penalizing)
+         for family in families],
+        n_jobs=n_jobs
+    )
+    save_training_state(ctx.output_folder, "all", X, le_target, _training_data_key(ctx, drop_fpflags),
+                        class_weight_penalizing=class_weight_penalizing)
+
+    print("\n" + "=" * 60)
+    print("ALL MODEL FAMILIES")
+    print("=" * 60)
+    for family, summary in zip(families, summaries):
+        metrics = ", ".join(f"{k}={summary[k]:.4f}" for k in ("accuracy", "macro_f1", "planet_recall") if k in summary)
+        print(f"  {family:18s}: {metrics}")
+    return dict(zip(families, summaries))
+
+
+def predict(dataset_path: str | None, input_rows: InputRows, model_path: str, drop_fpflags: bool = True,
+            ctx: RunContext = None):
+    ctx = ctx or default_context()
+    preprocessor_path = ctx.output_folder + "preprocessor.pkl"
+    if os.path.exists(preprocessor_path):
+        # Fitted at training time: only the rows being scored are loaded and cleaned
+        preprocessor = KOIPreprocessor.load(preprocessor_path)
+        df_raw = load_koi_dataset(path=None if input_rows is not None else dataset_path, input_rows=input_rows,
+                                  sep=",", target_column=ctx.target_column, verbose=False)
+        df_clean = preprocessor.transform(df_raw)
+    else:
+        # Models trained before the preprocessor was persisted: medians come from dataset_path + input rows
+        df_raw = load_koi_dataset(path=dataset_path, input_rows=input_rows, sep=",",
+                                  target_column=ctx.target_column, verbose=False)
+        df_clean = clean_koi_dataset(df_raw, drop_fpflags=drop_fpflags)
+
+    # Load the expected feature list from training: only those engineered features are computed
+    with open(ctx.output_folder + "features.json", "r") as f:
         expected_features = json.load(f)
+    df_engineered = create_advanced_features(df_clean, features=expected_features)
+
     # Align columns (important!)
     missing_cols = [c for c in expected_features if c not in df_engineered.columns]
     extra_cols = [c for c in df_engineered.columns if c not in expected_features]
@@ -159,7 +327,7 @@ def predict(dataset_path: str | None, input_rows: list[Dict], model_path: str, d
     results = run_prediction(
         model_path=model_path,
         df_engineered=df_engineered,
-        target_column=TARGET_COLUMN
+        target_column=ctx.target_column
     )
 
     print("\nReturned results:")
@@ -172,7 +340,9 @@ def predict(dataset_path: str | None, input_rows: list[Dict], model_path: str, d
 
 
 # input_row always needs to be trained by appending to existing data,
-#  otherwise not enough data for cross validation
+#  otherwise not enough data for cross validation.
+#  With incremental=True a session's existing models are warm-started on the appended rows instead
+#  (full retrain when drift or row-count thresholds are crossed, see incremental.py)
 
 if __name__ == "__main__":
     warnings.filterwarnings("ignore", category=RuntimeWarning)
@@ -0,0 +1,382 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Tuple
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from catboost import CatBoostClassifier, Pool
+from lightgbm import LGBMClassifier
+from sklearn.preprocessing import LabelEncoder
+from xgboost import XGBClassifier
+
+from early_stopping import fit_with_early_stopping
+
+# Per-process caches of the shared training containers, one training matrix at a time:
+# dataset token -> quantized CatBoost Pool / XGBoost QuantileDMatrix / binned LightGBM Dataset.
+# None of them can be pickled, so each worker process builds its own copy once and reuses it
+# (LightGBM: loads the binary cache written by the first process instead of binning again).
+_POOL_CACHE: Dict[str, Pool] = {}
+_QDM_CACHE: Dict[str, xgb.QuantileDMatrix] = {}
+_LGB_CACHE: Dict[str, lgb.Dataset] = {}
+_LOCK = threading.Lock()
+
+# Binned LightGBM datasets shared by the worker processes of one training run
+LGB_BINARY_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ml_booster_data")
+
+
+def dataset_token(X: pd.DataFrame, y: np.ndarray) -> str:
+    """
+    Content hash identifying a training matrix (features, column names and labels).
+
+    Args:
+        X (pd.DataFrame): Feature matrix.
+        y (np.ndarray): Labels.
+
+    Returns:
+        str: Hex digest used as cache key by worker processes.
+    """
+    digest = hashlib.sha256()
+    digest.update("|".join(map(str, X.columns)).encode())
+    digest.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tobytes())
+    digest.update(np.asarray(y).astype(np.int64).tobytes())
+    return digest.hexdigest()[:24]
+
+
+def _cached(cache: Dict, key: str, build):
+    with _LOCK:
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.clear()  # one training matrix at a time
+            cache[key] = data
+        return data
+
+
+def uses_shared_data(model) -> bool:
+    """True for the boosters trained on shared containers by `fit_on_shared_data`."""
+    return isinstance(model, (CatBoostClassifier, XGBClassifier, LGBMClassifier))
+
+
+# ==========================================================
+# CatBoost: quantized Pool, sliced per fold
+# ==========================================================
+def quantized_pool(X: pd.DataFrame, y: np.ndarray, token: str) -> Pool:
+    """
+    CatBoost Pool of the full training matrix, quantized once and cached for this process.
+
+    Feature borders are computed on the full matrix (features only, no labels), so every
+    fold reuses the same bins instead of re-quantizing its own subset.
+
+    Args:
+        X (pd.DataFrame): Feature matrix.
+        y (np.ndarray): Labels.
+        token (str): `dataset_token(X, y)`.
+
+    Returns:
+        Pool: Quantized pool (shared; take row subsets with `fold_pools`).
+    """
+    def build():
+        pool = Pool(X, label=y)
+        pool.quantize()
+        return pool
+    return _cached(_POOL_CACHE, token, build)
+
+
+def fold_pools(
+        pool: Pool,
+        train_idx: np.ndarray,
+        val_idx: np.ndarray,
+        sample_weight: np.ndarray = None
+) -> Tuple[Pool, Pool]:
+    """
+    Row subsets of a quantized pool for one CV fold (no re-quantization).
+
+    Args:
+        pool (Pool): Output of `quantized_pool`.
+        train_idx (np.ndarray): Training rows.
+        val_idx (np.ndarray): Validation rows.
+        sample_weight (np.ndarray, optional): Per-row weights of the full matrix; applied to the
+            training subset only.
+
+    Returns:
+        Tuple[Pool, Pool]: (train_pool, val_pool)
+    """
+    train_pool = pool.slice(train_idx)
+    if sample_weight is not None:
+        train_pool.set_weight(sample_weight[train_idx])
+    return train_pool, pool.slice(val_idx)
+
+
+# ==========================================================
+# XGBoost: QuantileDMatrix cuts computed once, reused per fold
+# ==========================================================
+def quantile_dmatrix(X: pd.DataFrame, y: np.ndarray, token: str, max_bin: int = 256) -> xgb.QuantileDMatrix:
+    """
+    XGBoost QuantileDMatrix of the full training matrix, sketched once and cached for this process.
+
+    A QuantileDMatrix cannot be sliced; the folds instead build theirs with this one as `ref`,
+    which reuses its quantile cuts (features only, no labels) and skips the sketching pass.
+
+    Args:
+        X (pd.DataFrame): Feature matrix.
+        y (np.ndarray): Labels.
+        token (str): `dataset_token(X, y)`.
+        max_bin (int, optional): Histogram bins per feature (the model's `max_bin`). Defaults to 256.
+
+    Returns:
+        xgb.QuantileDMatrix: Full-matrix container (shared; fold containers via `fold_dmatrices`).
+    """
+    return _cached(_QDM_CACHE, f"{token}_{max_bin}", lambda: xgb.QuantileDMatrix(X, label=y, max_bin=max_bin))
+
+
+def fold_dmatrices(
+        ref: xgb.QuantileDMatrix,
+        X: pd.DataFrame,
+        y: np.ndarray,
+        train_idx: np.ndarray,
+        val_idx: np.ndarray,
+        sample_weight: np.ndarray = None
+) -> Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]:
+    """
+    Training / validation QuantileDMatrix of one CV fold, binned with the cuts of `ref`.
+
+    Args:
+        ref (xgb.QuantileDMatrix): Output of `quantile_dmatrix`.
+        X (pd.DataFrame): Full feature matrix.
+        y (np.ndarray): Full labels.
+        train_idx (np.ndarray): Training rows.
+        val_idx (np.ndarray): Validation rows.
+        sample_weight (np.ndarray, optional): Per-row weights of the full matrix; applied to the
+            training rows only.
+
+    Returns:
+        Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]: (dtrain, dval)
+    """
+    weight = sample_weight[train_idx] if sample_weight is not None else None
+    dtrain = xgb.QuantileDMatrix(X.iloc[train_idx], label=y[train_idx], weight=weight, ref=ref)
+    # xgb.train expects evaluation matrices to reference the training one (same cuts either way)
+    return dtrain, xgb.QuantileDMatrix(X.iloc[val_idx], label=y[val_idx], ref=dtrain)
+
+
+def fit_xgboost(
+        model: XGBClassifier,
+        dtrain: xgb.DMatrix,
+        dval: xgb.DMatrix = None,
+        early_stopping_rounds: int = None
+) -> int | None:
+    """
+    Train an XGBClassifier's booster with `xgb.train` on prebuilt containers.
+
+    Uses the parameters `XGBClassifier.fit` would pass, then loads the booster into `model`,
+    which afterwards behaves as if fitted by the wrapper (predictions at the best iteration).
+
+    Args:
+        model (XGBClassifier): Unfitted classifier (fitted in place).
+        dtrain (xgb.DMatrix): Training container (labels and weights inside).
+        dval (xgb.DMatrix, optional): Validation container, watched for early stopping.
+        early_stopping_rounds (int, optional): Early stopping patience on `dval`.
+
+    Returns:
+        int | None: Rounds up to and including the best iteration (early stopping), else None.
+    """
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+    n_classes = len(np.unique(dtrain.get_label()))
+    if n_classes > 2:
+        params["objective"] = "multi:softprob"
+        params["num_class"] = n_classes
+    early_stop = bool(early_stopping_rounds) and dval is not None
+    booster = xgb.train(params, dtrain, model.get_num_boosting_rounds(),
+                        evals=[(dval, "validation_0")] if early_stop else (),
+                        early_stopping_rounds=early_stopping_rounds if early_stop else None,
+                        verbose_eval=False)
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return int(booster.best_iteration) + 1 if early_stop else None
+
+
+# ==========================================================
+# LightGBM: Dataset binned once (binary cache), subset per fold
+# ==========================================================
+def _lgbm_params(model: LGBMClassifier, n_classes: int) -> Dict:
+    # The training parameters LGBMClassifier.fit derives from the estimator (objective,
+    # num_class, metric, num_threads), so native training matches a wrapper fit
+    model._n_classes = n_classes
+    model._objective = model.objective
+    return model._process_params(stage="fit")
+
+
+def lgbm_dataset(X: pd.DataFrame, y: np.ndarray, token: str, params: Dict) -> lgb.Dataset:
+    """
+    Constructed LightGBM Dataset of the full training matrix, binned once and cached for this process.
+
+    The first process to bin it writes a binary cache (`save_binary`) that the other worker
+    processes of the run load instead of binning again; `clear_lgbm_binary_cache` removes it.
+    The bins depend on the training parameters (max_bin, min_data_in_leaf, ...), which are part
+    of the key.
+
+    Args:
+        X (pd.DataFrame): Feature matrix.
+        y (np.ndarray): Labels.
+        token (str): `dataset_token(X, y)`.
+        params (Dict): LightGBM training parameters (see `fit_lightgbm`).
+
+    Returns:
+        lgb.Dataset: Full-matrix dataset (shared; take fold subsets with `fold_lgbm_datasets`).
+    """
+    dataset_params = {k: v for k, v in params.items() if k not in ("num_threads", "metric")}
+    key = f"{token}_{hashlib.sha256(json.dumps(dataset_params, sort_keys=True, default=str).encode()).hexdigest()[:8]}"
+    path = os.path.join(LGB_BINARY_CACHE_DIR, f"lgb_{key}.bin")
+
+    def build():
+        if os.path.exists(path):
+            try:
+                return lgb.Dataset(path, params=dict(params)).construct()
+            except lgb.basic.LightGBMError:
+                pass  # partial / foreign file: bin again below
+        dataset = lgb.Dataset(X, label=y, params=dict(params), free_raw_data=False).construct()
+        try:
+            os.makedirs(LGB_BINARY_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            dataset.save_binary(tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, lgb.basic.LightGBMError) as e:
+            print(f"⚠️ Could not write LightGBM binary cache ({e}); continuing without it.")
+        return dataset
+    return _cached(_LGB_CACHE, key, build)
+
+
+def fold_lgbm_datasets(
+        dataset: lgb.Dataset,
+        train_idx: np.ndarray,
+        val_idx: np.ndarray,
+        sample_weight: np.ndarray = None
+) -> Tuple[lgb.Dataset, lgb.Dataset]:
+    """
+    Row subsets of a binned LightGBM Dataset for one CV fold (bins reused, no re-binning).
+
+    Args:
+        dataset (lgb.Dataset): Output of `lgbm_dataset`.
+        train_idx (np.ndarray): Training rows.
+        val_idx (np.ndarray): Validation rows.
+        sample_weight (np.ndarray, optional): Per-row weights of the full matrix; applied to the
+            training subset only.
+
+    Returns:
+        Tuple[lgb.Dataset, lgb.Dataset]: (train_set, valid_set)
+    """
+    # Subsets keep their rows in sorted order
+    train_set = dataset.subset(np.sort(train_idx)).construct()
+    if sample_weight is not None:
+        train_set.set_weight(sample_weight[np.sort(train_idx)])
+    return train_set, dataset.subset(np.sort(val_idx)).construct()
+
+
+def fit_lightgbm(
+        model: LGBMClassifier,
+        params: Dict,
+        train_set: lgb.Dataset,
+        valid_set: lgb.Dataset = None,
+        early_stopping_rounds: int = None
+) -> int | None:
+    """
+    Train an LGBMClassifier's booster with `lgb.train` on prebuilt datasets.
+
+    The booster and the fitted state `LGBMClassifier.fit` records (classes, objective, feature
+    count, best iteration) are set on `model`, which afterwards behaves as if fitted by the wrapper.
+
+    Args:
+        model (LGBMClassifier): Unfitted classifier (fitted in place).
+        params (Dict): Training parameters from `_lgbm_params(model, n_classes)`.
+        train_set (lgb.Dataset): Training dataset (labels encoded 0..n_classes-1).
+        valid_set (lgb.Dataset, optional): Validation dataset, watched for early stopping.
+        early_stopping_rounds (int, optional): Early stopping patience on `valid_set`.
+
+    Returns:
+        int | None: Rounds up to and including the best iteration (early stopping), else None.
+    """
+    early_stop = bool(early_stopping_rounds) and valid_set is not None
+    booster = lgb.train(params, train_set, num_boost_round=model.n_estimators,
+                        valid_sets=[valid_set] if early_stop else None,
+                        valid_names=["valid_0"] if early_stop else None,
+                        callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)] if early_stop else None)
+
+    model._le = LabelEncoder().fit(np.arange(model._n_classes))
+    model._class_map = {c: c for c in range(model._n_classes)}
+    model._classes = model._le.classes_
+    model._n_features = model._n_features_in = booster.num_feature()
+    model._Booster = booster
+    model._evals_result = {}
+    model._best_iteration = booster.best_iteration
+    model._best_score = booster.best_score
+    model.fitted_ = True
+    return int(booster.best_iteration or model.n_estimators) if early_stop else None
+
+
+def clear_lgbm_binary_cache(token: str) -> None:
+    """Remove the LightGBM binary caches of a training matrix once its run is over."""
+    for path in glob.glob(os.path.join(LGB_BINARY_CACHE_DIR, f"lgb_{token}_*.bin")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ==========================================================
+# Fold / refit entry point
+# ==========================================================
+def fit_on_shared_data(
+        model,
+        X: pd.DataFrame,
+        y: np.ndarray,
+        token: str,
+        train_idx: np.ndarray = None,
+        val_idx: np.ndarray = None,
+        sample_weight: np.ndarray = None,
+        early_stopping_rounds: int = None
+) -> int | None:
+    """
+    Fit a CatBoost / XGBoost / LightGBM classifier on row subsets of the shared container of (X, y).
+
+    Args:
+        model: Unfitted booster (`uses_shared_data`), fitted in place.
+        X (pd.DataFrame): Full feature matrix.
+        y (np.ndarray): Full encoded labels.
+        token (str): `dataset_token(X, y)`.
+        train_idx (np.ndarray, optional): Training rows of a CV fold; None fits on all rows.
+        val_idx (np.ndarray, optional): Validation rows of the fold (early stopping set).
+        sample_weight (np.ndarray, optional): Per-row weights of the full matrix (fold training rows only).
+        early_stopping_rounds (int, optional): Early stopping patience on the validation rows.
+
+    Returns:
+        int | None: Rounds up to and including the best iteration (early stopping), else None.
+    """
+    fold = train_idx is not None
+    if isinstance(model, CatBoostClassifier):
+        pool = quantized_pool(X, y, token)
+        if not fold:
+            model.fit(pool)
+            return None
+        train_pool, val_pool = fold_pools(pool, train_idx, val_idx, sample_weight)
+        if early_stopping_rounds:
+            return fit_with_early_stopping(model, train_pool, None, val_pool, None, rounds=early_stopping_rounds)
+        model.fit(train_pool)
+        return None
+
+    if isinstance(model, XGBClassifier):
+        ref = quantile_dmatrix(X, y, token, max_bin=model.get_params()["max_bin"] or 256)
+        if not fold:
+            return fit_xgboost(model, ref)
+        dtrain, dval = fold_dmatrices(ref, X, y, train_idx, val_idx, sample_weight)
+        return fit_xgboost(model, dtrain, dval, early_stopping_rounds)
+
+    params = _lgbm_params(model, n_classes=len(np.unique(y)))
+    dataset = lgbm_dataset(X, y, token, params)
+    if not fold:
+        return fit_lightgbm(model, params, dataset)
+    train_set, valid_set = fold_lgbm_datasets(dataset, train_idx, val_idx, sample_weight)
+    return fit_lightgbm(model, params, train_set, valid_set, early_stopping_rounds)
@@ -1,11 +1,36 @@
-from typing import Dict
+from typing import Dict, Union
 
 import pandas as pd
 
+from dataset_cache import load_base_dataset
+
+# Rows to append: a DataFrame / Arrow table (CSV uploads) or a list of dicts (JSON callers)
+InputRows = Union[pd.DataFrame, list[Dict], "pyarrow.Table"]
+
+
+def rows_to_frame(input_rows: InputRows | None) -> pd.DataFrame | None:
+    """
+    Normalize appended input rows to a DataFrame without per-row materialization.
+
+    Args:
+        input_rows (InputRows): DataFrame (used as is), Arrow table/record batch
+            (converted column-wise) or list of dicts.
+
+    Returns:
+        pd.DataFrame | None: The rows as a DataFrame, or None if nothing was given.
+    """
+    if input_rows is None:
+        return None
+    if isinstance(input_rows, pd.DataFrame):
+        return input_rows
+    if hasattr(input_rows, "to_pandas"):  # pyarrow.Table / RecordBatch
+        return input_rows.to_pandas()
+    return pd.DataFrame(input_rows)
+
 
 def load_koi_dataset(
         path: str = None,
-        input_rows: list[Dict] = None,
+        input_rows: InputRows = None,
         sep: str = ",",
         target_column: str = "koi_disposition",
         verbose: bool = True
@@ -14,7 +39,8 @@ def load_koi_dataset(
     Load the Kepler KOI dataset and print dataset diagnostics.
 
     Args:
-        path (str): Path to the CSV file containing the dataset.
+        path (str): Path to the CSV file containing the dataset (read through `dataset_cache`).
+        input_rows (InputRows): Extra rows to append (DataFrame, Arrow table or list of dicts).
         sep (str): Field delimiter in the file. Defaults to ",".
         target_column (str): category
         verbose (bool): Prints logs or not. Defaults to True.
@@ -34,10 +60,14 @@ def load_koi_dataset(
         print("DATA LOADING")
         print("=" * 60)
 
-    if not path and not input_rows:
+    df_new = rows_to_frame(input_rows)
+    if df_new is not None and df_new.empty:
+        df_new = None
+    if not path and df_new is None:
         raise ValueError("Either path or input_rows should be provided.")
 
-    df = pd.read_csv(path, sep=sep) if path else pd.DataFrame()
+    # Base catalog is parsed once per dataset version and then served from the columnar/memory cache
+    df = load_base_dataset(path, sep=sep, verbose=verbose) if path else pd.DataFrame()
 
     # Basic info
     if path and verbose:
@@ -45,11 +75,10 @@ def load_koi_dataset(
         print(f"📦 Shape: {df.shape[0]:,} rows × {df.shape[1]:,} columns")
         # 9,566 rows × 50 columns
 
-    if input_rows:
-        df_new = pd.DataFrame(input_rows)
-        df = pd.concat([df, df_new], ignore_index=True)
+    if df_new is not None:
+        df = pd.concat([df, df_new], ignore_index=True) if path else df_new.reset_index(drop=True)
 
-        if input_rows and verbose:
+        if verbose:
             print(f"✅ Appended {len(df_new)} new rows to raw dataset before cleaning.")
 
     # Optional: only print column names if small enough
@@ -1,19 +1,121 @@
+import hashlib
 import json
-from typing import Tuple
+import os
+import threading
+from typing import Dict, Iterator, Tuple
 
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import StratifiedGroupKFold
 from sklearn.preprocessing import LabelEncoder
 
+# Process-wide fold cache: split key -> fold id per row
+_FOLD_CACHE: Dict[str, np.ndarray] = {}
+_FOLD_LOCK = threading.Lock()
+
+
+class CachedFoldSplitter:
+    """
+    StratifiedGroupKFold whose fold assignment is computed once per (labels, groups, n_splits, seed).
+
+    The assignment is stored as one compact fold id per row (int8), kept in process memory
+    and, if `cache_dir` is given, persisted as `.npy`. Every trainer calls `split` with its own
+    label subset (full target, binary subset, planet-only subset...); each subset gets its own
+    key, so repeated calls (one per model, OOF passes, sklearn's `cross_validate`) reuse it.
+    Splits are identical to `StratifiedGroupKFold(...).split`.
+
+    Args:
+        n_splits (int, optional): Number of folds. Defaults to 5.
+        shuffle (bool, optional): Shuffle groups before splitting. Defaults to True.
+        random_state (int, optional): Seed. Defaults to 42.
+        cache_dir (str, optional): Directory for persisted fold ids. Defaults to memory only.
+    """
+
+    def __init__(self, n_splits: int = 5, shuffle: bool = True, random_state: int = 42, cache_dir: str = None):
+        self.n_splits = n_splits
+        self.shuffle = shuffle
+        self.random_state = random_state
+        self.cache_dir = cache_dir
+
+    def _splitter(self) -> StratifiedGroupKFold:
+        return StratifiedGroupKFold(n_splits=self.n_splits, shuffle=self.shuffle, random_state=self.random_state)
+
+    def _key(self, y: np.ndarray, groups: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{self.n_splits}|{self.shuffle}|{self.random_state}|{len(y)}".encode())
+        digest.update(np.unique(y, return_inverse=True)[1].astype(np.int64).tobytes())
+        digest.update(np.asarray(groups).astype(np.int64).tobytes())
+        return digest.hexdigest()[:24]
+
+    def fold_ids(self, y, groups) -> np.ndarray:
+        """
+        Fold id (0..n_splits-1) of every row when it is in the validation set.
+
+        Args:
+            y: Labels of the rows being split.
+            groups: Group id (kepid) of every row.
+
+        Returns:
+            np.ndarray: int8 array of length len(y) (read-only, shared).
+        """
+        y = np.asarray(y)
+        key = self._key(y, groups)
+        with _FOLD_LOCK:
+            fold_ids = _FOLD_CACHE.get(key)
+            if fold_ids is not None:
+                return fold_ids
+
+            path = os.path.join(self.cache_dir, f"folds_{key}.npy") if self.cache_dir else None
+            if path and os.path.exists(path):
+                try:
+                    fold_ids = np.load(path)
+                except (OSError, ValueError):
+                    fold_ids = None
+                if fold_ids is not None and len(fold_ids) != len(y):
+                    fold_ids = None
+
+            if fold_ids is None:
+                fold_ids = np.empty(len(y), dtype=np.int8)
+                for fold, (_, val_idx) in enumerate(self._splitter().split(np.empty(len(y)), y, groups=groups)):
+                    fold_ids[val_idx] = fold
+                if path:
+                    try:
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                        tmp_path = path + f".{os.getpid()}.tmp.npy"
+                        np.save(tmp_path, fold_ids)
+                        os.replace(tmp_path, path)
+                    except OSError as e:
+                        print(f"⚠️ Could not persist fold assignment ({e}); keeping it in memory only.")
+
+            fold_ids.setflags(write=False)
+            _FOLD_CACHE[key] = fold_ids
+            return fold_ids
+
+    def split(self, X=None, y=None, groups=None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (train_idx, val_idx) per fold, like `StratifiedGroupKFold.split`."""
+        if y is None or groups is None:
+            raise ValueError("CachedFoldSplitter.split requires both y and groups.")
+        fold_ids = self.fold_ids(y, groups)
+        for fold in range(self.n_splits):
+            is_val = fold_ids == fold
+            yield np.flatnonzero(~is_val), np.flatnonzero(is_val)
+
+    def get_n_splits(self, X=None, y=None, groups=None) -> int:
+        return self.n_splits
+
+    def __repr__(self) -> str:
+        return (f"CachedFoldSplitter(n_splits={self.n_splits}, shuffle={self.shuffle}, "
+                f"random_state={self.random_state})")
+
 
 def prepare_data_for_training(
         df_engineered: pd.DataFrame,
         df_original: pd.DataFrame,
         target_column: str = "koi_disposition",
         n_splits: int = 5,
-        save_columns_path: str = "features.json"
-) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, StratifiedGroupKFold, pd.DataFrame, LabelEncoder]:
+        save_columns_path: str = "features.json",
+        fold_cache_dir: str = None
+) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, CachedFoldSplitter, pd.DataFrame, LabelEncoder]:
     """
     Split engineered KOI dataset into features, target, and groups for cross-validation.
     Also encodes target labels and ensures matching row alignment with original dataset.
@@ -29,9 +131,11 @@ def prepare_data_for_training(
             Number of CV splits for StratifiedGroupKFold. Defaults to 5.
         save_columns_path (str, optional):
             Path to save JSON list of feature column names.
+        fold_cache_dir (str, optional):
+            Directory where fold assignments are persisted. Defaults to memory only.
 
     Returns:
-        Tuple[pd.DataFrame, np.ndarray, np.ndarray, StratifiedGroupKFold, pd.DataFrame, LabelEncoder]:
+        Tuple[pd.DataFrame, np.ndarray, np.ndarray, CachedFoldSplitter, pd.DataFrame, LabelEncoder]:
             (X, y_encoded, groups, cv, df_engineered, label_encoder)
     """
 
@@ -91,7 +195,8 @@ def prepare_data_for_training(
     print(f"  Avg KOIs per star: {len(X) / unique_stars:.2f}")
     print("  → Ensures all planets from the same star remain in one fold.")
 
-    cv = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    # Fold assignment is computed once per label subset and shared by all trainers
+    cv = CachedFoldSplitter(n_splits=n_splits, shuffle=True, random_state=42, cache_dir=fold_cache_dir)
 
     # 5. Save feature column list for inference
     train_columns = X.columns.tolist()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Tuple
+
+import pandas as pd
+
+CACHE_DIR_NAME = ".cache"
+SCHEMA_VERSION = 1
+
+# Process-wide cache: absolute CSV path -> {"mtime_ns", "size", "sha256", "df"}
+_MEMORY_CACHE: Dict[str, Dict] = {}
+_LOCK = threading.Lock()
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 content hash of a file without loading it fully into memory.
+
+    Args:
+        path (str): File to hash.
+        chunk_size (int, optional): Read block size in bytes. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(path: str, cache_dir: str | None) -> Tuple[str, str]:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}.parquet"), os.path.join(cache_dir, f"{stem}.meta.json")
+
+
+def _read_meta(meta_path: str) -> Dict | None:
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _schema_of(df: pd.DataFrame) -> Dict[str, str]:
+    return {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def _read_columnar(parquet_path: str, meta: Dict) -> pd.DataFrame | None:
+    """Read the columnar copy and check it still matches the recorded schema."""
+    try:
+        df = pd.read_parquet(parquet_path)
+    except (ImportError, OSError, ValueError):
+        return None
+    if _schema_of(df) != meta.get("schema"):
+        return None
+    # Parquet returns None for missing strings; keep NaN like pd.read_csv does
+    obj_cols = df.select_dtypes(include=["object"]).columns
+    for col in obj_cols:
+        df[col] = df[col].where(df[col].notna(), float("nan"))
+    return df
+
+
+def _write_columnar(df: pd.DataFrame, parquet_path: str, meta_path: str, meta: Dict) -> bool:
+    try:
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        tmp_path = parquet_path + f".{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+        _write_meta(meta_path, meta)
+        return True
+    except (ImportError, OSError, ValueError) as e:
+        print(f"⚠️ Could not write columnar dataset cache ({e}); continuing with CSV only.")
+        return False
+
+
+def _write_meta(meta_path: str, meta: Dict) -> None:
+    tmp_path = meta_path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def load_base_dataset(
+        path: str,
+        sep: str = ",",
+        cache_dir: str = None,
+        copy: bool = True,
+        verbose: bool = True
+) -> pd.DataFrame:
+    """
+    Load a base catalog CSV through a two-level cache.
+
+    The first call converts the CSV into a Parquet file (typed schema + SHA-256 of the
+    source recorded in a sidecar `.meta.json`), later calls in any process read the
+    columnar copy, and repeated calls in the same process are served from memory.
+    Both levels are invalidated when the CSV's mtime/size change and its content hash
+    no longer matches.
+
+    Args:
+        path (str): Path to the CSV file.
+        sep (str, optional): Field delimiter of the CSV. Defaults to ",".
+        cache_dir (str, optional): Directory for the columnar copy.
+            Defaults to a `.cache` folder next to the CSV.
+        copy (bool, optional): Return a copy of the in-memory frame so callers may
+            mutate it freely. Defaults to True.
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        pd.DataFrame: The dataset, identical to `pd.read_csv(path, sep=sep)`.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+
+    with _LOCK:
+        cached = _MEMORY_CACHE.get(abs_path)
+        if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size \
+                and cached["sep"] == sep:
+            if verbose:
+                print(f"⚡ Dataset served from memory cache (sha256={cached['sha256'][:12]})")
+            return cached["df"].copy() if copy else cached["df"]
+
+        parquet_path, meta_path = _cache_paths(abs_path, cache_dir)
+        meta = _read_meta(meta_path)
+        df = None
+        sha256 = None
+
+        if meta and meta.get("version") == SCHEMA_VERSION and meta.get("sep") == sep \
+                and os.path.exists(parquet_path):
+            if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+                sha256 = meta["sha256"]
+            else:
+                # File was touched: only trust the columnar copy if the content is unchanged
+                sha256 = file_sha256(abs_path)
+                if sha256 == meta.get("sha256"):
+                    meta.update({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size})
+                    _write_meta(meta_path, meta)
+                else:
+                    sha256 = None
+            if sha256:
+                df = _read_columnar(parquet_path, meta)
+                if df is not None and verbose:
+                    print(f"⚡ Dataset loaded from columnar cache: {parquet_path}")
+
+        if df is None:
+            df = pd.read_csv(abs_path, sep=sep)
+            sha256 = file_sha256(abs_path)
+            written = _write_columnar(df, parquet_path, meta_path, {
+                "version": SCHEMA_VERSION,
+                "source": abs_path,
+                "sep": sep,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": sha256,
+                "rows": int(len(df)),
+                "schema": _schema_of(df),
+            })
+            if written and verbose:
+                print(f"💾 Built columnar dataset cache → {parquet_path}")
+
+        _MEMORY_CACHE[abs_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sep": sep,
+            "sha256": sha256,
+            "df": df,
+        }
+        return df.copy() if copy else df
+
+
+def dataset_fingerprint(path: str, sep: str = ",", cache_dir: str = None) -> str:
+    """
+    Return the SHA-256 content hash of a base catalog, reusing the cache metadata when possible.
+
+    Args:
+        path (str): Path to the CSV file.
+        sep (str, optional): Field delimiter of the CSV. Defaults to ",".
+        cache_dir (str, optional): Directory for the columnar copy.
+
+    Returns:
+        str: Hex digest of the CSV content.
+    """
+    load_base_dataset(path, sep=sep, cache_dir=cache_dir, copy=False, verbose=False)
+    return _MEMORY_CACHE[os.path.abspath(path)]["sha256"]
+
+
+def clear_dataset_cache() -> None:
+    """Drop all in-process cached frames (the on-disk columnar copies are kept)."""
+    with _LOCK:
+        _MEMORY_CACHE.clear()
@@ -0,0 +1,93 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostClassifier, Pool
+from lightgbm import LGBMClassifier, early_stopping
+from xgboost import XGBClassifier
+
+# Rounds without improvement on the validation fold before boosting stops
+EARLY_STOPPING_ROUNDS = 50
+
+
+def supports_early_stopping(model) -> bool:
+    return isinstance(model, (XGBClassifier, LGBMClassifier, CatBoostClassifier))
+
+
+def fit_with_early_stopping(
+        model,
+        X_train: pd.DataFrame,
+        y_train: np.ndarray,
+        X_val: pd.DataFrame,
+        y_val: np.ndarray,
+        rounds: int = EARLY_STOPPING_ROUNDS,
+        sample_weight: np.ndarray = None
+) -> int | None:
+    """
+    Fit a booster while watching the validation fold, stopping after `rounds` rounds without
+    improvement of the validation loss. Predictions of the fitted model use the best iteration.
+
+    The best iteration is picked on the same fold it then predicts, so out-of-fold probabilities
+    of an early-stopped model are slightly optimistic (they feed stacking, threshold tuning and
+    the Stage 1 sweep); the full-data refit uses the median best iteration over folds instead.
+
+    Models without early stopping support (e.g. RandomForest) are fitted normally.
+
+    Args:
+        model: Unfitted XGBoost / LightGBM / CatBoost classifier (fitted in place).
+        X_train (pd.DataFrame): Training fold features (CatBoost: or a Pool, with y_train=None).
+        y_train (np.ndarray): Training fold labels.
+        X_val (pd.DataFrame): Validation fold features (early stopping set; CatBoost: or a Pool).
+        y_val (np.ndarray): Validation fold labels.
+        rounds (int, optional): Early stopping patience. Defaults to EARLY_STOPPING_ROUNDS.
+        sample_weight (np.ndarray, optional): Per-sample training weights.
+
+    Returns:
+        int | None: Number of boosting rounds up to and including the best iteration,
+            or None if the model does not support early stopping.
+    """
+    if isinstance(model, XGBClassifier):
+        model.set_params(early_stopping_rounds=rounds)
+        model.fit(X_train, y_train, sample_weight=sample_weight, eval_set=[(X_val, y_val)], verbose=False)
+        return int(model.best_iteration) + 1
+    if isinstance(model, LGBMClassifier):
+        model.fit(X_train, y_train, sample_weight=sample_weight, eval_set=[(X_val, y_val)],
+                  callbacks=[early_stopping(rounds, verbose=False)])
+        return int(model.best_iteration_ or model.n_estimators)
+    if isinstance(model, CatBoostClassifier):
+        # X_train / X_val may also be prebuilt Pools (labels inside, y_* = None)
+        eval_set = X_val if isinstance(X_val, Pool) else (X_val, y_val)
+        model.fit(X_train, y_train, sample_weight=sample_weight, eval_set=eval_set,
+                  early_stopping_rounds=rounds, use_best_model=True)
+        return int(model.get_best_iteration()) + 1
+
+    model.fit(X_train, y_train, sample_weight=sample_weight)
+    return None
+
+
+def median_best_iteration(best_iterations: List[int | None]) -> int | None:
+    """Median of the per-fold best iterations (None if no fold recorded one)."""
+    best_iterations = [n for n in best_iterations if n is not None]
+    if not best_iterations:
+        return None
+    return max(1, int(round(float(np.median(best_iterations)))))
+
+
+def with_n_estimators(model, n_estimators: int | None):
+    """
+    Set the number of boosting rounds of an (unfitted) booster for the full-data refit.
+
+    Args:
+        model: sklearn-compatible estimator (modified in place).
+        n_estimators (int | None): Rounds to train; None leaves the model unchanged.
+
+    Returns:
+        The same estimator.
+    """
+    if n_estimators is None or not supports_early_stopping(model):
+        return model
+    if isinstance(model, CatBoostClassifier):
+        model.set_params(iterations=n_estimators)
+    else:
+        model.set_params(n_estimators=n_estimators)
+    return model
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from data_loading import rows_to_frame, InputRows
+from dataset_cache import CACHE_DIR_NAME, dataset_fingerprint, load_base_dataset
+from feature_extraction import ENGINEERED_FEATURES, create_advanced_features
+from preprocessing import KOIPreprocessor
+from shared_arrays import MMAP_FEATURES, memory_map_frame
+
+# Bump when cleaning or feature formulas change without the feature names changing
+FEATURE_CACHE_VERSION = 1
+
+# Process-wide cache: cache key -> (fitted preprocessor, engineered base frame)
+_MEMORY_CACHE: Dict[str, Tuple[KOIPreprocessor, pd.DataFrame]] = {}
+_LOCK = threading.Lock()
+
+
+def feature_cache_key(dataset_sha256: str, drop_fpflags: bool) -> str:
+    """
+    Cache key of an engineered base catalog.
+
+    Args:
+        dataset_sha256 (str): Content hash of the base CSV (`dataset_fingerprint`).
+        drop_fpflags (bool): Preprocessing mode the features were built with.
+
+    Returns:
+        str: Key combining dataset hash, fpflag mode, cache version and the feature registry.
+    """
+    registry = hashlib.sha256(json.dumps(ENGINEERED_FEATURES).encode()).hexdigest()[:8]
+    fpflags = "nofpflags" if drop_fpflags else "fpflags"
+    return f"{dataset_sha256[:16]}_{fpflags}_v{FEATURE_CACHE_VERSION}_{registry}"
+
+
+def _cache_path(dataset_path: str, key: str, cache_dir: str | None) -> str:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(dataset_path)), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(dataset_path))[0]
+    return os.path.join(cache_dir, f"{stem}.engineered.{key}.pkl")
+
+
+def _read_entry(path: str) -> Tuple[KOIPreprocessor, pd.DataFrame] | None:
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+        return entry["preprocessor"], entry["df_engineered"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+        return None
+
+
+def _write_entry(path: str, preprocessor: KOIPreprocessor, df_engineered: pd.DataFrame) -> bool:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"preprocessor": preprocessor, "df_engineered": df_engineered}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"⚠️ Could not write engineered feature cache ({e}); continuing without it.")
+        return False
+
+
+def load_engineered_base(
+        dataset_path: str,
+        drop_fpflags: bool = True,
+        cache_dir: str = None,
+        verbose: bool = True
+) -> Tuple[KOIPreprocessor, pd.DataFrame]:
+    """
+    Return the preprocessor fitted on the base catalog and its cleaned + engineered frame.
+
+    The result is built once per (dataset hash, `drop_fpflags`) pair, pickled next to the
+    columnar dataset cache and kept in process memory, so later runs skip cleaning and
+    feature engineering of the base catalog entirely. With `MMAP_FEATURES`, the numeric
+    columns of the frame are memory-mapped (`memory_map_frame`) so processes share them.
+
+    Args:
+        dataset_path (str): Path to the base catalog CSV.
+        drop_fpflags (bool, optional): Preprocessing mode. Defaults to True.
+        cache_dir (str, optional): Directory for the persisted copy.
+            Defaults to the `.cache` folder next to the CSV.
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        Tuple[KOIPreprocessor, pd.DataFrame]: (fitted preprocessor, engineered base frame).
+            The frame is shared; callers must not modify it in place.
+    """
+    key = feature_cache_key(dataset_fingerprint(dataset_path, cache_dir=cache_dir), drop_fpflags)
+    path = _cache_path(dataset_path, key, cache_dir)
+
+    with _LOCK:
+        entry = _MEMORY_CACHE.get(key)
+        if entry is not None:
+            if verbose:
+                print(f"⚡ Engineered base features served from memory cache ({key})")
+            return entry
+
+        entry = _read_entry(path)
+        if entry is not None:
+            if verbose:
+                print(f"⚡ Engineered base features loaded from cache: {path}")
+        else:
+            df_raw = load_base_dataset(dataset_path, copy=False, verbose=verbose)
+            preprocessor = KOIPreprocessor(drop_fpflags=drop_fpflags)
+            df_clean = preprocessor.fit_transform(df_raw, verbose=verbose)
+            entry = (preprocessor, create_advanced_features(df_clean, verbose=verbose))
+            if _write_entry(path, *entry) and verbose:
+                print(f"💾 Built engineered feature cache → {path}")
+
+        if MMAP_FEATURES:
+            entry = (entry[0], memory_map_frame(entry[1], os.path.splitext(path)[0], verbose=verbose))
+        _MEMORY_CACHE[key] = entry
+        return entry
+
+
+def build_engineered_dataset(
+        dataset_path: str,
+        input_rows: InputRows = None,
+        drop_fpflags: bool = True,
+        cache_dir: str = None,
+        verbose: bool = True
+) -> Tuple[KOIPreprocessor, pd.DataFrame]:
+    """
+    Engineered training frame for base catalog + appended rows, reusing the cached base.
+
+    Only `input_rows` are cleaned (with the base catalog's fitted rules) and engineered;
+    they are then appended to the cached base frame. Row order and index match
+    `create_advanced_features(clean_koi_dataset(load_koi_dataset(path, input_rows)))`,
+    except that the imputation medians come from the base catalog alone.
+
+    Args:
+        dataset_path (str): Path to the base catalog CSV.
+        input_rows (InputRows, optional): Rows appended to the base catalog.
+        drop_fpflags (bool, optional): Preprocessing mode. Defaults to True.
+        cache_dir (str, optional): Directory for the persisted base copy.
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        Tuple[KOIPreprocessor, pd.DataFrame]: (preprocessor fitted on the base, engineered frame).
+    """
+    preprocessor, df_base = load_engineered_base(dataset_path, drop_fpflags=drop_fpflags,
+                                                 cache_dir=cache_dir, verbose=verbose)
+    df_new = rows_to_frame(input_rows)
+    if df_new is None or df_new.empty:
+        return preprocessor, df_base.copy()
+
+    # Appended rows continue the raw index, as they would after concatenating with the base
+    n_base_raw = preprocessor.n_rows_fitted_
+    df_new = df_new.set_axis(pd.RangeIndex(n_base_raw, n_base_raw + len(df_new)), axis=0)
+    # Categorical columns (the label) absent from the upload are missing, as after concatenating with
+    # the base catalog: the cleaning step then drops those rows instead of training on a NaN label
+    missing_categorical = [c for c in preprocessor.categorical_columns_ if c not in df_new.columns]
+    if missing_categorical:
+        df_new = df_new.assign(**{c: pd.Series(None, index=df_new.index, dtype=object) for c in missing_categorical})
+    df_new_engineered = create_advanced_features(preprocessor.transform(df_new, verbose=False), verbose=False)
+    # Columns unknown to the base catalog are dropped, as they would be at inference
+    df_new_engineered = df_new_engineered.reindex(columns=df_base.columns)
+    if verbose:
+        print(f"✅ Cleaned and engineered {len(df_new_engineered)} appended row(s) "
+              f"on top of {len(df_base)} cached base rows.")
+    return preprocessor, pd.concat([df_base, df_new_engineered])
+
+
+def clear_feature_cache() -> None:
+    """Drop all in-process engineered frames (the persisted copies are kept)."""
+    with _LOCK:
+        _MEMORY_CACHE.clear()
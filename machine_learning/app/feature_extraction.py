@@ -1,196 +1,341 @@
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Tuple
+
 import numpy as np
 import pandas as pd
 
+# koi_steff bin edges: M dwarf (red) | K dwarf (orange) | G dwarf (yellow, like Sun) | F dwarf (white) | A dwarf (hot blue-white)
+STELLAR_CLASS_BINS = np.array([3500.0, 5200.0, 6000.0, 7500.0])
 
-def create_advanced_features(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Perform feature engineering on Kepler KOI data.
 
-    Args:
-        df (pd.DataFrame):
-            Cleaned KOI dataset.
+def _error_columns(columns: Iterable[str]) -> Tuple[str, ...]:
+    """All measurement-error columns present in the frame (dynamic inputs of total_uncertainty)."""
+    return tuple(c for c in columns if "err1" in c or "err2" in c)
 
-    Returns:
-        pd.DataFrame:
-            DataFrame with original + engineered features.
 
-    Features created
-    ----------------
-    • Ratios & interaction terms:
-        - period_radius_ratio, period_prad_product
-        - depth_duration_ratio, prad_srad_ratio, prad_srad_ratio_squared
-        - detectability, snr_per_depth
-    • Polynomial transforms:
-        - log, sqrt, squared versions of key continuous variables
-    • Stellar and orbital descriptors:
-        - stellar_class, temp_ratio, estimated_distance,
-          insolation_distance_check, impact_centrality,
-          is_grazing_transit, is_multiplanet, planet_position_log
-    • Quality and geometric measures:
-        - total_uncertainty, duration_fraction, is_long_transit, transit_duration_ratio, log_snr
-    • Error measures:
-        - period_relative_error, depth_relative_error
+def _total_uncertainty(env: Mapping[str, np.ndarray], out: np.ndarray | None) -> np.ndarray:
+    # nansum(|errors|) accumulated column by column (same order, hence same result, as the
+    # row-wise nansum over the column-major error block) without materializing that block
+    columns = _error_columns(env)
+    total = np.zeros_like(env[columns[0]]) if out is None else out
+    total[...] = 0.0
+    abs_err = np.empty_like(total)
+    for c in columns:
+        np.abs(env[c], out=abs_err)
+        abs_err[np.isnan(abs_err)] = 0.0
+        total += abs_err
+    return total
+
+
+class FeatureSpec(NamedTuple):
+    """
+    One derived feature (or shared intermediate) of the feature registry.
+
+    Attributes:
+        name (str): Column name of the feature.
+        inputs (Tuple[str, ...] | Callable): Raw columns and/or other registry entries the
+            formula reads; a callable receives the available raw columns and returns them.
+        formula (Callable): `formula(env, out)` computes the feature from `env` (name → array),
+            writing into `out` when given (a preallocated block row) or allocating otherwise.
+        dtype (type): np.float64 for continuous features, np.int64 for integer-coded flags.
+        requires (Tuple[str, ...]): Extra raw columns that must be present for the feature to exist.
+        output (bool): False for intermediates that are shared but never attached to the frame.
     """
+    name: str
+    inputs: Tuple[str, ...] | Callable[[Iterable[str]], Tuple[str, ...]]
+    formula: Callable[[Mapping[str, np.ndarray], np.ndarray | None], np.ndarray]
+    dtype: type = np.float64
+    requires: Tuple[str, ...] = ()
+    output: bool = True
 
-    print("\n" + "=" * 60)
-    print("FEATURE ENGINEERING: Creating derived and astrophysical features")
-    print("=" * 60)
 
-    df_eng = df.copy()
-    added_features = []
+def _poly_specs(feat: str) -> List[FeatureSpec]:
+    filled = f"_{feat}_filled"
+    abs_filled = f"_{feat}_abs"
+    return [
+        FeatureSpec(filled, (feat,), lambda e, out: np.where(np.isnan(e[feat]), 0.0, e[feat]), output=False),
+        FeatureSpec(abs_filled, (filled,), lambda e, out: np.abs(e[filled], out=out), output=False),
+        # Log: compress large values
+        FeatureSpec(f"{feat}_log", (abs_filled,), lambda e, out: np.log1p(e[abs_filled], out=out)),
+        # Sqrt: less aggressive compression
+        FeatureSpec(f"{feat}_sqrt", (abs_filled,), lambda e, out: np.sqrt(e[abs_filled], out=out)),
+        # Square: capture non-linearity
+        FeatureSpec(f"{feat}_squared", (filled,), lambda e, out: np.square(e[filled], out=out)),
+    ]
+
+
+# Declarative feature registry: each entry names its inputs and formula. Entries are listed in
+# dependency order; `resolve_features` walks the graph so only what is requested gets computed.
+FEATURE_REGISTRY: List[FeatureSpec] = [
+    # --- Shared intermediates ---
+    FeatureSpec("_log1p_period", ("koi_period",), lambda e, out: np.log1p(e["koi_period"], out=out), output=False),
+    FeatureSpec("_period_hours", ("koi_period",), lambda e, out: e["koi_period"] * 24 + 1e-8, output=False),
 
     # --- 1. Astronomical ratios & interactions ---
-    if {"koi_period", "koi_prad"} <= set(df.columns):
-        # Period/Radius ratio (captures density hints)
-        df_eng["period_radius_ratio"] = np.log1p(df_eng["koi_period"]) / (
-                np.log1p(df_eng["koi_prad"]) + 1e-8
-        )
-        # Period × Radius product (system scale)
-        df_eng["period_prad_product"] = df_eng["koi_period"] * df_eng["koi_prad"]
-        added_features += ["period_radius_ratio", "period_prad_product"]
+    # Period/Radius ratio (captures density hints)
+    FeatureSpec("period_radius_ratio", ("_log1p_period", "koi_prad"),
+                lambda e, out: np.divide(e["_log1p_period"], np.log1p(e["koi_prad"]) + 1e-8, out=out)),
+    # Period × Radius product (system scale)
+    FeatureSpec("period_prad_product", ("koi_period", "koi_prad"),
+                lambda e, out: np.multiply(e["koi_period"], e["koi_prad"], out=out)),
 
     # --- 2. Polynomial/log features for key continuous variables ---
-    key_features = ["koi_period", "koi_prad", "koi_depth"]
-    for feat in key_features:
-        if feat in df.columns:
-            v = pd.to_numeric(df_eng[feat], errors="coerce").fillna(0)
-            df_eng[f"{feat}_log"] = np.log1p(np.abs(v))  # Log: compress large values
-            df_eng[f"{feat}_sqrt"] = np.sqrt(np.abs(v))  # Sqrt: less aggressive compression
-            df_eng[f"{feat}_squared"] = v ** 2  # Square: capture non-linearity
-            added_features += [f"{feat}_log", f"{feat}_sqrt", f"{feat}_squared"]
+    *_poly_specs("koi_period"),
+    *_poly_specs("koi_prad"),
+    *_poly_specs("koi_depth"),
 
     # --- 3. Transit shape indicator ---
-    if {"koi_depth", "koi_duration"} <= set(df.columns):
-        # Shallow + long = grazing transit (low impact parameter)
-        # Deep + short = central transit (high impact parameter)
-        df_eng["depth_duration_ratio"] = df_eng["koi_depth"] / (
-                df_eng["koi_duration"] + 1e-8
-        )
-        added_features.append("depth_duration_ratio")
+    # Shallow + long = grazing transit (low impact parameter)
+    # Deep + short = central transit (high impact parameter)
+    FeatureSpec("depth_duration_ratio", ("koi_depth", "koi_duration"),
+                lambda e, out: np.divide(e["koi_depth"], e["koi_duration"] + 1e-8, out=out)),
 
     # --- 4. Impact parameter features ---
-    if "koi_impact" in df.columns:
-        # impact near 0 or 1 are more suspicious
-        df_eng["impact_centrality"] = 1 - np.abs(df_eng["koi_impact"])
-        df_eng["is_grazing_transit"] = (df_eng["koi_impact"] > 0.7).astype(int)
-        added_features += ["impact_centrality", "is_grazing_transit"]
+    # impact near 0 or 1 are more suspicious
+    FeatureSpec("impact_centrality", ("koi_impact",),
+                lambda e, out: np.subtract(1, np.abs(e["koi_impact"]), out=out)),
+    FeatureSpec("is_grazing_transit", ("koi_impact",),
+                lambda e, out: np.greater(e["koi_impact"], 0.7, out=out, casting="unsafe"), dtype=np.int64),
 
     # --- 5. Planet-to-star radius ratio ---
-    if {"koi_prad", "koi_srad"} <= set(df.columns):
-        df_eng["prad_srad_ratio"] = df_eng["koi_prad"] / (df_eng["koi_srad"] + 1e-8)
-        df_eng["prad_srad_ratio_squared"] = df_eng["prad_srad_ratio"] ** 2
-        added_features += ["prad_srad_ratio", "prad_srad_ratio_squared"]
-
-        # Todo: this should correlate with koi_depth
-        # If inconsistent → possible false positive
+    # Todo: this should correlate with koi_depth
+    # If inconsistent → possible false positive
+    FeatureSpec("prad_srad_ratio", ("koi_prad", "koi_srad"),
+                lambda e, out: np.divide(e["koi_prad"], e["koi_srad"] + 1e-8, out=out)),
+    FeatureSpec("prad_srad_ratio_squared", ("prad_srad_ratio",),
+                lambda e, out: np.square(e["prad_srad_ratio"], out=out)),
 
     # --- 6. Stellar classification & temperature ratio ---
     # Hot stars vs cool stars have different characteristics
-    if "koi_steff" in df.columns:
-        def classify_star(temp):
-            if temp < 3500:
-                return 0  # M dwarf (red)
-            elif temp < 5200:
-                return 1  # K dwarf (orange)
-            elif temp < 6000:
-                return 2  # G dwarf (yellow, like Sun)
-            elif temp < 7500:
-                return 3  # F dwarf (white)
-            return 4  # A dwarf (hot blue-white)
-
-        df_eng["stellar_class"] = df_eng["koi_steff"].apply(classify_star)
-        added_features.append("stellar_class")
-
-        if "koi_teq" in df.columns:
-            # planet equilibrium temp / stellar temp
-            df_eng["temp_ratio"] = df_eng["koi_teq"] / (df_eng["koi_steff"] + 1e-8)
-            added_features.append("temp_ratio")
+    # Binned lookup: 0=M, 1=K, 2=G, 3=F, 4=A (NaN falls into the last bin)
+    FeatureSpec("stellar_class", ("koi_steff",),
+                lambda e, out: np.digitize(e["koi_steff"], STELLAR_CLASS_BINS), dtype=np.int64),
+    # planet equilibrium temp / stellar temp
+    FeatureSpec("temp_ratio", ("koi_teq", "koi_steff"),
+                lambda e, out: np.divide(e["koi_teq"], e["koi_steff"] + 1e-8, out=out)),
 
     # --- 7. Estimated orbital distance and insolation consistency ---
-    # Can estimate distance from period and stellar mass
-    if {"koi_period", "koi_srad"} <= set(df.columns):
-        # Approximate semi-major axis (AU) using period and star radius as mass proxy
-        # a ≈ (period²)^(1/3) for solar-mass stars
-        df_eng["estimated_distance"] = np.cbrt(df_eng["koi_period"] ** 2)
-        added_features.append("estimated_distance")
-
-        if "koi_insol" in df.columns:
-            # Cross-check with insolation, insolation should scale as 1/distance²
-            df_eng["insolation_distance_check"] = (
-                    df_eng["koi_insol"] * df_eng["estimated_distance"] ** 2
-            )
-            added_features.append("insolation_distance_check")
+    # Approximate semi-major axis (AU) using period and star radius as mass proxy
+    # a ≈ (period²)^(1/3) for solar-mass stars
+    FeatureSpec("estimated_distance", ("koi_period",),
+                lambda e, out: np.cbrt(e["koi_period"] ** 2, out=out), requires=("koi_srad",)),
+    # Cross-check with insolation, insolation should scale as 1/distance²
+    FeatureSpec("insolation_distance_check", ("koi_insol", "estimated_distance"),
+                lambda e, out: np.multiply(e["koi_insol"], e["estimated_distance"] ** 2, out=out)),
 
     # --- 8. Detectability score ---
     # Larger, closer planets are easier to detect
-    if {"koi_prad", "koi_period"} <= set(df.columns):
-        df_eng["detectability"] = df_eng["koi_prad"] / np.log1p(df_eng["koi_period"])
-        added_features.append("detectability")
+    FeatureSpec("detectability", ("koi_prad", "_log1p_period"),
+                lambda e, out: np.divide(e["koi_prad"], e["_log1p_period"], out=out)),
 
     # --- 9. SNR consistency with physical parameters ---
-    if {"koi_model_snr", "koi_depth"} <= set(df.columns):
-        # High depth should correlate with high SNR
-        # If SNR is low despite high depth → suspicious
-        df_eng["snr_per_depth"] = df_eng["koi_model_snr"] / (
-                df_eng["koi_depth"] + 1e-8
-        )
-        added_features.append("snr_per_depth")
+    # High depth should correlate with high SNR
+    # If SNR is low despite high depth → suspicious
+    FeatureSpec("snr_per_depth", ("koi_model_snr", "koi_depth"),
+                lambda e, out: np.divide(e["koi_model_snr"], e["koi_depth"] + 1e-8, out=out)),
 
     # --- 10. Measurement uncertainty features ---
-    # Combine all error terms into quality scores
-    error_cols = [c for c in df.columns if "err1" in c or "err2" in c]
-    if error_cols:
-        # Overall measurement precision (smaller = better)
-        df_eng["total_uncertainty"] = df[error_cols].abs().sum(axis=1)
-        added_features.append("total_uncertainty")
-
-        # Relative errors for key parameters
-        if {"koi_period_err1", "koi_period_err2", "koi_period"} <= set(df.columns):
-            df_eng["period_relative_error"] = (
-                                                      df_eng["koi_period_err1"].abs() + df_eng["koi_period_err2"].abs()
-                                              ) / (df_eng["koi_period"] + 1e-8)
-            added_features.append("period_relative_error")
-
-        if {"koi_depth_err1", "koi_depth_err2", "koi_depth"} <= set(df.columns):
-            df_eng["depth_relative_error"] = (
-                                                     df_eng["koi_depth_err1"].abs() + df_eng["koi_depth_err2"].abs()
-                                             ) / (df_eng["koi_depth"] + 1e-8)
-            added_features.append("depth_relative_error")
+    # Overall measurement precision (smaller = better)
+    FeatureSpec("total_uncertainty", _error_columns, _total_uncertainty),
+    # Relative errors for key parameters
+    FeatureSpec("period_relative_error", ("koi_period_err1", "koi_period_err2", "koi_period"),
+                lambda e, out: np.divide(np.abs(e["koi_period_err1"]) + np.abs(e["koi_period_err2"]),
+                                         e["koi_period"] + 1e-8, out=out)),
+    FeatureSpec("depth_relative_error", ("koi_depth_err1", "koi_depth_err2", "koi_depth"),
+                lambda e, out: np.divide(np.abs(e["koi_depth_err1"]) + np.abs(e["koi_depth_err2"]),
+                                         e["koi_depth"] + 1e-8, out=out)),
 
     # --- 11. Transit duration & geometry ---
-    # Transit duration should be consistent with period and geometry
-    if {"koi_duration", "koi_period"} <= set(df.columns):
-        # Duration as fraction of period
-        df_eng["duration_fraction"] = df_eng["koi_duration"] / (
-                df_eng["koi_period"] * 24 + 1e-8
-        )
-        # Long transit relative to period is unusual
-        df_eng["is_long_transit"] = (df_eng["duration_fraction"] > 0.15).astype(int)
-        df_eng["transit_duration_ratio"] = df_eng["koi_duration"] / (
-                df_eng["koi_period"] * 24 + 1e-8
-        )
-        added_features += [
-            "duration_fraction",
-            "is_long_transit",
-            "transit_duration_ratio",
-        ]
+    # Duration as fraction of period
+    FeatureSpec("duration_fraction", ("koi_duration", "_period_hours"),
+                lambda e, out: np.divide(e["koi_duration"], e["_period_hours"], out=out)),
+    # Long transit relative to period is unusual
+    FeatureSpec("is_long_transit", ("duration_fraction",),
+                lambda e, out: np.greater(e["duration_fraction"], 0.15, out=out, casting="unsafe"), dtype=np.int64),
+    FeatureSpec("transit_duration_ratio", ("koi_duration", "_period_hours"),
+                lambda e, out: np.divide(e["koi_duration"], e["_period_hours"], out=out)),
 
     # --- 12. Multi-planet system indicators ---
-    if "koi_tce_plnt_num" in df.columns:
-        # Enhance the planet number feature
-        df_eng["is_multiplanet"] = (df_eng["koi_tce_plnt_num"] > 1).astype(int)
-        # Planet position (inner vs outer)
-        df_eng["planet_position_log"] = np.log1p(df_eng["koi_tce_plnt_num"])
-        added_features += ["is_multiplanet", "planet_position_log"]
+    # Enhance the planet number feature
+    FeatureSpec("is_multiplanet", ("koi_tce_plnt_num",),
+                lambda e, out: np.greater(e["koi_tce_plnt_num"], 1, out=out, casting="unsafe"), dtype=np.int64),
+    # Planet position (inner vs outer)
+    FeatureSpec("planet_position_log", ("koi_tce_plnt_num",),
+                lambda e, out: np.log1p(e["koi_tce_plnt_num"], out=out)),
 
     # --- 13. Log of SNR (normalization) ---
-    if "koi_model_snr" in df.columns:
-        df_eng["log_snr"] = np.log1p(df_eng["koi_model_snr"])
-        added_features.append("log_snr")
-
-    print(f"✅ Feature engineering complete. Added {len(added_features)} new features.")
-    print(f"Total features before engineering: {df.shape[1] - 1}")  # -1 for category column
-    print(f"Total features after engineering: {df_eng.shape[1] - 1}")  # -1 for category column
-    print(f"New features:\n  {', '.join(added_features)}\n")
+    FeatureSpec("log_snr", ("koi_model_snr",), lambda e, out: np.log1p(e["koi_model_snr"], out=out)),
+]
+_SPECS: Dict[str, FeatureSpec] = {spec.name: spec for spec in FEATURE_REGISTRY}
+ENGINEERED_FEATURES: List[str] = [spec.name for spec in FEATURE_REGISTRY if spec.output]
+
+
+def _spec_inputs(spec: FeatureSpec, columns: Iterable[str]) -> Tuple[str, ...]:
+    return spec.inputs(columns) if callable(spec.inputs) else spec.inputs
+
+
+def resolve_features(
+        columns: Iterable[str],
+        features: Iterable[str] | None = None
+) -> Tuple[List[FeatureSpec], List[str], List[str]]:
+    """
+    Resolve the dependency graph for the requested features.
+
+    Args:
+        columns (Iterable[str]): Raw columns available in the input.
+        features (Iterable[str], optional): Wanted feature names (unknown names, e.g. raw
+            columns from `features.json`, are ignored). Defaults to every registered feature.
+
+    Returns:
+        Tuple[List[FeatureSpec], List[str], List[str]]:
+            - plan: specs to evaluate (intermediates included), in dependency order
+            - raw_inputs: raw columns the plan reads, in input column order
+            - outputs: requested features that can be computed from `columns`
+    """
+    columns = list(columns)
+    available_columns = set(columns)
+    wanted = ENGINEERED_FEATURES if features is None else [f for f in features if f in _SPECS]
+    available: Dict[str, bool] = {}
+
+    def is_available(name: str) -> bool:
+        if name not in _SPECS:
+            return name in available_columns
+        if name not in available:
+            spec = _SPECS[name]
+            inputs = _spec_inputs(spec, columns)
+            available[name] = bool(inputs) and all(map(is_available, inputs)) \
+                and all(c in available_columns for c in spec.requires)
+        return available[name]
+
+    needed = set()
+
+    def visit(name: str) -> None:
+        if name in needed or name not in _SPECS:
+            return
+        needed.add(name)
+        for dep in _spec_inputs(_SPECS[name], columns):
+            visit(dep)
+
+    outputs = [name for name in wanted if is_available(name)]
+    for name in outputs:
+        visit(name)
+
+    # Registry order is a valid topological order (entries only depend on earlier ones)
+    plan = [spec for spec in FEATURE_REGISTRY if spec.name in needed]
+    raw_needed = {c for spec in plan for c in _spec_inputs(spec, columns) if c not in _SPECS}
+    raw_inputs = [c for c in columns if c in raw_needed]
+    return plan, raw_inputs, outputs
+
+
+def compute_features(
+        env: Dict[str, np.ndarray],
+        plan: List[FeatureSpec],
+        outputs: List[str],
+        n_rows: int
+) -> Tuple[np.ndarray, List[str], np.ndarray, List[str]]:
+    """
+    Evaluate a resolved plan on raw column arrays (no pandas involved).
+
+    Args:
+        env (Dict[str, np.ndarray]): Raw input columns as float arrays, in input column order;
+            intermediates are added to it.
+        plan (List[FeatureSpec]): Plan from `resolve_features`.
+        outputs (List[str]): Features to return (other plan entries are treated as intermediates).
+        n_rows (int): Number of rows.
+
+    Returns:
+        Tuple[np.ndarray, List[str], np.ndarray, List[str]]:
+            (float_block, float_names, int_block, int_names) — one block row per output feature.
+    """
+    output_specs = [spec for spec in plan if spec.name in set(outputs)]
+    float_names = [spec.name for spec in output_specs if spec.dtype is not np.int64]
+    int_names = [spec.name for spec in output_specs if spec.dtype is np.int64]
+    # Preallocated feature blocks (one row per feature, i.e. pandas' own block layout);
+    # every formula writes its final result straight into its slot.
+    float_block = np.empty((len(float_names), n_rows), dtype=np.float64)
+    int_block = np.empty((len(int_names), n_rows), dtype=np.int64)
+    slots = {name: float_block[i] for i, name in enumerate(float_names)}
+    slots.update({name: int_block[i] for i, name in enumerate(int_names)})
+
+    for spec in plan:
+        out = slots.get(spec.name)
+        result = spec.formula(env, out)
+        if out is not None and result is not out:
+            out[...] = result
+        env[spec.name] = out if out is not None else result
+    return float_block, float_names, int_block, int_names
+
+
+def create_advanced_features(
+        df: pd.DataFrame,
+        features: Iterable[str] | None = None,
+        verbose: bool = True
+) -> pd.DataFrame:
+    """
+    Perform feature engineering on Kepler KOI data.
+
+    Features are declared in `FEATURE_REGISTRY`; the requested ones are resolved into a
+    dependency plan (shared intermediates such as log1p(koi_period) are computed once),
+    evaluated as NumPy operations into preallocated blocks (continuous features first,
+    then integer-coded flags), and attached to the input with a single concat.
+
+    Args:
+        df (pd.DataFrame):
+            Cleaned KOI dataset.
+        features (Iterable[str], optional):
+            Only compute these features (e.g. the saved `features.json` of a model);
+            names that are not engineered features are ignored. Defaults to all features.
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        pd.DataFrame:
+            DataFrame with original + engineered features.
+
+    Features created
+    ----------------
+    • Ratios & interaction terms:
+        - period_radius_ratio, period_prad_product
+        - depth_duration_ratio, prad_srad_ratio, prad_srad_ratio_squared
+        - detectability, snr_per_depth
+    • Polynomial transforms:
+        - log, sqrt, squared versions of key continuous variables
+    • Stellar and orbital descriptors:
+        - stellar_class, temp_ratio, estimated_distance,
+          insolation_distance_check, impact_centrality,
+          is_grazing_transit, is_multiplanet, planet_position_log
+    • Quality and geometric measures:
+        - total_uncertainty, duration_fraction, is_long_transit, transit_duration_ratio, log_snr
+    • Error measures:
+        - period_relative_error, depth_relative_error
+    """
+
+    if verbose:
+        print("\n" + "=" * 60)
+        print("FEATURE ENGINEERING: Creating derived and astrophysical features")
+        print("=" * 60)
+
+    plan, raw_inputs, outputs = resolve_features(df.columns, features)
+    env = {}
+    for c in raw_inputs:
+        values = df[c]
+        if values.dtype == "object":
+            values = pd.to_numeric(values, errors="coerce")
+        env[c] = values.to_numpy(dtype=np.float64)
+    float_block, float_names, int_block, int_names = compute_features(env, plan, outputs, len(df))
+
+    # Attach both blocks with a single concat (no copies of the blocks themselves);
+    # recomputed features replace stale copies from the input
+    added_features = float_names + int_names
+    base = df.drop(columns=[c for c in added_features if c in df.columns])
+    df_eng = pd.concat([
+        base,
+        pd.DataFrame(float_block.T, columns=float_names, index=df.index, copy=False),
+        pd.DataFrame(int_block.T, columns=int_names, index=df.index, copy=False),
+    ], axis=1)
+
+    if verbose:
+        print(f"✅ Feature engineering complete. Added {len(added_features)} new features.")
+        print(f"Total features before engineering: {df.shape[1] - 1}")  # -1 for category column
+        print(f"Total features after engineering: {df_eng.shape[1] - 1}")  # -1 for category column
+        print(f"New features:\n  {', '.join(added_features)}\n")
 
     return df_eng
@@ -0,0 +1,51 @@
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# What the trainers deliver after CV: "refit" (retrain on the full dataset) or
+# "bag" (keep the fold models and average their probabilities)
+REFIT_STRATEGY = os.environ.get("ML_REFIT_STRATEGY", "refit")
+REFIT_STRATEGIES = ("refit", "bag")
+
+
+def check_refit_strategy(refit_strategy: str) -> str:
+    if refit_strategy not in REFIT_STRATEGIES:
+        raise ValueError(f"Unknown refit_strategy '{refit_strategy}' (expected one of {REFIT_STRATEGIES}).")
+    return refit_strategy
+
+
+class FoldBaggedClassifier:
+    """
+    Averaged ensemble of the models fitted on the CV folds (used instead of a full-data refit).
+
+    Each fold model saw ~(k-1)/k of the data; averaging their probabilities gives a smoother,
+    better-calibrated estimate than any single one and needs no extra training.
+
+    Args:
+        fold_models (List): Fitted fold models sharing the same classes.
+    """
+
+    def __init__(self, fold_models: List):
+        if not fold_models:
+            raise ValueError("FoldBaggedClassifier needs at least one fitted fold model.")
+        self.fold_models = list(fold_models)
+        self.classes_ = np.asarray(getattr(self.fold_models[0], "classes_", None))
+
+    @property
+    def n_models(self) -> int:
+        return len(self.fold_models)
+
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        return np.mean([m.feature_importances_ for m in self.fold_models], axis=0)
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        proba = np.asarray(self.fold_models[0].predict_proba(X), dtype=np.float64)
+        for m in self.fold_models[1:]:
+            proba += m.predict_proba(X)
+        return proba / len(self.fold_models)
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
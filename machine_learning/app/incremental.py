@@ -0,0 +1,511 @@
+import json
+import os
+import pickle
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostClassifier
+from lightgbm import Booster, LGBMClassifier
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier, StackingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.utils.class_weight import compute_sample_weight
+from xgboost import XGBClassifier
+
+from fold_bagging import FoldBaggedClassifier
+from threshold_optimization import SERVED_THRESHOLD_SEARCH, optimize_class_thresholds, set_class_thresholds
+from training_stacking_ensemble import _stack_probas, BASE_ESTIMATORS, OOFStackingClassifier
+
+# Written next to the model packages after every full training / incremental update
+TRAINING_STATE_FILE = "training_state.json"
+
+# Extra boosting rounds (XGB/LGBM/CatBoost) or trees (RandomForest) per update
+INCREMENTAL_ROUNDS = 50
+# partial_fit passes of the MLP over the update set
+INCREMENTAL_MLP_EPOCHS = 5
+# Base catalog rows replayed with the new rows (stratified), so every class is present
+# and the models are not pulled towards the handful of new KOIs only
+INCREMENTAL_REPLAY_ROWS = 1000
+
+# Full retrain once the rows added since the last full training exceed this fraction of it
+INCREMENTAL_MAX_NEW_FRACTION = float(os.environ.get("ML_INCREMENTAL_MAX_NEW_FRACTION", "0.05"))
+# Full retrain when the new rows' feature means shift more than this (see `feature_drift`);
+# random catalog rows stay around 0.5-1 whatever their number
+INCREMENTAL_DRIFT_THRESHOLD = float(os.environ.get("ML_INCREMENTAL_DRIFT_THRESHOLD", "2.0"))
+
+INCREMENTAL_PIPELINES = ("ensemble", "binary_categories", "multistep", "all")
+
+
+# ==========================================================
+# Training state
+# ==========================================================
+def load_training_state(output_folder: str) -> Dict | None:
+    path = os.path.join(output_folder, TRAINING_STATE_FILE)
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_training_state(
+        output_folder: str,
+        pipeline: str,
+        X: pd.DataFrame,
+        le_target,
+        dataset_key: str,
+        class_weight_penalizing: bool = False,
+        previous_state: Dict = None,
+        n_new_rows: int = 0
+) -> Dict:
+    """
+    Record what the models in `output_folder` were trained on.
+
+    After a full training the state describes `X`; after an incremental update pass the
+    previous state and the number of rows added, so the feature statistics keep describing
+    the last full training (drift is always measured against it).
+
+    Args:
+        output_folder (str): Folder holding the model packages.
+        pipeline (str): One of INCREMENTAL_PIPELINES.
+        X (pd.DataFrame): Training feature matrix.
+        le_target: Fitted 3-class label encoder.
+        dataset_key (str): Identifies the base catalog and preprocessing mode (`feature_cache_key`).
+        class_weight_penalizing (bool, optional): Whether the models use balanced class weights.
+        previous_state (Dict, optional): State being updated incrementally.
+        n_new_rows (int, optional): Rows added by the incremental update.
+
+    Returns:
+        Dict: The saved state.
+    """
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    if previous_state is None:
+        values = X.to_numpy(dtype=np.float64)
+        state = {
+            "pipeline": pipeline,
+            "dataset_key": dataset_key,
+            "features": list(X.columns),
+            "classes": [str(c) for c in le_target.classes_],
+            "class_weight_penalizing": bool(class_weight_penalizing),
+            "n_rows_full": int(len(X)),
+            "n_rows_incremental": 0,
+            "n_updates": 0,
+            "feature_mean": np.nanmean(values, axis=0).tolist(),
+            "feature_std": np.nanstd(values, axis=0).tolist(),
+            "trained_at": now,
+        }
+    else:
+        state = dict(previous_state)
+        state["n_rows_incremental"] = int(state["n_rows_incremental"]) + int(n_new_rows)
+        state["n_updates"] = int(state["n_updates"]) + 1
+    state["updated_at"] = now
+
+    path = os.path.join(output_folder, TRAINING_STATE_FILE)
+    with open(path, "w") as f:
+        json.dump(state, f, indent=2)
+    return state
+
+
+def feature_drift(state: Dict, X_new: pd.DataFrame) -> float:
+    """
+    Mean over features of |mean(new) - mean(train)| / (std(train) / sqrt(n_new)).
+
+    Scaling by the standard error keeps the score comparable between 3 and 300 new rows.
+    """
+    mean = np.asarray(state["feature_mean"], dtype=np.float64)
+    std = np.asarray(state["feature_std"], dtype=np.float64)
+    std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+    shift = np.abs(np.nanmean(X_new.to_numpy(dtype=np.float64), axis=0) - mean) / std * np.sqrt(len(X_new))
+    shift = shift[np.isfinite(shift)]
+    return float(shift.mean()) if len(shift) else 0.0
+
+
+def plan_update(
+        state: Dict | None,
+        pipeline: str,
+        X: pd.DataFrame,
+        new_mask: np.ndarray,
+        le_target,
+        dataset_key: str
+) -> Tuple[str, str]:
+    """
+    Decide between an incremental update and a full retrain.
+
+    Returns:
+        Tuple[str, str]: ("incremental" | "full", reason)
+    """
+    n_new = int(new_mask.sum())
+    if state is None:
+        return "full", "no previous training state"
+    if state.get("pipeline") != pipeline:
+        return "full", f"previous training was '{state.get('pipeline')}'"
+    if state.get("dataset_key") != dataset_key:
+        return "full", "base catalog or preprocessing mode changed"
+    if state.get("features") != list(X.columns):
+        return "full", "feature set changed"
+    if state.get("classes") != [str(c) for c in le_target.classes_]:
+        return "full", "target classes changed"
+    if n_new == 0:
+        return "full", "no appended rows"
+
+    n_added = int(state["n_rows_incremental"]) + n_new
+    if n_added > INCREMENTAL_MAX_NEW_FRACTION * int(state["n_rows_full"]):
+        return "full", (f"{n_added} rows added since the last full training "
+                        f"(limit {INCREMENTAL_MAX_NEW_FRACTION:.0%} of {state['n_rows_full']})")
+
+    drift = feature_drift(state, X[new_mask])
+    if drift > INCREMENTAL_DRIFT_THRESHOLD:
+        return "full", f"feature drift {drift:.3f} > {INCREMENTAL_DRIFT_THRESHOLD}"
+    return "incremental", f"{n_new} new row(s), drift {drift:.3f}"
+
+
+def replay_positions(
+        y_encoded: np.ndarray,
+        candidates: np.ndarray,
+        n_rows: int = INCREMENTAL_REPLAY_ROWS,
+        random_state: int = 42
+) -> np.ndarray:
+    """Stratified sample of `candidates` (row positions), preserving the class proportions."""
+    if len(candidates) <= n_rows:
+        return np.sort(candidates)
+    rng = np.random.default_rng(random_state)
+    y_cand = y_encoded[candidates]
+    picked = []
+    for cls in np.unique(y_cand):
+        cls_pos = candidates[y_cand == cls]
+        k = max(1, int(round(n_rows * len(cls_pos) / len(candidates))))
+        picked.append(rng.choice(cls_pos, size=min(k, len(cls_pos)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+# ==========================================================
+# Warm-start continuation of fitted models
+# ==========================================================
+def continue_training(
+        model,
+        X: pd.DataFrame,
+        y: np.ndarray,
+        sample_weight: np.ndarray = None,
+        n_rounds: int = INCREMENTAL_ROUNDS,
+        forest_set: Tuple = None
+):
+    """
+    Continue training a fitted model on an update set instead of training it from scratch.
+
+    - XGBoost / LightGBM / CatBoost: `n_rounds` extra boosting rounds on top of the fitted
+      booster (`xgb_model` / `init_model`), starting from the best iteration if early stopping was used.
+    - RandomForest: `warm_start`, adding `n_rounds` trees. Trees are independent, so they are
+      grown on `forest_set` (the full training set with the new rows) when given: a forest mixing
+      trees of the replay-heavy update set with the original ones would average two distributions.
+    - MLP: `partial_fit` passes.
+    - LogisticRegression: refitted on the update set (`warm_start` only speeds up the convex fit,
+      the previous solution is replaced); callers with the full training set should refit on it.
+    - Pipelines (the fitted scaler is kept), fold bags and StackingClassifier base models
+      are updated recursively; a StackingClassifier keeps its meta-learner.
+
+    Args:
+        model: Fitted model.
+        X (pd.DataFrame): Update features.
+        y (np.ndarray): Update labels (encoded like the original training labels).
+        sample_weight (np.ndarray, optional): Per-row weights.
+        n_rounds (int, optional): Extra boosting rounds / trees. Defaults to INCREMENTAL_ROUNDS.
+        forest_set (Tuple, optional): (X, y, sample_weight) the added RandomForest trees are grown on.
+            Defaults to the update set.
+
+    Returns:
+        The updated model (boosters are new objects; other models are updated in place).
+    """
+    if isinstance(model, FoldBaggedClassifier):
+        return FoldBaggedClassifier([continue_training(m, X, y, sample_weight, n_rounds, forest_set)
+                                     for m in model.fold_models])
+
+    if isinstance(model, Pipeline):
+        Xt, forest_Xt = X, forest_set[0] if forest_set is not None else None
+        for _, step in model.steps[:-1]:
+            Xt = step.transform(Xt)
+            forest_Xt = step.transform(forest_Xt) if forest_Xt is not None else None
+        if forest_set is not None:
+            forest_set = (forest_Xt,) + tuple(forest_set[1:])
+        name, last = model.steps[-1]
+        model.steps[-1] = (name, continue_training(last, Xt, y, sample_weight, n_rounds, forest_set))
+        return model
+
+    if isinstance(model, StackingClassifier):
+        model.estimators_ = [continue_training(est, X, y, sample_weight, n_rounds, forest_set)
+                             for est in model.estimators_]
+        for (name, _), est in zip(model.estimators, model.estimators_):
+            model.named_estimators_[name] = est
+        return model
+
+    if isinstance(model, XGBClassifier):
+        booster = model.get_booster()
+        best_iteration = getattr(model, "best_iteration", None)
+        if best_iteration is not None:
+            booster = booster[: best_iteration + 1]
+        updated = clone(model).set_params(n_estimators=n_rounds, early_stopping_rounds=None)
+        updated.fit(X, y, sample_weight=sample_weight, xgb_model=booster, verbose=False)
+        return updated
+
+    if isinstance(model, LGBMClassifier):
+        booster = model.booster_
+        if model.best_iteration_:
+            booster = Booster(model_str=booster.model_to_string(num_iteration=model.best_iteration_))
+        updated = clone(model).set_params(n_estimators=n_rounds)
+        updated.fit(X, y, sample_weight=sample_weight, init_model=booster)
+        return updated
+
+    if isinstance(model, CatBoostClassifier):
+        updated = clone(model).set_params(iterations=n_rounds, allow_writing_files=False)
+        updated.fit(X, y, sample_weight=sample_weight, init_model=model, verbose=False)
+        return updated
+
+    if isinstance(model, RandomForestClassifier):
+        if forest_set is not None:
+            X, y, sample_weight = forest_set
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + n_rounds)
+        model.fit(X, y, sample_weight=sample_weight)
+        model.set_params(warm_start=False)
+        return model
+
+    if isinstance(model, MLPClassifier):
+        # partial_fit has no validation split; the setting is restored for later full fits.
+        # A model fitted with early stopping tracks no training loss yet (as sklearn initialises it)
+        early_stopping = model.early_stopping
+        model.set_params(early_stopping=False)
+        if model.best_loss_ is None:
+            model.best_loss_ = np.inf
+        for _ in range(INCREMENTAL_MLP_EPOCHS):
+            model.partial_fit(X, y, sample_weight=sample_weight)
+        model.set_params(early_stopping=early_stopping)
+        return model
+
+    if isinstance(model, LogisticRegression):
+        model.set_params(warm_start=True)
+        model.fit(X, y, sample_weight=sample_weight)
+        model.set_params(warm_start=False)
+        return model
+
+    raise TypeError(f"Incremental training is not supported for {type(model).__name__}.")
+
+
+# ==========================================================
+# Package updates per pipeline
+# ==========================================================
+def _load_package(path: str) -> Dict:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _save_package(path: str, package: Dict) -> None:
+    package["incremental_updates"] = package.get("incremental_updates", 0) + 1
+    package["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(path, "wb") as f:
+        pickle.dump(package, f)
+    print(f"💾 Updated → {path}")
+
+
+def _update_ensemble(
+        output_folder: str,
+        X: pd.DataFrame,
+        y_encoded: np.ndarray,
+        replay_pos: np.ndarray,
+        new_pos: np.ndarray,
+        class_weight_penalizing: bool,
+        le_target=None,
+        groups: np.ndarray = None,
+        cv=None
+) -> None:
+    update_pos = np.concatenate([replay_pos, new_pos])
+    X_up, y_up = X.iloc[update_pos], y_encoded[update_pos]
+    sample_weight = compute_sample_weight("balanced", y_up) if class_weight_penalizing else None
+    # Added RandomForest trees see every row, base catalog included in its original proportion
+    forest_set = (X, y_encoded, compute_sample_weight("balanced", y_encoded) if class_weight_penalizing else None)
+
+    new_probas, updated_models = {}, {}
+    for _, name in BASE_ESTIMATORS:
+        path = os.path.join(output_folder, f"trained_{name.lower()}.pkl")
+        package = _load_package(path)
+        start = time.time()
+        # Pre-update probabilities of the new rows: out-of-sample meta-features for the stacking update
+        new_probas[name] = package["model"].predict_proba(X.iloc[new_pos])
+        updated_models[name] = continue_training(package["model"], X_up, y_up, sample_weight,
+                                                 forest_set=forest_set)
+        package["model"] = updated_models[name]
+        _save_package(path, package)
+        print(f"  {name}: continued on {len(update_pos)} rows ({time.time() - start:.1f}s)")
+
+    path = os.path.join(output_folder, "stacking_model.pkl")
+    if not os.path.exists(path):
+        return
+    package = _load_package(path)
+    stacking = package["trained_models"]["Stacking"]
+    stacking_oof = None
+    if isinstance(stacking, OOFStackingClassifier):
+        # The meta-learner is cheap to fit: refit it on the full meta-feature set as at training time,
+        # cached OOF probabilities for the earlier rows and the pre-update base models' probabilities
+        # for the new rows (which those models never saw); a fold-bagged meta-learner becomes one fit
+        cv_results = package.get("cv_results", {})
+        old_pos = np.setdiff1d(np.arange(len(X)), new_pos)
+        if all(len(cv_results.get(name, {}).get("oof_proba", ())) > old_pos.max(initial=-1)
+               for _, name in BASE_ESTIMATORS):
+            # Rows in X order, so the meta-features line up with y_encoded and groups
+            old_meta = _stack_probas([cv_results[name]["oof_proba"][old_pos] for _, name in BASE_ESTIMATORS])
+            meta_X = np.empty((len(X), old_meta.shape[1]))
+            meta_X[old_pos] = old_meta
+            meta_X[new_pos] = _stack_probas([new_probas[name] for _, name in BASE_ESTIMATORS])
+            final_estimator = stacking.final_estimator
+            if isinstance(final_estimator, FoldBaggedClassifier):
+                final_estimator = final_estimator.fold_models[0]
+            if cv is not None and groups is not None:
+                # Stacking OOF probabilities of the refitted meta-learner, to re-tune the class thresholds
+                stacking_oof = cross_val_predict(clone(final_estimator), meta_X, y_encoded, groups=groups, cv=cv,
+                                                 method="predict_proba")
+            final_estimator = clone(final_estimator).fit(meta_X, y_encoded)
+            print(f"  Stacking: meta-learner refitted on {len(meta_X)} OOF rows")
+        else:
+            final_estimator = stacking.final_estimator
+        stacking = OOFStackingClassifier(base_models=updated_models, final_estimator=final_estimator)
+    else:
+        stacking = continue_training(stacking, X_up, y_up, sample_weight, forest_set=forest_set)
+
+    # Thresholds tuned for the previous models would be stale: re-tune them on the refitted
+    # meta-learner's OOF probabilities, or fall back to argmax
+    if stacking_oof is not None and le_target is not None:
+        threshold_configs = optimize_class_thresholds(
+            y_true=y_encoded,
+            y_proba=stacking_oof,
+            class_labels=list(le_target.classes_),
+            save_path=os.path.join(output_folder, "threshold_configs.json"),
+            **SERVED_THRESHOLD_SEARCH
+        )
+        set_class_thresholds(package, threshold_configs)
+    elif package.pop("class_thresholds", None) is not None:
+        package.pop("threshold_metrics", None)
+        print("  Stacking: class thresholds dropped (tuned for the previous models); predictions use argmax")
+    package["trained_models"]["Stacking"] = stacking
+    _save_package(path, package)
+
+
+def _update_binary(
+        output_folder: str,
+        X: pd.DataFrame,
+        y_encoded: np.ndarray,
+        le_target,
+        replay_pos: np.ndarray,
+        new_pos: np.ndarray
+) -> None:
+    labels = le_target.inverse_transform(y_encoded)
+    update_pos = np.concatenate([replay_pos, new_pos])
+    update_pos = update_pos[np.isin(labels[update_pos], ["CONFIRMED", "FALSE POSITIVE"])]
+    if len(update_pos) == 0:
+        return
+    y_bin = (labels[update_pos] == "CONFIRMED").astype(int)
+
+    path = os.path.join(output_folder, "binary_categories_model.pkl")
+    package = _load_package(path)
+    package["trained_models"]["XGBoost"] = continue_training(package["trained_models"]["XGBoost"],
+                                                             X.iloc[update_pos], y_bin)
+    _save_package(path, package)
+
+
+def _update_multistep(
+        output_folder: str,
+        X: pd.DataFrame,
+        y_encoded: np.ndarray,
+        replay_pos: np.ndarray,
+        new_pos: np.ndarray
+) -> None:
+    prefix = os.path.join(output_folder, "multistep_nn_xgb")
+    update_pos = np.concatenate([replay_pos, new_pos])
+    X_up, y_up = X.iloc[update_pos], y_encoded[update_pos]
+    planet = (y_up == 0) | (y_up == 1)
+
+    package = _load_package(f"{prefix}_multistep.pkl")
+    trained_models = package["trained_models"]
+    trained_models["Stage1_MLP"] = continue_training(trained_models["Stage1_MLP"], X_up, planet.astype(int))
+    if planet.any():
+        trained_models["Stage2_XGB"] = continue_training(trained_models["Stage2_XGB"], X_up[planet], y_up[planet])
+
+    with open(f"{prefix}_stage1.pkl", "wb") as f:
+        pickle.dump(trained_models["Stage1_MLP"], f)
+    with open(f"{prefix}_stage2.pkl", "wb") as f:
+        pickle.dump(trained_models["Stage2_XGB"], f)
+    _save_package(f"{prefix}_multistep.pkl", package)
+
+
+def incremental_update(
+        pipeline: str,
+        output_folder: str,
+        X: pd.DataFrame,
+        y_encoded: np.ndarray,
+        le_target,
+        new_mask: np.ndarray,
+        dataset_key: str,
+        class_weight_penalizing: bool = False,
+        groups: np.ndarray = None,
+        cv=None
+) -> bool:
+    """
+    Warm-start the models of a previous training run on newly appended rows.
+
+    The session's packages are updated in place (see `continue_training`) on the new rows plus a
+    stratified replay of INCREMENTAL_REPLAY_ROWS base catalog rows. Nothing is changed, and False
+    is returned, when `plan_update` asks for a full retrain (no/incompatible previous state,
+    too many rows added since the last full training, or feature drift).
+
+    Args:
+        pipeline (str): One of INCREMENTAL_PIPELINES ("all" updates the three model families).
+        output_folder (str): Folder holding the previous run's packages and training state.
+        X (pd.DataFrame): Feature matrix of base catalog + appended rows.
+        y_encoded (np.ndarray): Encoded 3-class labels.
+        le_target: Fitted label encoder.
+        new_mask (np.ndarray): True for the appended rows.
+        dataset_key (str): Identifies the base catalog and preprocessing mode.
+        class_weight_penalizing (bool, optional): Ensemble only: balanced sample weights.
+        groups (np.ndarray, optional): Ensemble only: group id (kepid) of every row, with `cv`.
+        cv (optional): Ensemble only: the run's fold splitter. With `groups`, the stacking class
+            thresholds are re-tuned on the refitted meta-learner's OOF probabilities; without, they are dropped.
+
+    Returns:
+        bool: True if the models were updated incrementally, False if a full retrain is needed.
+    """
+    if pipeline not in INCREMENTAL_PIPELINES:
+        raise ValueError(f"Unknown pipeline '{pipeline}' (expected one of {INCREMENTAL_PIPELINES}).")
+
+    print("\n" + "=" * 60)
+    print("INCREMENTAL UPDATE")
+    print("=" * 60)
+
+    state = load_training_state(output_folder)
+    mode, reason = plan_update(state, pipeline, X, new_mask, le_target, dataset_key)
+    if mode == "full":
+        print(f"↻ Full retrain: {reason}")
+        return False
+    print(f"⚡ Warm-start update: {reason}")
+
+    start = time.time()
+    new_pos = np.flatnonzero(new_mask)
+    replay_pos = replay_positions(y_encoded, np.flatnonzero(~new_mask))
+    try:
+        if pipeline in ("ensemble", "all"):
+            _update_ensemble(output_folder, X, y_encoded, replay_pos, new_pos,
+                             class_weight_penalizing=state.get("class_weight_penalizing", class_weight_penalizing),
+                             le_target=le_target, groups=groups, cv=cv)
+        if pipeline in ("binary_categories", "all"):
+            _update_binary(output_folder, X, y_encoded, le_target, replay_pos, new_pos)
+        if pipeline in ("multistep", "all"):
+            _update_multistep(output_folder, X, y_encoded, replay_pos, new_pos)
+    except (OSError, KeyError, pickle.UnpicklingError) as e:
+        print(f"↻ Full retrain: previous model packages unusable ({e})")
+        return False
+
+    save_training_state(output_folder, pipeline, X, le_target, dataset_key,
+                        previous_state=state, n_new_rows=len(new_pos))
+    print(f"✅ Incremental update complete ({len(new_pos)} new + {len(replay_pos)} replayed rows, "
+          f"{time.time() - start:.1f}s)")
+    return True
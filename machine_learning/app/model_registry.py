@@ -0,0 +1,99 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+# Budget of the in-process model cache, measured by the packages' pickle sizes on disk
+MODEL_CACHE_MB = float(os.environ.get("ML_MODEL_CACHE_MB", "1024"))
+
+
+class ModelRegistry:
+    """
+    Size-bounded LRU of deserialized model packages, shared by all requests of a process.
+
+    Entries are keyed by absolute path and validated against the file's mtime and size, so a
+    package rewritten by (re)training is loaded again on its next use. When the cached packages
+    exceed the budget, the least recently used ones are evicted. Cached packages are shared:
+    callers must treat them as read-only.
+
+    Args:
+        max_bytes (int): Budget in bytes of pickle size on disk (a proxy for memory footprint).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def load(self, path: str, verbose: bool = True):
+        """
+        Return the unpickled package at `path`, from memory when the file is unchanged.
+
+        Args:
+            path (str): Path to a .pkl model package.
+            verbose (bool, optional): Prints logs or not. Defaults to True.
+
+        Returns:
+            The deserialized package.
+        """
+        abs_path = os.path.abspath(path)
+        stat = os.stat(abs_path)
+
+        with self._lock:
+            entry = self._entries.get(abs_path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                self._entries.move_to_end(abs_path)
+                self.hits += 1
+                if verbose:
+                    print(f"⚡ Model package served from memory cache ({self.hits} hits, {self.misses} misses)")
+                return entry["package"]
+            self.misses += 1
+
+        # Unpickle outside the lock so loads of other packages are not serialized behind this one
+        with open(abs_path, "rb") as f:
+            package = pickle.load(f)
+
+        with self._lock:
+            self._entries.pop(abs_path, None)
+            if stat.st_size > self.max_bytes:
+                if verbose:
+                    print(f"⚠️ Model package ({stat.st_size / 1e6:.0f} MB) exceeds the model cache budget; not cached")
+                return package
+            self._entries[abs_path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "package": package}
+            while self.cached_bytes > self.max_bytes:
+                evicted_path, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                if verbose:
+                    print(f"♻️ Evicted model package from memory cache: {evicted_path}")
+        return package
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "cached_mb": round(self.cached_bytes / 1e6, 1),
+                "max_mb": round(self.max_bytes / 1e6, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+MODEL_REGISTRY = ModelRegistry(max_bytes=int(MODEL_CACHE_MB * 1e6))
+
+
+def load_model_package(path: str, verbose: bool = True):
+    """Load a model package through the process-wide `MODEL_REGISTRY`."""
+    return MODEL_REGISTRY.load(path, verbose=verbose)
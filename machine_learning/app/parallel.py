@@ -0,0 +1,145 @@
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from threadpoolctl import threadpool_limits
+
+from booster_data import fit_on_shared_data, uses_shared_data
+from early_stopping import fit_with_early_stopping
+
+# Cores available to training (override with the ML_N_JOBS environment variable)
+N_JOBS = int(os.environ.get("ML_N_JOBS", "0")) or (os.cpu_count() or 1)
+
+# Thread-count parameter of each estimator family
+_THREAD_PARAMS = ("n_jobs", "thread_count", "nthread")
+
+
+def resolve_n_jobs(n_jobs: int = None) -> int:
+    """
+    Number of cores to use: `n_jobs` if given (negative values count back from cpu_count,
+    like joblib), otherwise `N_JOBS`.
+    """
+    if n_jobs is None:
+        return N_JOBS
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def with_threads(model, n_threads: int):
+    """
+    Set the thread count of an (unfitted) estimator so concurrent fits do not oversubscribe cores.
+
+    Handles XGBoost/LightGBM/RandomForest (`n_jobs`) and CatBoost (`thread_count`); for
+    pipelines the setting is applied to every step that exposes one of those parameters.
+
+    Args:
+        model: sklearn-compatible estimator (modified in place).
+        n_threads (int): Threads the estimator may use.
+
+    Returns:
+        The same estimator.
+    """
+    params = model.get_params(deep=True)
+    updates = {k: n_threads for k in params if k.rsplit("__", 1)[-1] in _THREAD_PARAMS}
+    if updates:
+        model.set_params(**updates)
+    return model
+
+
+def _run_limited(fn: Callable, n_threads: int, args: tuple) -> Any:
+    # Caps OpenMP/BLAS pools too (e.g. numpy inside MLP training)
+    with threadpool_limits(limits=n_threads):
+        return fn(*args, n_threads=n_threads)
+
+
+def run_tasks(fn: Callable, tasks: Iterable[tuple], n_jobs: int = None) -> List[Any]:
+    """
+    Run `fn(*task, n_threads=...)` for every task, concurrently in a process pool.
+
+    Workers are loky processes (reused across calls); each task gets
+    `n_jobs // n_workers` threads so the total stays within `n_jobs` cores.
+    With a single core the tasks run inline, without any pool.
+
+    Args:
+        fn (Callable): Module-level function (must be picklable) accepting `n_threads`.
+        tasks (Iterable[tuple]): Positional arguments of each call.
+        n_jobs (int, optional): Cores to use. Defaults to `N_JOBS`.
+
+    Returns:
+        List[Any]: Results in task order.
+    """
+    tasks = list(tasks)
+    n_jobs = resolve_n_jobs(n_jobs)
+    n_workers = min(n_jobs, len(tasks)) or 1
+    n_threads = max(1, n_jobs // n_workers)
+    if n_workers == 1:
+        return [_run_limited(fn, n_threads, args) for args in tasks]
+    return Parallel(n_jobs=n_workers, backend="loky")(
+        delayed(_run_limited)(fn, n_threads, args) for args in tasks
+    )
+
+
+def fit_task(
+        model,
+        X: pd.DataFrame,
+        y: np.ndarray,
+        train_idx: np.ndarray | None,
+        val_idx: np.ndarray | None,
+        sample_weight: np.ndarray | None,
+        early_stopping_rounds: int | None = None,
+        data_token: str | None = None,
+        train_rows: np.ndarray | None = None,
+        keep_model: bool = False,
+        n_threads: int = 1
+) -> Dict:
+    """
+    Fit one clone of `model` (runs inside a worker process, see `run_tasks`).
+
+    Shared by the ensemble and multi-step trainers.
+
+    With `val_idx` set this is a CV fold: returns validation probabilities, train predictions and,
+    with `early_stopping_rounds`, the best iteration on the validation fold.
+    With `train_idx=None` the model is fitted on all rows and returned.
+    With `data_token`, the boosters (CatBoost, XGBoost, LightGBM) train on row subsets of containers
+    binned once per process (see `booster_data`).
+    `train_rows` selects the training rows (positions within the fold) scored for train accuracy.
+    `keep_model` also returns the fitted fold model (fold bagging).
+    """
+    start = time.time()
+    m = with_threads(clone(model), n_threads)
+    shared = data_token is not None and uses_shared_data(m)
+    if train_idx is None:
+        if shared:
+            fit_on_shared_data(m, X, y, data_token)
+        else:
+            m.fit(X, y)
+        return {"model": m, "time": time.time() - start}
+
+    X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+    best_iteration = None
+    if shared:
+        best_iteration = fit_on_shared_data(m, X, y, data_token, train_idx, val_idx, sample_weight,
+                                            early_stopping_rounds=early_stopping_rounds)
+    else:
+        y_train, y_val = y[train_idx], y[val_idx]
+        fold_weight = sample_weight[train_idx] if sample_weight is not None else None
+        if early_stopping_rounds:
+            best_iteration = fit_with_early_stopping(m, X_train, y_train, X_val, y_val,
+                                                     rounds=early_stopping_rounds, sample_weight=fold_weight)
+        elif fold_weight is not None:
+            m.fit(X_train, y_train, sample_weight=fold_weight)
+        else:
+            m.fit(X_train, y_train)
+    train_pred = m.predict(X_train.iloc[train_rows]) if train_rows is not None else None
+    return {
+        "val_proba": m.predict_proba(X_val),
+        "train_pred": train_pred,
+        "best_iteration": best_iteration,
+        "model": m if keep_model else None,
+        "time": time.time() - start,
+    }
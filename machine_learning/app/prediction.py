@@ -1,11 +1,78 @@
-import pickle
 import time
+from typing import Dict, Tuple
 
 import numpy as np
 import pandas as pd
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix, \
     classification_report
 
+from model_registry import load_model_package, MODEL_REGISTRY
+from threshold_optimization import apply_class_thresholds
+
+# Stage 1 planet-probability cutoff of multi-step packages saved without a tuned one (the hand-tuned value)
+DEFAULT_STAGE1_THRESHOLD = 0.25
+
+
+def predict_package(package, X: pd.DataFrame, verbose: bool = True) -> Tuple[np.ndarray, Dict | None]:
+    """
+    Encoded predictions of a loaded model package (multi-step cascade, ensemble/stacking/binary
+    package or raw model), applying the thresholds stored in the package.
+
+    Args:
+        package: Unpickled model package (dict) or raw model.
+        X (pd.DataFrame): Features in `features.json` order (no target column).
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        Tuple[np.ndarray, Dict | None]: (encoded predictions, per-class thresholds applied or None)
+    """
+    class_thresholds = None
+    model_type = package.get("model_type") if isinstance(package, dict) else None
+    if model_type == "multi-step_nn_xgb":
+        s1 = package["trained_models"]["Stage1_MLP"]
+        s2 = package["trained_models"]["Stage2_XGB"]
+        # Cutoff chosen by the OOF threshold sweep at training time (older packages: the hand-tuned default)
+        stage1_threshold = package.get("stage1_threshold", DEFAULT_STAGE1_THRESHOLD)
+        if verbose:
+            print(f"→ Multi-step pipeline detected (Stage1 + Stage2), Stage 1 threshold {stage1_threshold:.2f}")
+
+        stage1_pred = (s1.predict_proba(X)[:, 1] > stage1_threshold).astype(int)
+        preds = np.full(len(X), 2, dtype=int)  # Default = FALSE POSITIVE
+        planet_idx = np.where(stage1_pred == 1)[0]
+        if len(planet_idx) > 0:
+            preds[planet_idx] = s2.predict(X.iloc[planet_idx])
+    else:
+        # handle single-model pickles and ensemble/stacking/binary packages
+        if isinstance(package, dict):
+            # check for dict types like stacking_ensemble, binary_xgboost, etc.
+            if "trained_models" in package and isinstance(package["trained_models"], dict):
+                model = list(package["trained_models"].values())[0]
+                if verbose:
+                    print(f"→ Using first trained model from package: {type(model).__name__}")
+            elif "model" in package:
+                model = package["model"]
+                if verbose:
+                    print(f"→ Using model from package: {type(model).__name__}")
+            else:
+                raise ValueError("⚠️ No valid model found inside the provided package dictionary.")
+        else:
+            # raw model object
+            model = package
+            if verbose:
+                print(f"→ Using raw model: {type(model).__name__}")
+
+        # Per-class thresholds tuned on the OOF probabilities at training time (if stored in the package)
+        class_thresholds = package.get("class_thresholds") if isinstance(package, dict) else None
+        if class_thresholds:
+            if verbose:
+                print("→ Applying class thresholds: CANDIDATE {cand_threshold:.2f}, CONFIRMED {conf_threshold:.2f}, "
+                      "FALSE POSITIVE {fp_threshold:.2f}".format(**class_thresholds))
+            preds = apply_class_thresholds(model.predict_proba(X), class_thresholds)
+        else:
+            preds = model.predict(X)
+
+    return preds, class_thresholds
+
 
 def run_prediction(
         model_path: str,
@@ -31,18 +98,20 @@ def run_prediction(
     print("LOADING MODEL PACKAGE")
     print("=" * 60)
 
-    with open(model_path, "rb") as f:
-        package = pickle.load(f)
+    # Deserialized packages are kept in the process-wide LRU (reloaded when the file changes);
+    # they are shared between requests and must not be modified here
+    package = load_model_package(model_path)
 
     if isinstance(package, dict):
         model_type = package.get("model_type", "unknown")
         le = package.get("label_encoder")
-        trained_models = package.get("trained_models")
     else:
         model_type = type(package).__name__  # e.g., "XGBClassifier"
         le = None
-        trained_models = {"BaseModel": package}
     print(f"Loaded model type: {model_type}")
+    refit_strategy = package.get("refit_strategy", "refit") if isinstance(package, dict) else "refit"
+    if refit_strategy == "bag":
+        print("Fold-bagged package: probabilities are averaged over the CV fold models")
 
     # ------------------------------------------
     # Check dataset (if provided)
@@ -65,34 +134,7 @@ def run_prediction(
     print("=" * 60)
     start = time.time()
 
-    if model_type == "multi-step_nn_xgb":
-        s1 = trained_models["Stage1_MLP"]
-        s2 = trained_models["Stage2_XGB"]
-        print("→ Multi-step pipeline detected (Stage1 + Stage2)")
-
-        stage1_pred = (s1.predict_proba(X)[:, 1] > 0.25).astype(int)
-        preds = np.full(len(X), 2, dtype=int)  # Default = FALSE POSITIVE
-        planet_idx = np.where(stage1_pred == 1)[0]
-        if len(planet_idx) > 0:
-            preds[planet_idx] = s2.predict(X.iloc[planet_idx])
-    else:
-        # handle single-model pickles and ensemble/stacking/binary packages
-        if isinstance(package, dict):
-            # check for dict types like stacking_ensemble, binary_xgboost, etc.
-            if "trained_models" in package and isinstance(package["trained_models"], dict):
-                model = list(package["trained_models"].values())[0]
-                print(f"→ Using first trained model from package: {type(model).__name__}")
-            elif "model" in package:
-                model = package["model"]
-                print(f"→ Using model from package: {type(model).__name__}")
-            else:
-                raise ValueError("⚠️ No valid model found inside the provided package dictionary.")
-        else:
-            # raw model object
-            model = package
-            print(f"→ Using raw model: {type(model).__name__}")
-
-        preds = model.predict(X)
+    preds, class_thresholds = predict_package(package, X)
 
     elapsed = time.time() - start
     print(f"Inference completed in {elapsed:.2f}s")
@@ -149,7 +191,10 @@ def run_prediction(
         "model_info": {
             "model_path": model_path,
             "model_type": model_type,
+            "refit_strategy": refit_strategy,
+            "class_thresholds": class_thresholds,
             "elapsed_s": elapsed,
+            "model_cache": MODEL_REGISTRY.stats(),
         },
         "row_results": row_results
     }
@@ -0,0 +1,56 @@
+import os
+import time
+from typing import Dict
+
+from dataset_cache import load_base_dataset
+from feature_cache import load_engineered_base
+
+# Fill the shared caches at server start-up (override with ML_PRELOAD=false)
+PRELOAD = os.environ.get("ML_PRELOAD", "true").lower() == "true"
+
+
+def preload_shared_state(
+        dataset_path: str,
+        cache_dir: str = None,
+        verbose: bool = True
+) -> Dict:
+    """
+    Load the base catalog and its engineered features into the process-wide caches.
+
+    Run in the gunicorn master (`preload_app`), the loaded state is inherited by every forked
+    worker and its pages stay shared until written: the engineered frame is memory-mapped
+    (`MMAP_FEATURES`). Model packages are not preloaded: only session folders are served, and
+    they are written by training jobs after start-up (MODEL_REGISTRY loads them on first use).
+    Failures are reported and skipped, so the server still starts.
+
+    Args:
+        dataset_path (str): Path to the base catalog CSV.
+        cache_dir (str, optional): Directory of the dataset / feature caches.
+            Defaults to the `.cache` folder next to the CSV.
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        Dict: {"dataset_rows", "engineered_rows" (per drop_fpflags mode), "elapsed_s"}
+    """
+    start = time.time()
+    summary = {"dataset_rows": None, "engineered_rows": {}, "elapsed_s": None}
+    if verbose:
+        print("\n" + "=" * 60)
+        print("PRELOADING SHARED STATE")
+        print("=" * 60)
+
+    try:
+        summary["dataset_rows"] = len(load_base_dataset(dataset_path, cache_dir=cache_dir, copy=False,
+                                                        verbose=verbose))
+        # Both preprocessing modes: requests choose drop_fpflags
+        for drop_fpflags in (True, False):
+            _, df_engineered = load_engineered_base(dataset_path, drop_fpflags=drop_fpflags,
+                                                    cache_dir=cache_dir, verbose=verbose)
+            summary["engineered_rows"][str(drop_fpflags).lower()] = len(df_engineered)
+    except Exception as e:
+        print(f"⚠️ Could not preload the base catalog ({e}); it will be loaded on first use.")
+
+    summary["elapsed_s"] = round(time.time() - start, 1)
+    if verbose:
+        print(f"✅ Preloading complete in {summary['elapsed_s']}s.")
+    return summary
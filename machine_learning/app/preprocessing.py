@@ -1,5 +1,178 @@
+import pickle
+from typing import Dict, List
+
 import pandas as pd
 
+DROP_COLUMNS = [
+    'rowid',  # identifier
+    'kepid',  # identifier
+    'kepoi_name',  # identifier
+    'kepler_name',  # official confirmed planet name -> leakage
+    'koi_pdisposition',  # preliminary disposition -> leakage
+    'koi_score',  # internal assessment -> leakage
+    'koi_tce_delivname',  # data delivery batch name
+    'koi_teq_err1',  # empty column
+    'koi_teq_err2'  # empty column
+]
+# False-positive flags (which lead to leakage): dropped or zero-filled
+FPFLAG_COLUMNS = ["koi_fpflag_nt", "koi_fpflag_ss", "koi_fpflag_co", "koi_fpflag_ec"]
+
+
+class KOIPreprocessor:
+    """
+    Fit/transform version of `clean_koi_dataset`.
+
+    `fit` learns the cleaning rules from the training frame (columns to drop, numeric
+    columns and their medians, categorical columns whose missing values drop the row);
+    `transform` applies exactly those rules to any frame, so inference only needs the
+    rows being scored. The fitted object is pickled next to the trained models.
+
+    Args:
+        drop_fpflags (bool, optional):
+            If True, drop the four false-positive flag columns.
+            If False, keep them and fill missing values with 0. Defaults to True.
+    """
+
+    def __init__(self, drop_fpflags: bool = True):
+        self.drop_fpflags = drop_fpflags
+        self.drop_columns_: List[str] = []
+        self.zero_fill_columns_: List[str] = []
+        self.numeric_columns_: List[str] = []
+        self.medians_: Dict[str, float] = {}
+        self.categorical_columns_: List[str] = []
+        self.n_rows_fitted_: int = 0
+
+    def fit(self, df: pd.DataFrame) -> "KOIPreprocessor":
+        """
+        Learn drop list, fpflag handling, numeric medians and categorical columns from `df`.
+
+        Args:
+            df (pd.DataFrame): Raw training dataset.
+
+        Returns:
+            KOIPreprocessor: self
+        """
+        drop_cols = DROP_COLUMNS + (FPFLAG_COLUMNS if self.drop_fpflags else [])
+        self.drop_columns_ = [c for c in drop_cols if c in df.columns]
+        df = df.drop(columns=self.drop_columns_)
+
+        self.zero_fill_columns_ = [] if self.drop_fpflags else [c for c in FPFLAG_COLUMNS if c in df.columns]
+        if self.zero_fill_columns_:
+            df = df.assign(**{c: df[c].fillna(0) for c in self.zero_fill_columns_})
+
+        self.numeric_columns_ = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
+        self.medians_ = {c: float(v) for c, v in df[self.numeric_columns_].median().items()}
+        self.categorical_columns_ = df.select_dtypes(include=["object"]).columns.tolist()
+        self.n_rows_fitted_ = len(df)
+        return self
+
+    def transform(self, df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+        """
+        Apply the learned cleaning rules (no statistics are recomputed).
+
+        Args:
+            df (pd.DataFrame): Raw rows (training or scoring).
+            verbose (bool, optional): Prints logs or not. Defaults to True.
+
+        Returns:
+            pd.DataFrame: Cleaned DataFrame, ready for feature engineering.
+        """
+        if verbose:
+            print("\n" + "=" * 60)
+            print("PREPROCESSING")
+            print("=" * 60)
+            print("STEP 1: Removing identifier and leakage columns")
+
+        cols_to_drop = [c for c in self.drop_columns_ if c in df.columns]
+        df = df.drop(columns=cols_to_drop)
+        if verbose:
+            if self.drop_fpflags:
+                print("Dropping false-positive flag columns (leakage).")
+            else:
+                print("Keeping false-positive flag columns — will fill missing values with 0.")
+            print(f"Dropped {len(cols_to_drop)} columns: {cols_to_drop}\n")
+
+        # --- Fill numeric columns ---
+        if verbose:
+            print("=" * 60)
+            print("STEP 2: Handling missing numeric values with median")
+
+        # Fill with 0 for kept fpflag columns
+        for col in self.zero_fill_columns_:
+            if col in df.columns:
+                missing_before = df[col].isnull().sum()
+                df[col] = df[col].fillna(0)
+                if verbose:
+                    print(f"  {col}: filled {missing_before} NaN(s) with 0")
+
+        # Median fill for all other numeric columns (learned medians)
+        if verbose:
+            print(f"\nHandling numeric columns with median values:")
+        counter = 0
+        for col in self.numeric_columns_:
+            if col not in df.columns:
+                # Column absent from the scoring rows: use the training median
+                df[col] = self.medians_[col]
+                continue
+            if df[col].dtype == "object":
+                # e.g. all-None JSON fields
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            missing_before = df[col].isnull().sum()
+            if missing_before == 0:
+                continue
+            counter += 1
+            median_val = self.medians_[col]
+            df[col] = df[col].fillna(median_val)
+
+            remaining = df[col].isnull().sum()
+            if not verbose:
+                continue
+            if remaining > 0:
+                print(
+                    f"  [{counter}] ⚠️ {col}: "
+                    f"{missing_before} NaN(s) → {remaining} still remain after fill."
+                )
+            else:
+                print(
+                    f"  [{counter}] {col}: "
+                    f"filled {missing_before} NaN(s) with median={median_val:.4f}"
+                )
+
+        # --- Fill categorical columns ---
+        cat_cols = [c for c in self.categorical_columns_ if c in df.columns]
+        if verbose:
+            print("=" * 60)
+            print(f"\nSTEP 3: Removing rows with missing categorical values "
+                  f"(total categorical columns: {len(cat_cols)})")
+        for i, col in enumerate(cat_cols, start=1):
+            missing_count = df[col].isnull().sum()
+            if missing_count > 0:
+                before = len(df)
+                df = df.dropna(subset=[col])
+                removed = before - len(df)
+                if verbose:
+                    print(f"  [{i}/{len(cat_cols)}] {col}: removed {removed} rows with missing values.")
+            elif verbose:
+                print(f"  [{i}/{len(cat_cols)}] {col}: no missing values found.")
+        if verbose:
+            print(f"After removing rows with missing categorical values: {len(df)} rows remain.")
+            print("✅ Data cleaning complete!\n")
+
+        return df.copy()
+
+    def fit_transform(self, df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+        return self.fit(df).transform(df, verbose=verbose)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+        print(f"💾 Saved fitted preprocessor → {path}")
+
+    @staticmethod
+    def load(path: str) -> "KOIPreprocessor":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
 
 def clean_koi_dataset(df: pd.DataFrame, drop_fpflags: bool = True) -> pd.DataFrame:
     """
@@ -22,110 +195,14 @@ def clean_koi_dataset(df: pd.DataFrame, drop_fpflags: bool = True) -> pd.DataFra
             1. Drop known identifier and target-leaky columns.
             2. Replace numeric columns with median values (robust to outliers).
             3. Remove rows if category is missing.
-            4. Encode target labels ('koi_disposition') into numeric form.
 
         Columns dropped (if present):
             - 'rowid', 'kepid', 'kepoi_name', 'kepler_name'
             - 'koi_pdisposition', 'koi_score', 'koi_tce_delivname'
             - 'koi_teq_err1', 'koi_teq_err2'
             - 'koi_fpflag_nt', 'koi_fpflag_ss', 'koi_fpflag_co', 'koi_fpflag_ec'
+
+        Medians are computed on `df` itself; use `KOIPreprocessor` to reuse
+        training statistics on new rows.
     """
-    print("\n" + "=" * 60)
-    print("PREPROCESSING")
-    print("=" * 60)
-    print("STEP 1: Removing identifier and leakage columns")
-
-    drop_cols = [
-        'rowid',  # identifier
-        'kepid',  # identifier
-        'kepoi_name',  # identifier
-        'kepler_name',  # official confirmed planet name -> leakage
-        'koi_pdisposition',  # preliminary disposition -> leakage
-        'koi_score',  # internal assessment -> leakage
-        'koi_tce_delivname',  # data delivery batch name
-        'koi_teq_err1',  # empty column
-        'koi_teq_err2'  # empty column
-    ]
-    # Handle false-positive flags (which leads to leakage) based on parameter
-    zero_fill_cols = ["koi_fpflag_nt", "koi_fpflag_ss", "koi_fpflag_co", "koi_fpflag_ec"]
-    if drop_fpflags:
-        drop_cols.extend(zero_fill_cols)
-        print("Dropping false-positive flag columns (leakage).")
-    else:
-        print("Keeping false-positive flag columns — will fill missing values with 0.")
-
-    cols_to_drop = [c for c in drop_cols if c in df.columns]
-    df = df.drop(columns=cols_to_drop)
-    print(f"Dropped {len(cols_to_drop)} columns: {cols_to_drop}\n")
-
-    # --- Fill numeric columns ---
-    print("=" * 60)
-    print("STEP 2: Handling missing numeric values with median")
-
-    # Fill with 0 for kept fpflag columns
-    if not drop_fpflags:
-        for col in zero_fill_cols:
-            if col in df.columns:
-                missing_before = df[col].isnull().sum()
-                df[col] = df[col].fillna(0)
-                print(f"  {col}: filled {missing_before} NaN(s) with 0")
-
-    # Median fill for all other numeric columns
-    num_cols = df.select_dtypes(include=["float64", "int64"]).columns
-    print(f"\nHandling numeric columns with median values:")
-
-    counter = 0
-    for i, col in enumerate(num_cols, start=1):
-        missing_before = df[col].isnull().sum()
-        if missing_before == 0:
-            continue
-        counter += 1
-        median_val = df[col].median()
-        # df[col].fillna(median_val, inplace=True)
-        df[col] = df[col].fillna(df[col].median())
-
-        remaining = df[col].isnull().sum()
-        if remaining > 0:
-            print(
-                f"  [{counter}] ⚠️ {col}: "
-                f"{missing_before} NaN(s) → {remaining} still remain after fill."
-            )
-        else:
-            print(
-                f"  [{counter}] {col}: "
-                f"filled {missing_before} NaN(s) with median={median_val:.4f}"
-            )
-
-    # --- Fill categorical columns ---
-    print("=" * 60)
-    cat_cols = df.select_dtypes(include=["object"]).columns
-    print(f"\nSTEP 3: Removing rows with missing categorical values "
-          f"(total categorical columns: {len(cat_cols)})")
-    for i, col in enumerate(cat_cols, start=1):
-        missing_count = df[col].isnull().sum()
-        if missing_count > 0:
-            before = len(df)
-            df = df.dropna(subset=[col])
-            after = len(df)
-            removed = before - after
-            print(f"  [{i}/{len(cat_cols)}] {col}: removed {removed} rows with missing values.")
-        else:
-            print(f"  [{i}/{len(cat_cols)}] {col}: no missing values found.")
-    print(f"After removing rows with missing categorical values: {len(df)} rows remain.")
-
-    # # --- Encode target ---
-    # if "koi_disposition" not in df.columns:
-    #     raise KeyError("Target column 'koi_disposition' not found in dataset.")
-    #
-    # print("=" * 60)
-    # print("STEP 4: Encoding target labels")
-    #
-    # le_target = LabelEncoder()
-    # le_target.fit_transform(df["koi_disposition"])
-    #
-    # print(f"Encoded target classes: {list(le_target.classes_)}")
-    # print(f"Class counts: {df['koi_disposition'].value_counts().to_dict()}")
-    # print("=" * 60)
-    print("✅ Data cleaning complete!\n")
-
-    return df.copy()
+    return KOIPreprocessor(drop_fpflags=drop_fpflags).fit_transform(df)
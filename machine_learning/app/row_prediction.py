@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from feature_extraction import compute_features, resolve_features
+from model_registry import load_model_package
+from prediction import predict_package
+
+# Largest request served by the row path (bigger batches belong to POST /predict)
+MAX_PREDICT_ROWS = int(os.environ.get("ML_PREDICT_ROWS_MAX", "1000"))
+
+# Compiled plans: features.json path -> {"key": (features mtime/size, preprocessor mtime/size), "plan": RowFeaturePlan}
+_PLAN_CACHE: Dict[str, Dict] = {}
+_LOCK = threading.Lock()
+
+
+class RowFeaturePlan:
+    """
+    Cleaning + feature engineering of a session, compiled once for scoring JSON records.
+
+    Mirrors `KOIPreprocessor.transform` → `create_advanced_features` → column alignment of
+    `app.predict` on plain NumPy arrays: raw numeric columns are read from the records, filled
+    with the persisted medians (0 for kept fpflag columns), the engineered features of
+    `features.json` are evaluated with `compute_features`, and the matrix is laid out in
+    `features.json` order (features that cannot be computed are 0, as in `app.predict`).
+
+    Unlike the DataFrame path, rows are never dropped: every record gets a prediction.
+
+    Args:
+        preprocessor (KOIPreprocessor): Fitted preprocessor of the session.
+        features (List[str]): Feature columns the models were trained on (`features.json`).
+    """
+
+    def __init__(self, preprocessor, features: List[str]):
+        self.features = list(features)
+        zero_fill = set(preprocessor.zero_fill_columns_)
+        # Columns of a cleaned frame: numeric training columns (missing ones get the median)
+        columns = list(preprocessor.numeric_columns_) + [c for c in preprocessor.zero_fill_columns_
+                                                         if c not in preprocessor.medians_]
+        self.fill_values = {c: 0.0 if c in zero_fill else preprocessor.medians_[c] for c in columns}
+        self.plan, self.raw_inputs, self.outputs = resolve_features(columns, self.features)
+        outputs = set(self.outputs)
+        self.raw_features = [c for c in self.features if c not in outputs and c in self.fill_values]
+
+    def transform(self, records: Sequence[Mapping]) -> np.ndarray:
+        """
+        Build the model input matrix for `records`.
+
+        Args:
+            records (Sequence[Mapping]): KOI records (column name -> value; missing keys,
+                None and non-numeric values count as missing).
+
+        Returns:
+            np.ndarray: (n_records x n_features) float matrix in `features.json` order.
+        """
+        n_rows = len(records)
+        env = {c: _column(records, c, self.fill_values[c]) for c in self.raw_inputs}
+        float_block, float_names, int_block, int_names = compute_features(env, self.plan, self.outputs, n_rows)
+
+        computed = {name: float_block[i] for i, name in enumerate(float_names)}
+        computed.update({name: int_block[i] for i, name in enumerate(int_names)})
+        for c in self.raw_features:
+            computed[c] = env[c] if c in env else _column(records, c, self.fill_values[c])
+
+        X = np.zeros((n_rows, len(self.features)), dtype=np.float64)
+        for j, name in enumerate(self.features):
+            values = computed.get(name)
+            if values is not None:
+                X[:, j] = values
+        return X
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _column(records: Sequence[Mapping], column: str, fill_value: float) -> np.ndarray:
+    """One raw column of the records as floats, missing values replaced by `fill_value`."""
+    values = [record.get(column) for record in records]
+    try:
+        array = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # e.g. "" or other strings sent by a client: coerce like pd.to_numeric(errors="coerce")
+        array = np.array([_to_float(v) for v in values], dtype=np.float64)
+    array[np.isnan(array)] = fill_value
+    return array
+
+
+def _file_key(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_row_plan(output_folder: str) -> RowFeaturePlan:
+    """
+    Compiled `RowFeaturePlan` of a session folder, rebuilt when its preprocessor or features change.
+
+    Args:
+        output_folder (str): Folder holding `preprocessor.pkl` and `features.json`.
+
+    Returns:
+        RowFeaturePlan: The plan (shared between requests; read-only).
+    """
+    preprocessor_path = os.path.join(output_folder, "preprocessor.pkl")
+    features_path = os.path.abspath(os.path.join(output_folder, "features.json"))
+    if not os.path.exists(preprocessor_path):
+        raise FileNotFoundError("No fitted preprocessor in this session (trained before it was persisted); "
+                                "retrain or use POST /predict.")
+    key = (_file_key(features_path), _file_key(preprocessor_path))
+
+    with _LOCK:
+        cached = _PLAN_CACHE.get(features_path)
+        if cached and cached["key"] == key:
+            return cached["plan"]
+
+    with open(features_path, "r") as f:
+        features = json.load(f)
+    plan = RowFeaturePlan(load_model_package(preprocessor_path, verbose=False), features)
+    with _LOCK:
+        _PLAN_CACHE[features_path] = {"key": key, "plan": plan}
+    return plan
+
+
+def predict_rows(records: Sequence[Mapping], model_path: str, output_folder: str) -> Dict:
+    """
+    Score a small batch of JSON records without the DataFrame preprocessing pipeline.
+
+    Uses the session's compiled `RowFeaturePlan` and the cached model package; no statistics
+    are recomputed and nothing is written to disk. Labels in the records are ignored.
+
+    Args:
+        records (Sequence[Mapping]): KOI records (raw catalog columns).
+        model_path (str): Path to the session's .pkl model package.
+        output_folder (str): Session folder with `preprocessor.pkl` and `features.json`.
+
+    Returns:
+        Dict: {"decoded_predictions": [...], "model_info": {...}}
+    """
+    if not records:
+        raise ValueError("No records provided.")
+    if len(records) > MAX_PREDICT_ROWS:
+        raise ValueError(f"{len(records)} records exceed the row endpoint limit of {MAX_PREDICT_ROWS}; "
+                         f"use POST /predict for batches.")
+
+    start = time.perf_counter()
+    plan = load_row_plan(output_folder)
+    package = load_model_package(model_path, verbose=False)
+    # Models were fitted on DataFrames: keep their feature names at the model boundary
+    X = pd.DataFrame(plan.transform(records), columns=plan.features, copy=False)
+    preds, class_thresholds = predict_package(package, X, verbose=False)
+
+    le = package.get("label_encoder") if isinstance(package, dict) else None
+    decoded_preds = le.inverse_transform(np.ravel(preds)) if le is not None else np.ravel(preds)
+    elapsed = time.perf_counter() - start
+    return {
+        "decoded_predictions": decoded_preds.tolist(),
+        "model_info": {
+            "model_path": model_path,
+            "model_type": package.get("model_type", "unknown") if isinstance(package, dict) else type(package).__name__,
+            "class_thresholds": class_thresholds,
+            "rows": len(records),
+            "elapsed_ms": round(elapsed * 1000, 3),
+        }
+    }
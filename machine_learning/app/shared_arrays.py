@@ -0,0 +1,69 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Keep the engineered base frame in memory-mapped files (override with ML_MMAP_FEATURES=false)
+MMAP_FEATURES = os.environ.get("ML_MMAP_FEATURES", "true").lower() == "true"
+
+
+def _array_path(prefix: str, dtype: np.dtype) -> str:
+    return f"{prefix}.{dtype.name}.npy"
+
+
+def _write_array(path: str, array: np.ndarray) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + f".{os.getpid()}.tmp"
+    # File handle: np.save would append ".npy" to the temporary name
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def memory_map_frame(df: pd.DataFrame, prefix: str, verbose: bool = True) -> pd.DataFrame:
+    """
+    Equivalent of `df` whose numeric columns are views of memory-mapped `.npy` files.
+
+    Numeric columns are grouped by dtype into one (n_columns x n_rows) array per dtype, written
+    once to `<prefix>.<dtype>.npy` and mapped copy-on-write: every process mapping the same file
+    (forked or restarted workers, training jobs) shares its pages through the OS page cache, and
+    a process that writes to the frame only copies the pages it touches. Other columns stay in
+    process memory. Column order, index and dtypes are unchanged.
+
+    Args:
+        df (pd.DataFrame): Frame to map (unique column names).
+        prefix (str): Path prefix of the array files; must identify the frame's content
+            (existing files with the right shape are reused as is).
+        verbose (bool, optional): Prints logs or not. Defaults to True.
+
+    Returns:
+        pd.DataFrame: The memory-mapped frame, or `df` itself if the files cannot be written.
+    """
+    if not df.columns.is_unique:
+        return df
+
+    groups: Dict[np.dtype, List[str]] = {}
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+            groups.setdefault(dtype, []).append(column)
+
+    mapped: Dict[str, np.ndarray] = {}
+    try:
+        for dtype, columns in groups.items():
+            path = _array_path(prefix, dtype)
+            shape = (len(columns), len(df))
+            array = np.load(path, mmap_mode="c") if os.path.exists(path) else None
+            if array is None or array.shape != shape or array.dtype != dtype:
+                _write_array(path, np.stack([df[c].to_numpy(dtype=dtype) for c in columns]))
+                array = np.load(path, mmap_mode="c")
+                if verbose:
+                    print(f"💾 Memory-mapped {len(columns)} {dtype.name} column(s) → {path}")
+            # Row i of the C-ordered array is column i: each column is one contiguous view
+            mapped.update({column: array[i] for i, column in enumerate(columns)})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not memory-map frame ({e}); keeping it in process memory.")
+        return df
+
+    return pd.DataFrame({c: mapped[c] if c in mapped else df[c] for c in df.columns},
+                        index=df.index, columns=df.columns, copy=False)
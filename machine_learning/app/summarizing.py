@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 import pandas as pd
 from sklearn.metrics import (
@@ -7,6 +9,38 @@ from sklearn.metrics import (
 )
 from sklearn.preprocessing import LabelEncoder
 
+# Train-set diagnostics in the CV fold loops: "off", "sampled" (fixed-size random subset) or "full"
+TRAIN_DIAGNOSTICS = os.environ.get("ML_TRAIN_DIAGNOSTICS", "sampled")
+TRAIN_DIAGNOSTICS_SAMPLE_SIZE = 1000
+
+
+def train_diagnostics_rows(
+        train_idx: np.ndarray,
+        level: str = TRAIN_DIAGNOSTICS,
+        sample_size: int = TRAIN_DIAGNOSTICS_SAMPLE_SIZE,
+        random_state: int = 42
+) -> np.ndarray | None:
+    """
+    Training rows to score for the fold's train-accuracy diagnostic.
+
+    Args:
+        train_idx (np.ndarray): Training rows of the fold.
+        level (str, optional): "off", "sampled" or "full". Defaults to TRAIN_DIAGNOSTICS.
+        sample_size (int, optional): Rows scored in "sampled" mode.
+        random_state (int, optional): Seed of the sample.
+
+    Returns:
+        np.ndarray | None: Positions within the fold's training rows (sorted), or None for "off".
+    """
+    if level == "off":
+        return None
+    if level == "full" or len(train_idx) <= sample_size:
+        return np.arange(len(train_idx))
+    if level == "sampled":
+        rng = np.random.default_rng(random_state)
+        return np.sort(rng.choice(len(train_idx), size=sample_size, replace=False))
+    raise ValueError(f"Unknown train diagnostics level '{level}' (expected 'off', 'sampled' or 'full').")
+
 
 def evaluate_the_best_model(
         cv_results: dict,
@@ -1,9 +1,128 @@
 import json
+import pickle
 from typing import Dict, Tuple, List
 
 import numpy as np
 import pandas as pd
-from sklearn.metrics import accuracy_score, recall_score, classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix
+
+# Upper bound on (grid points x samples) predicted at once by the grid search (bounds peak memory)
+GRID_CHUNK_CELLS = 2 ** 22
+
+THRESHOLD_OBJECTIVES = ("candidate_recall", "macro_recall", "macro_f1")
+
+# Search for the served stacking package (training and incremental updates): a balanced objective,
+# at most one point of accuracy lost against argmax
+SERVED_THRESHOLD_SEARCH = {
+    "objective": "macro_f1",
+    "conf_min_recall": 0.8,
+    "max_accuracy_drop": 0.01,
+    "cand_range": (0.20, 0.50, 0.01),
+    "conf_range": (0.35, 0.70, 0.01),
+    "fp_range": (0.50, 0.90, 0.01)
+}
+
+
+def apply_class_thresholds(y_proba: np.ndarray, thresholds: Dict[str, float]) -> np.ndarray:
+    """
+    Predict classes with per-class probability thresholds instead of argmax.
+
+    A row goes to FALSE POSITIVE if its probability exceeds `fp_threshold`, else to CONFIRMED
+    above `conf_threshold`, else to CANDIDATE above `cand_threshold`, else to its argmax class.
+
+    Args:
+        y_proba (np.ndarray): Predicted probabilities (n_samples x 3).
+        thresholds (Dict[str, float]): "cand_threshold", "conf_threshold" and "fp_threshold".
+
+    Returns:
+        np.ndarray: Encoded predictions.
+    """
+    preds = np.argmax(y_proba, axis=1)
+    preds[y_proba[:, 0] > thresholds["cand_threshold"]] = 0
+    preds[y_proba[:, 1] > thresholds["conf_threshold"]] = 1
+    preds[y_proba[:, 2] > thresholds["fp_threshold"]] = 2
+    return preds
+
+
+def _grid_confusion_counts(
+        y_true: np.ndarray,
+        y_proba: np.ndarray,
+        cand_grid: np.ndarray,
+        conf_grid: np.ndarray,
+        fp_grid: np.ndarray,
+        chunk_cells: int = GRID_CHUNK_CELLS
+) -> np.ndarray:
+    """
+    Confusion matrices of `apply_class_thresholds` for every (cand, conf, fp) grid point.
+
+    The per-class threshold masks are computed once per axis; grid points are then evaluated
+    in chunks as one broadcast prediction tensor, counted with a single bincount per chunk.
+
+    Returns:
+        np.ndarray: Counts of shape (len(cand_grid), len(conf_grid), len(fp_grid), 3, 3),
+            indexed [..., true, predicted].
+    """
+    n = len(y_true)
+    argmax_pred = np.argmax(y_proba, axis=1).astype(np.int8)
+    cand_mask = y_proba[None, :, 0] > cand_grid[:, None]
+    conf_mask = y_proba[None, :, 1] > conf_grid[:, None]
+    fp_mask = y_proba[None, :, 2] > fp_grid[:, None]
+    # CANDIDATE-or-argmax predictions only depend on the CANDIDATE threshold
+    base_pred = np.where(cand_mask, np.int8(0), argmax_pred[None, :])
+    true_code = np.asarray(y_true, dtype=np.int64) * 3
+
+    grid_shape = (len(cand_grid), len(conf_grid), len(fp_grid))
+    n_points = int(np.prod(grid_shape))
+    counts = np.empty((n_points, 9), dtype=np.int64)
+    chunk = max(1, chunk_cells // max(n, 1))
+    for start in range(0, n_points, chunk):
+        point = np.arange(start, min(start + chunk, n_points))
+        i, j, k = np.unravel_index(point, grid_shape)
+        preds = np.where(fp_mask[k], np.int8(2), np.where(conf_mask[j], np.int8(1), base_pred[i]))
+        codes = (np.arange(len(point))[:, None] * 9 + true_code[None, :] + preds).ravel()
+        counts[point] = np.bincount(codes, minlength=len(point) * 9).reshape(len(point), 9)
+    return counts.reshape(grid_shape + (3, 3))
+
+
+
+
+def _scores_from_counts(counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Accuracy, per-class recall / precision and macro scores of confusion matrices.
+
+    Args:
+        counts (np.ndarray): Confusion matrices of shape (..., 3, 3), indexed [..., true, predicted].
+
+    Returns:
+        Dict[str, np.ndarray]: "accuracy", "macro_recall", "macro_f1" of shape (...),
+            "recall" and "precision" of shape (..., 3).
+    """
+    correct = np.diagonal(counts, axis1=-2, axis2=-1)
+    recall = correct / np.maximum(counts.sum(axis=-1), 1)
+    precision = correct / np.maximum(counts.sum(axis=-2), 1)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(denom), where=denom > 0)
+    return {
+        "accuracy": correct.sum(axis=-1) / np.maximum(counts.sum(axis=(-2, -1)), 1),
+        "recall": recall,
+        "precision": precision,
+        "macro_recall": recall.mean(axis=-1),
+        "macro_f1": f1.mean(axis=-1)
+    }
+
+
+def _prediction_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    """Summary metrics of one set of encoded predictions (argmax or thresholded), as stored in the configs."""
+    scores = _scores_from_counts(confusion_matrix(y_true, y_pred, labels=[0, 1, 2]))
+    return {
+        "accuracy": float(scores["accuracy"]),
+        "macro_recall": float(scores["macro_recall"]),
+        "macro_f1": float(scores["macro_f1"]),
+        "candidate_recall": float(scores["recall"][0]),
+        "confirmed_recall": float(scores["recall"][1]),
+        "false_positive_recall": float(scores["recall"][2]),
+        "candidate_precision": float(scores["precision"][0])
+    }
 
 
 def optimize_class_thresholds(
@@ -14,11 +133,13 @@ def optimize_class_thresholds(
         cand_range: Tuple[float, float, float] = (0.30, 0.40, 0.02),
         conf_range: Tuple[float, float, float] = (0.45, 0.60, 0.05),
         fp_range: Tuple[float, float, float] = (0.65, 0.75, 0.05),
-        save_path: str = "threshold_configs.json"
+        save_path: str = "threshold_configs.json",
+        objective: str = "candidate_recall",
+        max_accuracy_drop: float = None
 ) -> Dict[str, Dict]:
     """
     Optimize class-specific thresholds for 3-class exoplanet classification
-    to improve CANDIDATE recall while maintaining CONFIRMED recall above a threshold.
+    to improve `objective` while maintaining CONFIRMED recall above a threshold.
 
     Args:
         y_true (np.ndarray): Encoded ground truth labels (0=CANDIDATE, 1=CONFIRMED, 2=FALSE POSITIVE).
@@ -29,83 +150,81 @@ def optimize_class_thresholds(
         conf_range (Tuple[float, float, float], optional): (start, stop, step) for CONFIRMED threshold search.
         fp_range (Tuple[float, float, float], optional): (start, stop, step) for FALSE POSITIVE threshold search.
         save_path (str, optional): JSON file path to save threshold configs. Default "threshold_configs.json".
+        objective (str, optional): Score maximized, one of THRESHOLD_OBJECTIVES. Default "candidate_recall".
+        max_accuracy_drop (float, optional): Largest allowed accuracy loss against argmax. Default None (unbounded).
 
     Returns:
         Dict[str, Dict]:
             {
-                "default": {...},
-                "optimized": {...}
+                "default": {...},    # argmax metrics
+                "optimized": {...}   # thresholds, metrics, objective, whether they lie on the grid edge
             }
+            Empty if no configuration satisfies the constraints.
     """
-
-    def predict_with_thresholds(y_proba, t_cand, t_conf, t_fp):
-        """Applies custom thresholds per class instead of argmax."""
-        preds = np.argmax(y_proba, axis=1)
-        cand_mask = y_proba[:, 0] > t_cand
-        conf_mask = y_proba[:, 1] > t_conf
-        fp_mask = y_proba[:, 2] > t_fp
-        preds[cand_mask] = 0
-        preds[conf_mask] = 1
-        preds[fp_mask] = 2
-        return preds
+    if objective not in THRESHOLD_OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}' (expected one of {THRESHOLD_OBJECTIVES}).")
 
     print("\n" + "=" * 60)
-    print("THRESHOLD OPTIMIZATION FOR CANDIDATE RECALL")
+    print(f"THRESHOLD OPTIMIZATION FOR {objective.replace('_', ' ').upper()}")
     print("=" * 60)
-    print("Searching for optimal thresholds (constraint: CONFIRMED recall > {:.0f}%)".format(conf_min_recall * 100))
-
-    best_result = {"cand_recall": 0, "thresholds": None, "overall_acc": 0, "conf_recall": 0}
-    results_list = []
-
-    for cand_t in np.arange(*cand_range):
-        for conf_t in np.arange(*conf_range):
-            for fp_t in np.arange(*fp_range):
-                preds = predict_with_thresholds(y_proba, cand_t, conf_t, fp_t)
-                recalls = recall_score(y_true, preds, labels=[0, 1, 2], average=None)
-                cand_recall, conf_recall, fp_recall = recalls
-                acc = accuracy_score(y_true, preds)
-
-                if conf_recall > conf_min_recall:
-                    results_list.append({
-                        "cand_t": cand_t,
-                        "conf_t": conf_t,
-                        "fp_t": fp_t,
-                        "cand_recall": cand_recall,
-                        "conf_recall": conf_recall,
-                        "fp_recall": fp_recall,
-                        "accuracy": acc
-                    })
-
-                    if cand_recall > best_result["cand_recall"]:
-                        best_result.update({
-                            "cand_recall": cand_recall,
-                            "thresholds": (cand_t, conf_t, fp_t),
-                            "overall_acc": acc,
-                            "conf_recall": conf_recall
-                        })
-
-    if not results_list:
-        print("❌ No configurations found that maintain CONFIRMED recall > threshold.")
+    print("Searching for optimal thresholds (constraint: CONFIRMED recall > {:.0f}%{})".format(
+        conf_min_recall * 100,
+        "" if max_accuracy_drop is None else f", accuracy loss vs. argmax <= {max_accuracy_drop:.3f}"))
+
+    cand_grid, conf_grid, fp_grid = np.arange(*cand_range), np.arange(*conf_range), np.arange(*fp_range)
+    grid_shape = (len(cand_grid), len(conf_grid), len(fp_grid))
+    counts = _grid_confusion_counts(y_true, y_proba, cand_grid, conf_grid, fp_grid)
+    print(f"Evaluated {int(np.prod(grid_shape)):,} threshold combinations on {len(y_true):,} samples")
+
+    scores = _scores_from_counts(counts)
+    recalls = scores["recall"].reshape(-1, 3)
+    accuracy = scores["accuracy"].ravel()
+    objective_score = recalls[:, 0] if objective == "candidate_recall" else scores[objective].ravel()
+    cand_t, conf_t, fp_t = (g.ravel() for g in np.meshgrid(cand_grid, conf_grid, fp_grid, indexing="ij"))
+
+    argmax_metrics = _prediction_metrics(y_true, np.argmax(y_proba, axis=1))
+    feasible_mask = recalls[:, 1] > conf_min_recall
+    if max_accuracy_drop is not None:
+        feasible_mask &= accuracy >= argmax_metrics["accuracy"] - max_accuracy_drop
+    feasible = np.flatnonzero(feasible_mask)
+    if len(feasible) == 0:
+        print("❌ No configurations found that satisfy the constraints.")
         return {}
 
-    results_df = pd.DataFrame(results_list).sort_values("cand_recall", ascending=False)
+    # Highest objective; ties go to the first combination in grid order
+    best = feasible[int(np.argmax(objective_score[feasible]))]
+    on_grid_edge = any(i in (0, n - 1) for i, n in zip(np.unravel_index(best, grid_shape), grid_shape))
+    results_df = pd.DataFrame({
+        "cand_t": cand_t[feasible],
+        "conf_t": conf_t[feasible],
+        "fp_t": fp_t[feasible],
+        "cand_recall": recalls[feasible, 0],
+        "conf_recall": recalls[feasible, 1],
+        "fp_recall": recalls[feasible, 2],
+        "macro_recall": scores["macro_recall"].ravel()[feasible],
+        "macro_f1": scores["macro_f1"].ravel()[feasible],
+        "accuracy": accuracy[feasible]
+    }).sort_values("cand_recall" if objective == "candidate_recall" else objective, ascending=False, kind="stable")
 
     print("\nTop 5 Threshold Configurations:")
-    print(results_df[["cand_t", "conf_t", "fp_t", "cand_recall", "conf_recall", "accuracy"]].head())
+    print(results_df.head())
+
+    cand_t, conf_t, fp_t = cand_t[best], conf_t[best], fp_t[best]
+    optimal_pred = apply_class_thresholds(y_proba, {"cand_threshold": cand_t, "conf_threshold": conf_t,
+                                                    "fp_threshold": fp_t})
+    tuned_metrics = _prediction_metrics(y_true, optimal_pred)
 
     print("\n" + "=" * 60)
     print("BEST THRESHOLD CONFIGURATION")
     print("=" * 60)
-    cand_t, conf_t, fp_t = best_result["thresholds"]
     print(f"CANDIDATE threshold: {cand_t:.2f}")
     print(f"CONFIRMED threshold: {conf_t:.2f}")
     print(f"FALSE POSITIVE threshold: {fp_t:.2f}")
-    print(f"\nCANDIDATE recall: {best_result['cand_recall']:.4f}")
-    print(f"CONFIRMED recall: {best_result['conf_recall']:.4f}")
-    print(f"Overall accuracy: {best_result['overall_acc']:.4f}")
+    if on_grid_edge:
+        print("⚠️ Best configuration lies on the edge of the search grid.")
+    for key in (objective, "accuracy", "candidate_recall", "confirmed_recall", "false_positive_recall"):
+        print(f"{key}: {tuned_metrics[key]:.4f} (argmax: {argmax_metrics[key]:.4f})")
 
-    # Apply optimized thresholds for final metrics
-    optimal_pred = predict_with_thresholds(y_proba, cand_t, conf_t, fp_t)
     print("\nClassification Report with Optimal Thresholds:")
     print(classification_report(y_true, optimal_pred, target_names=class_labels))
 
@@ -116,16 +235,16 @@ def optimize_class_thresholds(
     threshold_configs = {
         "default": {
             "mode": "argmax",
-            "accuracy": float(accuracy_score(y_true, np.argmax(y_proba, axis=1))),
-            "candidate_recall": float(recall_score(y_true, np.argmax(y_proba, axis=1),
-                                                   labels=[0, 1, 2], average=None)[0])
+            **argmax_metrics
         },
         "optimized": {
             "cand_threshold": float(cand_t),
             "conf_threshold": float(conf_t),
             "fp_threshold": float(fp_t),
-            "accuracy": float(best_result["overall_acc"]),
-            "candidate_recall": float(best_result["cand_recall"])
+            "objective": objective,
+            "max_accuracy_drop": max_accuracy_drop,
+            "on_grid_edge": bool(on_grid_edge),
+            **tuned_metrics
         }
     }
 
@@ -134,3 +253,69 @@ def optimize_class_thresholds(
         print(f"\n💾 Saved threshold configurations → {save_path}")
 
     return threshold_configs
+
+
+def set_class_thresholds(package: Dict, threshold_configs: Dict[str, Dict]) -> bool:
+    """
+    Store tuned thresholds in a model package dict, where `predict_package` applies them, if they
+    improve on argmax.
+
+    The thresholds are rejected (and any earlier ones removed, so prediction falls back to argmax)
+    when the search found nothing, when the best point lies on the edge of the grid (the optimum
+    may be outside it), when they do not raise the search objective over argmax, or when they
+    lose more accuracy than the search allowed. The argmax-vs-tuned metrics are kept either way
+    under "threshold_metrics".
+
+    Args:
+        package (Dict): Unpickled model package, modified in place.
+        threshold_configs (Dict[str, Dict]): Result of `optimize_class_thresholds`.
+
+    Returns:
+        bool: True if the thresholds were attached.
+    """
+    optimized = threshold_configs.get("optimized") if threshold_configs else None
+    if not optimized:
+        reason = "no configuration satisfies the constraints"
+    elif optimized["on_grid_edge"]:
+        reason = "best configuration lies on the edge of the search grid"
+    elif optimized[optimized["objective"]] <= threshold_configs["default"][optimized["objective"]]:
+        reason = f"no {optimized['objective']} gain over argmax"
+    elif (optimized["max_accuracy_drop"] is not None
+          and optimized["accuracy"] < threshold_configs["default"]["accuracy"] - optimized["max_accuracy_drop"]):
+        reason = "accuracy loss against argmax above the allowed drop"
+    else:
+        reason = None
+
+    package["threshold_metrics"] = {
+        "argmax": threshold_configs.get("default") if threshold_configs else None,
+        "tuned": optimized,
+        "applied": reason is None,
+        "rejected_reason": reason
+    }
+    if reason is None:
+        package["class_thresholds"] = optimized
+    else:
+        package.pop("class_thresholds", None)
+        print(f"⚠️ Class thresholds not attached: {reason}; predictions use argmax.")
+    return reason is None
+
+
+def attach_class_thresholds(package_path: str, threshold_configs: Dict[str, Dict]) -> bool:
+    """
+    Store the optimized thresholds in a saved model package (see `set_class_thresholds`).
+
+    Args:
+        package_path (str): Path to the .pkl model package (dict) the thresholds were tuned for.
+        threshold_configs (Dict[str, Dict]): Result of `optimize_class_thresholds`.
+
+    Returns:
+        bool: True if the thresholds were attached, False if prediction keeps using argmax.
+    """
+    with open(package_path, "rb") as f:
+        package = pickle.load(f)
+    attached = set_class_thresholds(package, threshold_configs)
+    with open(package_path, "wb") as f:
+        pickle.dump(package, f)
+    if attached:
+        print(f"💾 Attached class thresholds → {package_path}")
+    return attached
@@ -4,11 +4,56 @@ from typing import Tuple, Dict
 import numpy as np
 import pandas as pd
 from sklearn.base import clone
-from sklearn.model_selection import StratifiedGroupKFold, cross_validate, cross_val_predict
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.model_selection import StratifiedGroupKFold
 from sklearn.preprocessing import LabelEncoder
 from xgboost import XGBClassifier
 
-from summarizing import evaluate_the_best_model
+from early_stopping import fit_with_early_stopping, median_best_iteration, with_n_estimators
+from parallel import resolve_n_jobs, with_threads
+from summarizing import evaluate_the_best_model, train_diagnostics_rows, TRAIN_DIAGNOSTICS
+
+
+def _cross_validate_single_pass(
+        model,
+        X: pd.DataFrame,
+        y: np.ndarray,
+        groups: np.ndarray,
+        cv: StratifiedGroupKFold,
+        early_stopping_rounds: int = None,
+        train_diagnostics: str = TRAIN_DIAGNOSTICS
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, list]:
+    """
+    One fit per fold: per-fold scores (same keys as `cross_validate` with train scores),
+    OOF labels and OOF probabilities all come from the same fitted fold model.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, list]:
+            (scores, oof_pred, oof_proba, best_iterations)
+    """
+    scorers = {"accuracy": accuracy_score, "precision": precision_score, "recall": recall_score, "f1": f1_score}
+    scores = {f"{split}_{name}": [] for split in ("test", "train") for name in scorers}
+    oof_pred = np.empty(len(y), dtype=int)
+    oof_proba = np.zeros((len(y), 2))
+    best_iterations = []
+    for train_idx, val_idx in cv.split(X, y, groups=groups):
+        m = clone(model)
+        X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+        if early_stopping_rounds:
+            best_iterations.append(
+                fit_with_early_stopping(m, X_train, y[train_idx], X_val, y[val_idx], rounds=early_stopping_rounds)
+            )
+        else:
+            m.fit(X_train, y[train_idx])
+
+        oof_proba[val_idx] = m.predict_proba(X_val)
+        oof_pred[val_idx] = m.predict(X_val)
+        rows = train_diagnostics_rows(train_idx, level=train_diagnostics)
+        train_pred = m.predict(X_train.iloc[rows]) if rows is not None else None
+        for name, scorer in scorers.items():
+            scores[f"test_{name}"].append(scorer(y[val_idx], oof_pred[val_idx]))
+            scores[f"train_{name}"].append(scorer(y[train_idx[rows]], train_pred) if rows is not None else np.nan)
+    return {k: np.array(v) for k, v in scores.items()}, oof_pred, oof_proba, best_iterations
 
 
 def train_binary_planet_model(
@@ -16,7 +61,10 @@ def train_binary_planet_model(
         groups: np.ndarray,
         cv: StratifiedGroupKFold,
         target_column: str = "koi_disposition",
-        save_path: str = None
+        save_path: str = None,
+        early_stopping_rounds: int = None,
+        train_diagnostics: str = TRAIN_DIAGNOSTICS,
+        n_jobs: int = None
 ) -> Tuple[Dict, Dict, Dict, Dict, LabelEncoder]:
     """
     Train a binary CONFIRMED vs FALSE POSITIVE classifier from the engineered KOI dataset, using XGBoost
@@ -25,8 +73,16 @@ def train_binary_planet_model(
     -----
     1. Filter out CANDIDATE class.
     2. Encode labels → CONFIRMED=1, FALSE POSITIVE=0.
-    3. Evaluate XGBoost using StratifiedGroupKFold CV (grouped by kepid).
+    3. Evaluate XGBoost using StratifiedGroupKFold CV (grouped by kepid); a single fit per fold
+       yields the fold scores, OOF labels and OOF probabilities.
     4. Print metrics (accuracy, precision, recall, F1, train accuracy).
+    5. Fit on the full dataset.
+
+    With `early_stopping_rounds`, each CV fold stops on its validation split and the full-data
+    fit uses the median best iteration instead of 500 rounds. `train_diagnostics` ("off",
+    "sampled" or "full") controls how much of each fold's training split is scored for train metrics.
+    `n_jobs` caps the XGBoost threads (defaults to `parallel.N_JOBS`; `all_pipeline` passes its
+    per-family share of the cores).
 
     Returns
     -------
@@ -70,6 +126,7 @@ def train_binary_planet_model(
         random_state=42,
         verbosity=0
     )
+    with_threads(model, resolve_n_jobs(n_jobs))
     models = {"XGBoost": model}
     trained_models = {}
     model_clone = clone(model)
@@ -77,15 +134,15 @@ def train_binary_planet_model(
     # --- 3. Group-aware CV evaluation ---
     print(f"\nEvaluating with StratifiedGroupKFold({cv.get_n_splits()})...")
     start = time.time()
-    scores = cross_validate(
-        model_clone,
-        X_bin,
-        y_bin,
-        groups=groups_bin,
-        cv=cv,
-        scoring=["accuracy", "precision", "recall", "f1"],
-        return_train_score=True
+    y_encoded = y_bin.to_numpy()
+    scores, y_oof_pred, y_oof_proba, best_iterations = _cross_validate_single_pass(
+        model_clone, X_bin, y_encoded, groups_bin, cv, early_stopping_rounds=early_stopping_rounds,
+        train_diagnostics=train_diagnostics
     )
+    if early_stopping_rounds:
+        n_rounds = median_best_iteration(best_iterations)
+        model_clone = with_n_estimators(model_clone, n_rounds)
+        print(f"  Early stopping: best iterations per fold {best_iterations} → {n_rounds} rounds")
     elapsed = time.time() - start
 
     # --- 4. Summarize ---
@@ -108,24 +165,6 @@ def train_binary_planet_model(
     trained_models["XGBoost"] = model_clone
     print("\n✅ All models trained successfully.")
 
-    # Detailed Report
-    print("\nGenerating out-of-fold predictions for detailed report...")
-    y_oof_pred = cross_val_predict(
-        model_clone,
-        X_bin,
-        y_bin,
-        groups=groups_bin,
-        cv=cv,
-        method="predict"
-    )
-    y_oof_proba = cross_val_predict(
-        model_clone,
-        X_bin,
-        y_bin,
-        groups=groups_bin,
-        cv=cv,
-        method="predict_proba"
-    )
     cv_results = {
         "XGBoost": {
             "oof_pred": y_oof_pred,
@@ -134,7 +173,6 @@ def train_binary_planet_model(
     }
     le_target = LabelEncoder()
     le_target.fit(["FALSE POSITIVE", "CONFIRMED"])
-    y_encoded = y_bin.to_numpy()
 
     best_model_metrics_summary = evaluate_the_best_model(
         cv_results=cv_results,
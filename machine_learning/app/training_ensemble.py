@@ -15,7 +15,11 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.utils.class_weight import compute_class_weight
 from xgboost import XGBClassifier
 
-from summarizing import evaluate_the_best_model
+from booster_data import clear_lgbm_binary_cache, dataset_token
+from fold_bagging import check_refit_strategy, FoldBaggedClassifier, REFIT_STRATEGY
+from early_stopping import median_best_iteration, with_n_estimators
+from parallel import fit_task, resolve_n_jobs, run_tasks
+from summarizing import evaluate_the_best_model, train_diagnostics_rows, TRAIN_DIAGNOSTICS
 
 
 def train_ensemble_models(
@@ -25,7 +29,11 @@ def train_ensemble_models(
         cv: StratifiedGroupKFold,
         le_target: LabelEncoder,
         class_weight_penalizing: bool = False,
-        save_prefix: str = None
+        save_prefix: str = None,
+        n_jobs: int = None,
+        early_stopping_rounds: int = None,
+        train_diagnostics: str = TRAIN_DIAGNOSTICS,
+        refit_strategy: str = REFIT_STRATEGY
 ) -> Tuple[Dict, Dict, Dict, Dict]:
     """
     Train multiple ensemble models (XGBoost, LightGBM, CatBoost, RandomForest)
@@ -39,6 +47,15 @@ def train_ensemble_models(
         le_target (LabelEncoder): Label encoder.
         class_weight_penalizing (bool, optional): Weight penalizing (default: False).
         save_prefix (str, optional): Save path. Defaults to None.
+        n_jobs (int, optional): Cores for the concurrent fold/refit fits. Defaults to `parallel.N_JOBS`.
+        early_stopping_rounds (int, optional): If set, boosters stop on each validation fold after
+            this many rounds without improvement and are refitted on the full dataset with the
+            median best iteration. Out-of-fold probabilities then come from each fold's own best
+            iteration and are slightly optimistic. Defaults to None (fixed number of rounds).
+        train_diagnostics (str, optional): Train accuracy per fold: "off", "sampled" (fixed-size
+            subset of the fold's training rows) or "full". Defaults to TRAIN_DIAGNOSTICS.
+        refit_strategy (str, optional): "refit" trains each model again on the full dataset;
+            "bag" keeps the fold models as a `FoldBaggedClassifier`. Defaults to REFIT_STRATEGY.
 
     Returns:
         Tuple[Dict, Dict, Dict]:
@@ -99,6 +116,7 @@ def train_ensemble_models(
             l2_leaf_reg=3,
             random_state=42,
             verbose=False,
+            allow_writing_files=False,  # no catboost_info/ training logs in the working directory
             class_weights=class_weights.tolist() if class_weight_penalizing else None
         ),
         "RandomForest": RandomForestClassifier(
@@ -115,31 +133,67 @@ def train_ensemble_models(
     cv_results = {}
     trained_models = {}
 
-    # Iterate through models
-    for name, model in models.items():
-        print(f"\nTraining {name} with {cv.get_n_splits()}-fold StratifiedGroupKFold CV...")
+    # Per-sample weights for class imbalance (used by the CV fits)
+    sample_weights = None
+    if class_weight_penalizing:
+        sample_weights = np.array([class_weights_dict[y] for y in y_encoded])
+
+    # One task per (model, fold) plus one full-data refit per model, scheduled together.
+    # With early stopping the refits need the folds' best iterations, so they run afterwards.
+    # With fold bagging there is no refit: the fold models are kept instead.
+    bag = check_refit_strategy(refit_strategy) == "bag"
+    folds = list(cv.split(X_scaled, y_encoded, groups=groups))
+    fold_tasks = [(name, fold) for name in models for fold in range(len(folds))]
+    refit_tasks = [] if bag else [(name, None) for name in models]
+    n_jobs = resolve_n_jobs(n_jobs)
+    print(f"\nTraining {len(models)} models × {len(folds)} folds + {len(refit_tasks)} full-data fits "
+          f"({len(fold_tasks) + len(refit_tasks)} tasks) on {n_jobs} core(s)"
+          + (f", early stopping after {early_stopping_rounds} rounds" if early_stopping_rounds else "") + "...")
+    start_time = time.time()
+    # Boosters: bin / quantize the features once (per worker process) and take row subsets per fold
+    token = dataset_token(X_scaled, y_encoded)
+    # Training rows scored for the train-accuracy diagnostic (None = skipped)
+    train_rows = [train_diagnostics_rows(train_idx, level=train_diagnostics) for train_idx, _ in folds]
+
+    def fold_args(name, fold):
+        train_idx, val_idx = folds[fold]
+        return (models[name], X_scaled, y_encoded, train_idx, val_idx, sample_weights, early_stopping_rounds, token,
+                train_rows[fold], bag)
 
-        start_time = time.time()
+    if early_stopping_rounds and refit_tasks:
+        results = dict(zip(fold_tasks, run_tasks(fit_task, [fold_args(*t) for t in fold_tasks], n_jobs=n_jobs)))
+        refit_models = {}
+        for name in models:
+            n_rounds = median_best_iteration([results[(name, fold)]["best_iteration"] for fold in range(len(folds))])
+            refit_models[name] = with_n_estimators(clone(models[name]), n_rounds)
+            if n_rounds is not None:
+                print(f"  {name}: median best iteration {n_rounds} → full-data refit with {n_rounds} rounds")
+        refit_results = run_tasks(fit_task, [(refit_models[name], X_scaled, y_encoded, None, None, None, None, token)
+                                              for name, _ in refit_tasks], n_jobs=n_jobs)
+        results.update(zip(refit_tasks, refit_results))
+    else:
+        all_args = [fold_args(*t) for t in fold_tasks] + \
+                   [(models[name], X_scaled, y_encoded, None, None, None, None, token) for name, _ in refit_tasks]
+        results = dict(zip(fold_tasks + refit_tasks, run_tasks(fit_task, all_args, n_jobs=n_jobs)))
+    print(f"All fits finished in {time.time() - start_time:.1f}s (wall)")
+    clear_lgbm_binary_cache(token)
+
+    # Merge fold results back per model
+    for name in models:
+        print(f"\nTraining {name} with {cv.get_n_splits()}-fold StratifiedGroupKFold CV...")
 
         fold_metrics = {"acc": [], "prec": [], "rec": [], "f1": [], "train_acc": []}
         oof_pred = np.empty(len(y_encoded), dtype=int)
         oof_proba = np.zeros((len(y_encoded), len(np.unique(y_encoded))))
+        elapsed = 0.0
 
-        for fold, (train_idx, val_idx) in enumerate(cv.split(X_scaled, y_encoded, groups=groups), 1):
-            m = clone(model)
-            X_train, X_val = X_scaled.iloc[train_idx], X_scaled.iloc[val_idx]
+        for fold, (train_idx, val_idx) in enumerate(folds, 1):
+            result = results[(name, fold - 1)]
             y_train, y_val = y_encoded[train_idx], y_encoded[val_idx]
-
-            # Fit with per-sample weights for class imbalance
-            if class_weight_penalizing:
-                sample_weights = np.array([class_weights_dict[y] for y in y_train])
-                m.fit(X_train, y_train, sample_weight=sample_weights)
-            else:
-                m.fit(X_train, y_train)
-
-            val_proba = m.predict_proba(X_val)
+            val_proba = result["val_proba"]
             val_pred = val_proba.argmax(axis=1)
-            train_pred = m.predict(X_train)
+            train_pred, rows = result["train_pred"], train_rows[fold - 1]
+            elapsed += result["time"]
 
             oof_pred[val_idx] = val_pred
             oof_proba[val_idx] = val_proba
@@ -149,12 +203,13 @@ def train_ensemble_models(
             fold_metrics["prec"].append(precision_score(y_val, val_pred, average="weighted", zero_division=0))
             fold_metrics["rec"].append(recall_score(y_val, val_pred, average="weighted", zero_division=0))
             fold_metrics["f1"].append(f1_score(y_val, val_pred, average="weighted", zero_division=0))
-            fold_metrics["train_acc"].append(accuracy_score(y_train, train_pred))
+            fold_metrics["train_acc"].append(
+                accuracy_score(y_train[rows], train_pred) if rows is not None else np.nan
+            )
 
             if fold <= 5:
                 print(f"  Fold {fold}: val_acc={fold_metrics['acc'][-1]:.4f}")
 
-        elapsed = time.time() - start_time
         cv_results[name] = {
             "accuracy": np.mean(fold_metrics["acc"]),
             "accuracy_std": np.std(fold_metrics["acc"]),
@@ -162,7 +217,8 @@ def train_ensemble_models(
             "recall": np.mean(fold_metrics["rec"]),
             "f1": np.mean(fold_metrics["f1"]),
             "train_accuracy": np.mean(fold_metrics["train_acc"]),
-            "time": elapsed,
+            "time": elapsed,  # summed fold fit time (folds may have run concurrently)
+            "best_iterations": [results[(name, fold)]["best_iteration"] for fold in range(len(folds))],
             "oof_pred": oof_pred,
             "oof_proba": oof_proba
         }
@@ -190,16 +246,18 @@ def train_ensemble_models(
     print(f"\n🏆 Best model: {best_model_name} "
           f"({cv_results[best_model_name]['accuracy']:.4f})")
 
-    # --- Final training on full data ---
+    # --- Final training on full data (already fitted alongside the folds) ---
     print("\n" + "=" * 60)
-    print("FINAL TRAINING ON FULL DATASET")
+    print("FOLD MODEL BAGGING" if bag else "FINAL TRAINING ON FULL DATASET")
     print("=" * 60)
 
-    for name, model in models.items():
-        m = clone(model)
-        print(f"Training {name} on full dataset...")
-        m.fit(X_scaled, y_encoded)
-        trained_models[name] = m
+    for name in models:
+        if bag:
+            trained_models[name] = FoldBaggedClassifier([results[(name, fold)]["model"] for fold in range(len(folds))])
+            print(f"Bagged {trained_models[name].n_models} fold models of {name} (no full-data refit)")
+        else:
+            print(f"Trained {name} on full dataset ({results[(name, None)]['time']:.1f}s)")
+            trained_models[name] = results[(name, None)]["model"]
 
     best_model_metrics_summary = evaluate_the_best_model(
         cv_results=cv_results,
@@ -220,6 +278,7 @@ def train_ensemble_models(
                     "label_encoder": le_target,
                     "model_name": name,
                     "model_type": "single_ensemble",
+                    "refit_strategy": refit_strategy,
                     "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
                 }, f)
             print(f"💾 Saved individual model → {fname}")
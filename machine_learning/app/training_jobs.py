@@ -0,0 +1,226 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+# Training jobs run concurrently per web worker process (override with ML_TRAIN_WORKERS)
+TRAIN_WORKERS = int(os.environ.get("ML_TRAIN_WORKERS", "1"))
+JOBS_DIR_NAME = ".jobs"
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+_EXECUTOR: ProcessPoolExecutor | None = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def jobs_folder(output_folder: str) -> str:
+    return os.path.join(output_folder, JOBS_DIR_NAME)
+
+
+def _job_path(output_folder: str, job_id: str) -> str:
+    return os.path.join(jobs_folder(output_folder), f"{job_id}.json")
+
+
+def _write_job(path: str, job: Dict) -> None:
+    # Atomic replace: readers in other processes never see a partial file
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _update_job(path: str, **fields) -> Dict:
+    with open(path, "r") as f:
+        job = json.load(f)
+    job.update(fields)
+    _write_job(path, job)
+    return job
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_job(output_folder: str, job_id: str) -> Dict | None:
+    """
+    Current record of a training job (None if unknown).
+
+    A job whose worker process (or, while queued, the submitting web worker) no longer exists
+    (e.g. the server was restarted) is reported as failed.
+
+    Args:
+        output_folder (str): Base output folder holding the job store.
+        job_id (str): Id returned by `submit_training_job`.
+
+    Returns:
+        Dict | None: Job record (status, stages, artifacts, error, ...).
+    """
+    if not job_id or os.path.basename(job_id) != job_id:
+        return None
+    path = _job_path(output_folder, job_id)
+    try:
+        with open(path, "r") as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if job["status"] == "running" and not _pid_alive(job["pid"]):
+        job = _update_job(path, status="failed", finished_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+                          error="Training worker exited before the job finished.")
+    elif job["status"] == "queued" and not _pid_alive(job["submitted_by"]):
+        job = _update_job(path, status="failed", finished_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+                          error="Server process exited before the job started.")
+    return job
+
+
+class _StageLog(io.TextIOBase):
+    """
+    Job stdout: copies everything to the job log and reports each section banner
+    (a title between two `"=" * 60` rules, as printed by the pipelines) as a new stage.
+    """
+
+    def __init__(self, log_file, on_stage: Callable[[str], None]):
+        self._log_file = log_file
+        self._on_stage = on_stage
+        self._pending = ""
+        self._state = 0  # 0: text, 1: opening rule seen, 2: title seen
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._log_file.write(text)
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._line(line.strip())
+        return len(text)
+
+    def flush(self) -> None:
+        self._log_file.flush()
+
+    def _line(self, line: str) -> None:
+        if not line:
+            return
+        if line == "=" * 60:
+            self._state = 1 if self._state != 2 else 0
+        elif self._state == 1:
+            self._state = 2
+            self._on_stage(line)
+        else:
+            self._state = 0
+
+
+def _run_training_job(job_file: str, input_rows: pd.DataFrame, params: Dict, ctx) -> Dict:
+    """Worker-process entry point: run one training pipeline and record its outcome in the job file."""
+    import app as ml_app
+
+    session_folder = ctx.output_folder
+    started = time.time()
+    stages: List[Dict] = []
+
+    def on_stage(name: str) -> None:
+        stages.append({"name": name, "started_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        _update_job(job_file, stage=name, stages=stages)
+
+    _update_job(job_file, status="running", pid=os.getpid(), started_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+    log_path = job_file[:-len(".json")] + ".log"
+    with open(log_path, "w", buffering=1) as log_file:
+        try:
+            with contextlib.redirect_stdout(_StageLog(log_file, on_stage)):
+                pipelines = {
+                    "ensemble": lambda: ml_app.ensemble_pipeline(
+                        input_rows=input_rows, class_weight_penalizing=params["class_weight_penalizing"],
+                        drop_fpflags=params["drop_fpflags"], incremental=params["incremental"], ctx=ctx),
+                    "binary_categories": lambda: ml_app.binary_categories_pipeline(
+                        input_rows=input_rows, drop_fpflags=params["drop_fpflags"],
+                        incremental=params["incremental"], ctx=ctx),
+                    "multistep": lambda: ml_app.multistep_pipeline(
+                        input_rows=input_rows, drop_fpflags=params["drop_fpflags"],
+                        incremental=params["incremental"], ctx=ctx),
+                    "all": lambda: ml_app.all_pipeline(
+                        input_rows=input_rows, class_weight_penalizing=params["class_weight_penalizing"],
+                        drop_fpflags=params["drop_fpflags"], incremental=params["incremental"], ctx=ctx),
+                }
+                pipelines[params["model_type"]]()
+        except Exception as e:
+            return _update_job(job_file, status="failed", finished_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+                               elapsed_s=round(time.time() - started, 1), error=str(e),
+                               trace=traceback.format_exc())
+
+    # Artifacts: session files (re)written by this job
+    artifacts = sorted(
+        os.path.join(session_folder, name) for name in os.listdir(session_folder)
+        if os.path.isfile(os.path.join(session_folder, name))
+        and os.path.getmtime(os.path.join(session_folder, name)) >= started
+    )
+    return _update_job(job_file, status="done", stage=None, finished_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+                       elapsed_s=round(time.time() - started, 1), artifacts=artifacts)
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            # Spawned, single-use workers: no state inherited from the web worker, memory freed after each job
+            _EXECUTOR = ProcessPoolExecutor(max_workers=TRAIN_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            max_tasks_per_child=1)
+        return _EXECUTOR
+
+
+def submit_training_job(
+        output_folder: str,
+        ctx,
+        input_rows: pd.DataFrame,
+        params: Dict
+) -> Tuple[Dict, Future]:
+    """
+    Queue a training pipeline in the local worker pool and return immediately.
+
+    The job record is a JSON file in `<output_folder>/.jobs/`, so any web worker can report
+    its status; the job's stdout goes to a `.log` file next to it.
+
+    Args:
+        output_folder (str): Base output folder holding the job store.
+        ctx (app.RunContext): Run context of the job (its output_folder is the session folder).
+        input_rows (pd.DataFrame): Uploaded rows to train on.
+        params (Dict): "model_type", "class_weight_penalizing", "drop_fpflags", "incremental"
+            (plus anything to echo back, e.g. "user_session_id").
+
+    Returns:
+        Tuple[Dict, Future]: (queued job record, future resolving to the final record)
+    """
+    os.makedirs(jobs_folder(output_folder), exist_ok=True)
+    job_id = uuid.uuid4().hex
+    job_file = _job_path(output_folder, job_id)
+    job = {
+        "job_id": job_id,
+        "status": "queued",
+        "parameters": params,
+        "submitted_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "submitted_by": os.getpid(),
+        "started_at": None,
+        "finished_at": None,
+        "stage": None,
+        "stages": [],
+        "artifacts": [],
+        "error": None,
+        "log_path": job_file[:-len(".json")] + ".log",
+    }
+    _write_job(job_file, job)
+    future = _executor().submit(_run_training_job, job_file, input_rows, params, ctx)
+    return job, future
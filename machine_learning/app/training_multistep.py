@@ -16,6 +16,71 @@ from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
 from xgboost import XGBClassifier
 
+from early_stopping import median_best_iteration, with_n_estimators
+from fold_bagging import check_refit_strategy, FoldBaggedClassifier, REFIT_STRATEGY
+from parallel import fit_task, resolve_n_jobs, run_tasks
+from prediction import DEFAULT_STAGE1_THRESHOLD
+
+# Stage 1 planet-probability cutoffs evaluated for the cascade (DEFAULT_STAGE1_THRESHOLD is the hand-tuned value)
+STAGE1_THRESHOLDS = np.round(np.arange(0.05, 0.951, 0.05), 2)
+
+
+def combine_cascade(
+        stage1_proba: np.ndarray,
+        stage2_pred: np.ndarray,
+        threshold: float = DEFAULT_STAGE1_THRESHOLD
+) -> np.ndarray:
+    """
+    Cascade labels: Stage 2's CANDIDATE (0) / CONFIRMED (1) where Stage 1 calls the row a planet,
+    FALSE POSITIVE (2) elsewhere.
+
+    Args:
+        stage1_proba (np.ndarray): Stage 1 planet probability per row.
+        stage2_pred (np.ndarray): Stage 2 label per row (only used where Stage 1 passes the row).
+        threshold (float, optional): Stage 1 cutoff. Defaults to DEFAULT_STAGE1_THRESHOLD.
+
+    Returns:
+        np.ndarray: Encoded 3-class predictions.
+    """
+    return np.where(np.asarray(stage1_proba) > threshold, stage2_pred, 2).astype(int)
+
+
+def sweep_stage1_threshold(
+        y_encoded: np.ndarray,
+        stage1_proba: np.ndarray,
+        stage2_pred: np.ndarray,
+        thresholds: np.ndarray = STAGE1_THRESHOLDS
+) -> Tuple[float, pd.DataFrame]:
+    """
+    Evaluate the full cascade for every Stage 1 threshold at once (no refitting).
+
+    Args:
+        y_encoded (np.ndarray): Encoded 3-class labels.
+        stage1_proba (np.ndarray): Stage 1 OOF planet probability per row.
+        stage2_pred (np.ndarray): Stage 2 label per row (see `combine_cascade`).
+        thresholds (np.ndarray, optional): Cutoffs to evaluate. Defaults to STAGE1_THRESHOLDS.
+
+    Returns:
+        Tuple[float, pd.DataFrame]: (threshold with the best cascade macro recall, i.e. balanced
+            accuracy over the three classes, the lowest on ties; per-threshold accuracy / macro recall /
+            Stage 1 recall)
+    """
+    thresholds = np.sort(np.asarray(thresholds, dtype=float))
+    passed = np.asarray(stage1_proba)[None, :] > thresholds[:, None]  # (n_thresholds, n_rows)
+    correct = np.where(passed, stage2_pred[None, :], 2) == y_encoded[None, :]
+
+    class_recalls = [correct[:, y_encoded == c].mean(axis=1) for c in np.unique(y_encoded)]
+    sweep = pd.DataFrame({
+        "threshold": thresholds,
+        "accuracy": correct.mean(axis=1),
+        "macro_recall": np.mean(class_recalls, axis=0),
+        "stage1_recall": passed[:, y_encoded != 2].mean(axis=1),
+    })
+    # Macro recall rather than accuracy: accuracy favours FALSE POSITIVE (the majority class)
+    # and drifts to high cutoffs, defeating Stage 1's high-recall role
+    best_threshold = float(thresholds[int(sweep["macro_recall"].to_numpy().argmax())])
+    return best_threshold, sweep
+
 
 def train_multistep_nn_xgb(
         X_data: pd.DataFrame,
@@ -23,7 +88,11 @@ def train_multistep_nn_xgb(
         groups: np.ndarray,
         cv: StratifiedGroupKFold,
         le_target,
-        save_prefix: str = None
+        save_prefix: str = None,
+        early_stopping_rounds: int = None,
+        refit_strategy: str = REFIT_STRATEGY,
+        n_jobs: int = None,
+        stage1_threshold: float = None
 ) -> Tuple[Dict, Dict, Dict, Dict]:
     """
     Multi-step hierarchical classification:
@@ -37,6 +106,15 @@ def train_multistep_nn_xgb(
         cv (StratifiedGroupKFold): Group-aware CV splitter.
         le_target: LabelEncoder used for target decoding.
         save_prefix: models save path prefix.
+        early_stopping_rounds (int, optional): If set, Stage 2 folds stop on their validation split
+            and the full-data Stage 2 model uses the median best iteration (Stage 2 out-of-fold
+            probabilities, taken at each fold's own best iteration, are slightly optimistic). Defaults to None.
+        refit_strategy (str, optional): "refit" trains both stages again on the full data;
+            "bag" keeps each stage's fold models as a `FoldBaggedClassifier`. Defaults to REFIT_STRATEGY.
+        n_jobs (int, optional): Cores shared by both stages' fits, which run as concurrent tasks.
+            Defaults to `N_JOBS`.
+        stage1_threshold (float, optional): Stage 1 planet-probability cutoff. None picks the
+            best (macro recall) of STAGE1_THRESHOLDS for the whole cascade on OOF probabilities. Defaults to None.
 
     Returns:
     Tuple[Dict, Dict, Dict, Dict]:
@@ -50,11 +128,10 @@ def train_multistep_nn_xgb(
     print("MULTI-STEP CLASSIFICATION — MLP + XGBoost")
     print("=" * 60)
 
+    bag = check_refit_strategy(refit_strategy) == "bag"
     models, trained_models, cv_results = {}, {}, {}
 
-    # ------------------- Stage 1 -------------------
-    print("\nStage 1: Neural Network — PLANET vs FALSE POSITIVE (High Recall)")
-
+    # Stage 1: PLANET (CANDIDATE|CONFIRMED) vs FALSE POSITIVE on all rows
     y_stage1 = ((y_encoded == 0) | (y_encoded == 1)).astype(int)
 
     warnings.filterwarnings("ignore", category=RuntimeWarning)
@@ -71,38 +148,9 @@ def train_multistep_nn_xgb(
             random_state=42
         )
     )
-
     models["Stage1_MLP"] = stage1_pipeline
-    stage1_oof_pred = np.empty(len(y_encoded), dtype=int)
-    stage1_oof_proba = np.zeros((len(y_encoded), 2))
-
-    start = time.time()
-    for fold, (tr, va) in enumerate(cv.split(X_data, y_stage1, groups=groups), 1):
-        model_fold = clone(stage1_pipeline)
-        model_fold.fit(X_data.iloc[tr], y_stage1[tr])
-
-        val_proba = model_fold.predict_proba(X_data.iloc[va])
-        stage1_oof_proba[va] = val_proba
-        val_pred = (val_proba[:, 1] > 0.25).astype(int)  # threshold tuned for high recall
-        stage1_oof_pred[va] = val_pred
-
-        if fold <= 5:
-            r = recall_score(y_stage1[va], val_pred)
-            print(f"  Fold {fold}: Recall={r:.4f}")
-
-    stage1_recall = recall_score(y_stage1, stage1_oof_pred)
-    stage1_precision = precision_score(y_stage1, stage1_oof_pred)
-    print(f"\nStage 1 Final: Recall={stage1_recall:.4f}, Precision={stage1_precision:.4f}")
-    print(f"Time: {time.time() - start:.1f}s")
-
-    # Train full Stage1 model
-    trained_stage1 = clone(stage1_pipeline).fit(X_data, y_stage1)
-    trained_models["Stage1_MLP"] = trained_stage1
-    cv_results["Stage1_MLP"] = {"oof_pred": stage1_oof_pred, "oof_proba": stage1_oof_proba}
-
-    # ------------------- Stage 2 -------------------
-    print("\nStage 2: XGBoost — CANDIDATE vs CONFIRMED (High Precision)")
 
+    # Stage 2: CANDIDATE vs CONFIRMED on the planet rows
     planet_mask = (y_encoded == 0) | (y_encoded == 1)
     X_planets = X_data[planet_mask]
     y_planets = y_encoded[planet_mask]
@@ -121,18 +169,104 @@ def train_multistep_nn_xgb(
         random_state=42,
         verbosity=0
     )
-
     models["Stage2_XGB"] = stage2_model
-    stage2_oof_pred = np.empty(len(y_planets), dtype=int)
 
-    for fold, (tr, va) in enumerate(cv.split(X_planets, y_planets, groups=groups_planets), 1):
-        m = clone(stage2_model)
-        m.fit(X_planets.iloc[tr], y_planets[tr])
-        val_pred = m.predict(X_planets.iloc[va])
-        stage2_oof_pred[va] = val_pred
+    # The stages are independent until they are combined: their fold fits and full-data fits run
+    # as one batch of tasks sharing the cores. With early stopping the Stage 2 refit needs the
+    # folds' best iterations, so it runs afterwards.
+    stage1_folds = list(cv.split(X_data, y_stage1, groups=groups))
+    stage2_folds = list(cv.split(X_planets, y_planets, groups=groups_planets))
+    tasks = [("Stage1_MLP", fold) for fold in range(len(stage1_folds))] + \
+            [("Stage2_XGB", fold) for fold in range(len(stage2_folds))]
+    task_args = [(stage1_pipeline, X_data, y_stage1, tr, va, None, None, None, None, bag) for tr, va in stage1_folds] + \
+                [(stage2_model, X_planets, y_planets, tr, va, None, early_stopping_rounds, None, None, bag)
+                 for tr, va in stage2_folds]
+    if not bag:
+        tasks.append(("Stage1_MLP", None))
+        task_args.append((stage1_pipeline, X_data, y_stage1, None, None, None))
+        if not early_stopping_rounds:
+            tasks.append(("Stage2_XGB", None))
+            task_args.append((stage2_model, X_planets, y_planets, None, None, None))
+
+    n_jobs = resolve_n_jobs(n_jobs)
+    print(f"\nTraining Stage 1 ({len(stage1_folds)} folds) and Stage 2 ({len(stage2_folds)} folds) "
+          f"concurrently: {len(tasks)} tasks on {n_jobs} core(s)...")
+    start = time.time()
+    results = dict(zip(tasks, run_tasks(fit_task, task_args, n_jobs=n_jobs)))
+
+    stage2_best_iterations = [results[("Stage2_XGB", fold)]["best_iteration"] for fold in range(len(stage2_folds))]
+    if not bag and early_stopping_rounds:
+        n_rounds = median_best_iteration(stage2_best_iterations)
+        if n_rounds is not None:
+            print(f"  Stage 2 early stopping: best iterations per fold {stage2_best_iterations} → {n_rounds} rounds")
+        results[("Stage2_XGB", None)] = run_tasks(
+            fit_task, [(with_n_estimators(clone(stage2_model), n_rounds), X_planets, y_planets, None, None, None)],
+            n_jobs=n_jobs
+        )[0]
+    print(f"All fits finished in {time.time() - start:.1f}s (wall)")
+
+    # ------------------- Out-of-fold pieces -------------------
+    stage1_oof_proba = np.zeros((len(y_encoded), 2))
+    for fold, (tr, va) in enumerate(stage1_folds):
+        stage1_oof_proba[va] = results[("Stage1_MLP", fold)]["val_proba"]
+
+    stage2_oof_proba = np.zeros((len(y_planets), 2))
+    for fold, (tr, va) in enumerate(stage2_folds):
+        stage2_oof_proba[va] = results[("Stage2_XGB", fold)]["val_proba"]
+    stage2_oof_pred = stage2_oof_proba.argmax(axis=1)
+
+    # Full models (or the average of the fold models)
+    if bag:
+        trained_stage1 = FoldBaggedClassifier([results[("Stage1_MLP", fold)]["model"]
+                                               for fold in range(len(stage1_folds))])
+        trained_stage2 = FoldBaggedClassifier([results[("Stage2_XGB", fold)]["model"]
+                                               for fold in range(len(stage2_folds))])
+    else:
+        trained_stage1 = results[("Stage1_MLP", None)]["model"]
+        trained_stage2 = results[("Stage2_XGB", None)]["model"]
+    trained_models["Stage1_MLP"] = trained_stage1
+    trained_models["Stage2_XGB"] = trained_stage2
+
+    # Stage 2 answer for every row, as the cascade would see it: OOF for planet rows; FALSE POSITIVE
+    # rows were never in Stage 2 training, so the full Stage 2 model scores them out of sample
+    stage2_cascade_pred = np.empty(len(y_encoded), dtype=int)
+    stage2_cascade_pred[planet_mask] = stage2_oof_pred
+    if (~planet_mask).any():
+        stage2_cascade_pred[~planet_mask] = trained_stage2.predict_proba(X_data[~planet_mask]).argmax(axis=1)
+
+    # ------------------- Stage 1 threshold -------------------
+    best_threshold, threshold_sweep = sweep_stage1_threshold(y_encoded, stage1_oof_proba[:, 1], stage2_cascade_pred)
+    print("\nStage 1 threshold sweep (full cascade on OOF probabilities):")
+    print(threshold_sweep.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if stage1_threshold is None:
+        stage1_threshold = best_threshold
+        print(f"→ Stage 1 threshold: {stage1_threshold:.2f} (best cascade macro recall)")
+    else:
+        print(f"→ Stage 1 threshold: {stage1_threshold:.2f} (fixed; best on OOF: {best_threshold:.2f})")
 
+    # ------------------- Stage 1 -------------------
+    print("\nStage 1: Neural Network — PLANET vs FALSE POSITIVE (High Recall)")
+
+    stage1_oof_pred = (stage1_oof_proba[:, 1] > stage1_threshold).astype(int)
+    for fold, (tr, va) in enumerate(stage1_folds, 1):
         if fold <= 5:
-            acc = accuracy_score(y_planets[va], val_pred)
+            r = recall_score(y_stage1[va], stage1_oof_pred[va])
+            print(f"  Fold {fold}: Recall={r:.4f}")
+
+    stage1_recall = recall_score(y_stage1, stage1_oof_pred)
+    stage1_precision = precision_score(y_stage1, stage1_oof_pred)
+    print(f"\nStage 1 Final: Recall={stage1_recall:.4f}, Precision={stage1_precision:.4f}")
+    print(f"Time: {sum(results[('Stage1_MLP', fold)]['time'] for fold in range(len(stage1_folds))):.1f}s (folds)")
+    if bag:
+        print(f"Bagged {trained_stage1.n_models} Stage 1 fold models (no full-data refit)")
+    cv_results["Stage1_MLP"] = {"oof_pred": stage1_oof_pred, "oof_proba": stage1_oof_proba}
+
+    # ------------------- Stage 2 -------------------
+    print("\nStage 2: XGBoost — CANDIDATE vs CONFIRMED (High Precision)")
+
+    for fold, (tr, va) in enumerate(stage2_folds, 1):
+        if fold <= 5:
+            acc = accuracy_score(y_planets[va], stage2_oof_pred[va])
             print(f"  Fold {fold}: Accuracy={acc:.4f}")
 
     stage2_acc = accuracy_score(y_planets, stage2_oof_pred)
@@ -141,22 +275,13 @@ def train_multistep_nn_xgb(
     print(f"\nStage 2 Final: Accuracy={stage2_acc:.4f}")
     print(f"  CANDIDATE recall: {cand_recall:.4f}")
     print(f"  CONFIRMED recall: {conf_recall:.4f}")
-
-    trained_stage2 = clone(stage2_model).fit(X_planets, y_planets)
-    trained_models["Stage2_XGB"] = trained_stage2
-    cv_results["Stage2_XGB"] = {"oof_pred": stage2_oof_pred}
+    if bag:
+        print(f"  Bagged {trained_stage2.n_models} Stage 2 fold models (no full-data refit)")
+    cv_results["Stage2_XGB"] = {"oof_pred": stage2_oof_pred, "oof_proba": stage2_oof_proba}
 
     # ------------------- Combine both stages -------------------
     print("\nCombining both stages...")
-
-    multistep_pred = np.full(len(y_encoded), 2, dtype=int)  # default = FALSE POSITIVE
-    planet_indices = np.where(planet_mask)[0]
-    planet_preds = stage2_oof_pred
-    stage1_planet_indices = np.where(stage1_oof_pred == 1)[0]
-    for idx in stage1_planet_indices:
-        if idx in planet_indices:
-            p2_pos = np.where(planet_indices == idx)[0][0]
-            multistep_pred[idx] = planet_preds[p2_pos]
+    multistep_pred = combine_cascade(stage1_oof_proba[:, 1], stage2_cascade_pred, stage1_threshold)
 
     multistep_acc = accuracy_score(y_encoded, multistep_pred)
     overall_p_weighted = precision_score(y_encoded, multistep_pred, average="weighted", zero_division=0)
@@ -184,9 +309,10 @@ def train_multistep_nn_xgb(
         "stage1_recall": recall_score(((y_encoded == 0) | (y_encoded == 1)).astype(int), stage1_oof_pred),
         "stage1_precision": precision_score(((y_encoded == 0) | (y_encoded == 1)).astype(int), stage1_oof_pred),
         "stage2_accuracy": accuracy_score(y_planets, stage2_oof_pred),
+        "stage1_threshold": stage1_threshold,
     }
 
-    cv_results["Combined"] = {"pred": multistep_pred}
+    cv_results["Combined"] = {"pred": multistep_pred, "threshold_sweep": threshold_sweep.to_dict("records")}
 
     # ==========================================================
     # Save trained models separately
@@ -210,6 +336,8 @@ def train_multistep_nn_xgb(
             "metrics_summary": metrics_summary,  # key metrics
             "label_encoder": le_target,  # so inference can decode
             "model_type": "multi-step_nn_xgb",
+            "stage1_threshold": stage1_threshold,  # planet probability cutoff of Stage 1
+            "refit_strategy": refit_strategy,
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
 
@@ -13,6 +13,121 @@ from sklearn.metrics import (
 )
 from sklearn.model_selection import StratifiedGroupKFold
 
+from fold_bagging import check_refit_strategy, FoldBaggedClassifier, REFIT_STRATEGY
+from summarizing import train_diagnostics_rows, TRAIN_DIAGNOSTICS
+
+# (StackingClassifier estimator name, key in models / cv_results / trained_models)
+BASE_ESTIMATORS = [("xgb", "XGBoost"), ("lgb", "LightGBM"), ("cat", "CatBoost"), ("rf", "RandomForest")]
+
+
+def _stack_probas(probas) -> np.ndarray:
+    # Same meta-features as StackingClassifier(stack_method="predict_proba"):
+    # every class column, except the redundant first one for binary problems
+    return np.hstack([p[:, 1:] if p.shape[1] == 2 else p for p in probas])
+
+
+class OOFStackingClassifier:
+    """
+    Stacking ensemble assembled from already-fitted base models.
+
+    The meta-learner is trained on the base models' out-of-fold probabilities (as collected
+    by `train_ensemble_models`), and the base models are that run's final models (full-data
+    refits or fold bags), so no base model is trained again.
+
+    Args:
+        base_models (Dict[str, object]): Fitted base models, in meta-feature order.
+        final_estimator: Fitted meta-learner over the stacked base probabilities.
+    """
+
+    def __init__(self, base_models: Dict[str, object], final_estimator):
+        self.base_models = base_models
+        self.final_estimator = final_estimator
+        self.classes_ = final_estimator.classes_
+
+    def transform(self, X: pd.DataFrame) -> np.ndarray:
+        return _stack_probas([m.predict_proba(X) for m in self.base_models.values()])
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        return self.final_estimator.predict_proba(self.transform(X))
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _train_oof_stacking(
+        y_encoded: np.ndarray,
+        groups: np.ndarray,
+        cv: StratifiedGroupKFold,
+        cv_results: Dict[str, Dict],
+        trained_models: Dict[str, object],
+        final_estimator,
+        train_diagnostics: str = TRAIN_DIAGNOSTICS,
+        refit_strategy: str = REFIT_STRATEGY
+) -> Tuple[Dict, OOFStackingClassifier]:
+    """Meta-learner CV and final fit on the cached OOF probabilities (see `train_stacking_ensemble`)."""
+    missing = [name for _, name in BASE_ESTIMATORS
+               if name not in trained_models or "oof_proba" not in cv_results.get(name, {})]
+    if missing:
+        raise ValueError(f"OOF stacking needs fitted models and OOF probabilities for: {missing}")
+
+    meta_X = _stack_probas([cv_results[name]["oof_proba"] for _, name in BASE_ESTIMATORS])
+    print(f"\nTraining meta-learner on cached OOF probabilities ({meta_X.shape[1]} meta-features)...")
+    start = time.time()
+
+    n_classes = len(np.unique(y_encoded))
+    stacking_oof_pred = np.empty(len(y_encoded), dtype=int)
+    stacking_oof_proba = np.zeros((len(y_encoded), n_classes))
+    fold_metrics = {"acc": [], "prec": [], "rec": [], "f1": [], "train_acc": []}
+    meta_fold_models = []
+
+    # Same folds as the base models: every OOF row is scored by a meta-learner that never saw it
+    for fold, (train_idx, val_idx) in enumerate(cv.split(meta_X, y_encoded, groups=groups), 1):
+        meta_fold = clone(final_estimator)
+        y_train, y_val = y_encoded[train_idx], y_encoded[val_idx]
+        meta_fold.fit(meta_X[train_idx], y_train)
+        meta_fold_models.append(meta_fold)
+        val_proba = meta_fold.predict_proba(meta_X[val_idx])
+        val_pred = val_proba.argmax(axis=1)
+
+        stacking_oof_pred[val_idx] = val_pred
+        stacking_oof_proba[val_idx] = val_proba
+
+        fold_metrics["acc"].append(accuracy_score(y_val, val_pred))
+        fold_metrics["prec"].append(precision_score(y_val, val_pred, average="weighted", zero_division=0))
+        fold_metrics["rec"].append(recall_score(y_val, val_pred, average="weighted", zero_division=0))
+        fold_metrics["f1"].append(f1_score(y_val, val_pred, average="weighted", zero_division=0))
+        # Meta-level train accuracy (on OOF meta-features, not on refitted base predictions)
+        rows = train_diagnostics_rows(train_idx, level=train_diagnostics)
+        fold_metrics["train_acc"].append(
+            accuracy_score(y_train[rows], meta_fold.predict(meta_X[train_idx[rows]])) if rows is not None else np.nan
+        )
+
+        if fold <= 5:
+            print(f"  Fold {fold}: Val={fold_metrics['acc'][-1]:.4f}, Train={fold_metrics['train_acc'][-1]:.4f}")
+
+    if refit_strategy == "bag":
+        meta_final = FoldBaggedClassifier(meta_fold_models)
+    else:
+        meta_final = clone(final_estimator).fit(meta_X, y_encoded)
+    stacking_final = OOFStackingClassifier(
+        base_models={name: trained_models[name] for _, name in BASE_ESTIMATORS},
+        final_estimator=meta_final
+    )
+    elapsed = time.time() - start
+
+    stacking_results = {
+        "accuracy": np.mean(fold_metrics["acc"]),
+        "accuracy_std": np.std(fold_metrics["acc"]),
+        "precision": np.mean(fold_metrics["prec"]),
+        "recall": np.mean(fold_metrics["rec"]),
+        "f1": np.mean(fold_metrics["f1"]),
+        "train_accuracy": np.mean(fold_metrics["train_acc"]),
+        "time": elapsed,
+        "oof_pred": stacking_oof_pred,
+        "oof_proba": stacking_oof_proba
+    }
+    return stacking_results, stacking_final
+
 
 def train_stacking_ensemble(
         X_scaled: pd.DataFrame,
@@ -23,8 +138,12 @@ def train_stacking_ensemble(
         cv_results: Dict[str, Dict],
         best_model_name: str,
         models: Dict[str, object],
-        save_path: str = None
-) -> Tuple[Dict, StackingClassifier]:
+        save_path: str = None,
+        trained_models: Dict[str, object] = None,
+        stacking_mode: str = "oof",
+        train_diagnostics: str = TRAIN_DIAGNOSTICS,
+        refit_strategy: str = REFIT_STRATEGY
+) -> Tuple[Dict, StackingClassifier | OOFStackingClassifier | FoldBaggedClassifier]:
     """
     Train a stacking ensemble using base models and a Logistic Regression meta-learner.
 
@@ -36,6 +155,14 @@ def train_stacking_ensemble(
     4. Compare with best individual model.
     5. Fit final stacking model on the full dataset and save.
 
+    With `stacking_mode="oof"` (default) steps 1, 2 and 5 reuse the ensemble run instead:
+    the meta-learner is cross-validated and fitted on `cv_results[name]["oof_proba"]`, and the
+    final model combines it with the full-data models in `trained_models` (no base model refits).
+    `stacking_mode="refit"` trains a nested `StackingClassifier` from scratch.
+
+    With `refit_strategy="bag"` step 5 is skipped: the fold models of step 2 (meta-learners in
+    "oof" mode, whole stacking classifiers in "refit" mode) are kept and their probabilities averaged.
+
     Args:
         X_scaled (pd.DataFrame): Scaled feature matrix.
         y_encoded (np.ndarray): Encoded target labels.
@@ -46,9 +173,14 @@ def train_stacking_ensemble(
         best_model_name (str): Name of the best individual model.
         models (Dict): Dictionary of trained base learners.
         save_path (str, optional): Path to save the stacking model pickle.
+        trained_models (Dict, optional): Base models fitted on the full dataset (required for "oof").
+        stacking_mode (str, optional): "oof" or "refit". Defaults to "oof".
+        train_diagnostics (str, optional): Train accuracy per fold: "off", "sampled" or "full".
+            Defaults to TRAIN_DIAGNOSTICS.
+        refit_strategy (str, optional): "refit" or "bag" (see above). Defaults to REFIT_STRATEGY.
 
     Returns:
-        Tuple[Dict, StackingClassifier]:
+        Tuple[Dict, StackingClassifier | OOFStackingClassifier | FoldBaggedClassifier]:
             - stacking_results: metrics dictionary for the stacking ensemble.
             - stacking_clf: trained stacking classifier fitted on full dataset.
     """
@@ -56,68 +188,87 @@ def train_stacking_ensemble(
     print("\n" + "=" * 60)
     print("STACKING ENSEMBLE WITH GROUP-AWARE CV")
     print("=" * 60)
+    check_refit_strategy(refit_strategy)
 
     # --- 1. Define Stacking Classifier ---
+    final_estimator = LogisticRegression(max_iter=1000, random_state=42)
     stacking_clf = StackingClassifier(
-        estimators=[
-            ("xgb", models["XGBoost"]),
-            ("lgb", models["LightGBM"]),
-            ("cat", models["CatBoost"]),
-            ("rf", models["RandomForest"])
-        ],
-        final_estimator=LogisticRegression(max_iter=1000, random_state=42),
+        estimators=[(short_name, models[name]) for short_name, name in BASE_ESTIMATORS],
+        final_estimator=final_estimator,
         cv=3,  # internal CV for meta-features
         stack_method="predict_proba",
         n_jobs=-1,
         passthrough=False
     )
 
-    # --- 2. Manual Group-Aware CV Loop ---
-    print("\nTraining stacking ensemble with StratifiedGroupKFold...")
-    start = time.time()
+    if stacking_mode == "oof":
+        stacking_results, stacking_final = _train_oof_stacking(
+            y_encoded=y_encoded,
+            groups=groups,
+            cv=cv,
+            cv_results=cv_results,
+            trained_models=trained_models or {},
+            final_estimator=final_estimator,
+            train_diagnostics=train_diagnostics,
+            refit_strategy=refit_strategy
+        )
+        elapsed = stacking_results["time"]
+    elif stacking_mode == "refit":
+        # --- 2. Manual Group-Aware CV Loop ---
+        print("\nTraining stacking ensemble with StratifiedGroupKFold...")
+        start = time.time()
 
-    n_classes = len(np.unique(y_encoded))
-    stacking_oof_pred = np.empty(len(y_encoded), dtype=int)
-    stacking_oof_proba = np.zeros((len(y_encoded), n_classes))
-    fold_metrics = {"acc": [], "prec": [], "rec": [], "f1": [], "train_acc": []}
+        n_classes = len(np.unique(y_encoded))
+        stacking_oof_pred = np.empty(len(y_encoded), dtype=int)
+        stacking_oof_proba = np.zeros((len(y_encoded), n_classes))
+        fold_metrics = {"acc": [], "prec": [], "rec": [], "f1": [], "train_acc": []}
+        stacking_fold_models = []
 
-    for fold, (train_idx, val_idx) in enumerate(cv.split(X_scaled, y_encoded, groups=groups), 1):
-        warnings.filterwarnings("ignore", category=RuntimeWarning)
+        for fold, (train_idx, val_idx) in enumerate(cv.split(X_scaled, y_encoded, groups=groups), 1):
+            warnings.filterwarnings("ignore", category=RuntimeWarning)
 
-        stacking_fold = clone(stacking_clf)
-        X_train, X_val = X_scaled.iloc[train_idx], X_scaled.iloc[val_idx]
-        y_train, y_val = y_encoded[train_idx], y_encoded[val_idx]
+            stacking_fold = clone(stacking_clf)
+            X_train, X_val = X_scaled.iloc[train_idx], X_scaled.iloc[val_idx]
+            y_train, y_val = y_encoded[train_idx], y_encoded[val_idx]
 
-        stacking_fold.fit(X_train, y_train)
-        val_proba = stacking_fold.predict_proba(X_val)
-        val_pred = val_proba.argmax(axis=1)
+            stacking_fold.fit(X_train, y_train)
+            if refit_strategy == "bag":
+                stacking_fold_models.append(stacking_fold)
+            val_proba = stacking_fold.predict_proba(X_val)
+            val_pred = val_proba.argmax(axis=1)
 
-        stacking_oof_pred[val_idx] = val_pred
-        stacking_oof_proba[val_idx] = val_proba
+            stacking_oof_pred[val_idx] = val_pred
+            stacking_oof_proba[val_idx] = val_proba
 
-        # Metrics per fold
-        fold_metrics["acc"].append(accuracy_score(y_val, val_pred))
-        fold_metrics["prec"].append(precision_score(y_val, val_pred, average="weighted", zero_division=0))
-        fold_metrics["rec"].append(recall_score(y_val, val_pred, average="weighted", zero_division=0))
-        fold_metrics["f1"].append(f1_score(y_val, val_pred, average="weighted", zero_division=0))
-        fold_metrics["train_acc"].append(accuracy_score(y_train, stacking_fold.predict(X_train)))
+            # Metrics per fold
+            fold_metrics["acc"].append(accuracy_score(y_val, val_pred))
+            fold_metrics["prec"].append(precision_score(y_val, val_pred, average="weighted", zero_division=0))
+            fold_metrics["rec"].append(recall_score(y_val, val_pred, average="weighted", zero_division=0))
+            fold_metrics["f1"].append(f1_score(y_val, val_pred, average="weighted", zero_division=0))
+            # Scoring the train split runs all base learners + meta-learner: sampled by default
+            rows = train_diagnostics_rows(train_idx, level=train_diagnostics)
+            fold_metrics["train_acc"].append(
+                accuracy_score(y_train[rows], stacking_fold.predict(X_train.iloc[rows])) if rows is not None else np.nan
+            )
 
-        if fold <= 5:
-            print(f"  Fold {fold}: Val={fold_metrics['acc'][-1]:.4f}, Train={fold_metrics['train_acc'][-1]:.4f}")
-    elapsed = time.time() - start
+            if fold <= 5:
+                print(f"  Fold {fold}: Val={fold_metrics['acc'][-1]:.4f}, Train={fold_metrics['train_acc'][-1]:.4f}")
+        elapsed = time.time() - start
 
-    # --- 3. Aggregate Results ---
-    stacking_results = {
-        "accuracy": np.mean(fold_metrics["acc"]),
-        "accuracy_std": np.std(fold_metrics["acc"]),
-        "precision": np.mean(fold_metrics["prec"]),
-        "recall": np.mean(fold_metrics["rec"]),
-        "f1": np.mean(fold_metrics["f1"]),
-        "train_accuracy": np.mean(fold_metrics["train_acc"]),
-        "time": elapsed,
-        "oof_pred": stacking_oof_pred,
-        "oof_proba": stacking_oof_proba
-    }
+        # --- 3. Aggregate Results ---
+        stacking_results = {
+            "accuracy": np.mean(fold_metrics["acc"]),
+            "accuracy_std": np.std(fold_metrics["acc"]),
+            "precision": np.mean(fold_metrics["prec"]),
+            "recall": np.mean(fold_metrics["rec"]),
+            "f1": np.mean(fold_metrics["f1"]),
+            "train_accuracy": np.mean(fold_metrics["train_acc"]),
+            "time": elapsed,
+            "oof_pred": stacking_oof_pred,
+            "oof_proba": stacking_oof_proba
+        }
+    else:
+        raise ValueError(f"Unknown stacking_mode '{stacking_mode}' (expected 'oof' or 'refit').")
 
     print(f"\nStacking Results:")
     print(f"  Accuracy: {stacking_results['accuracy']:.4f} ± {stacking_results['accuracy_std']:.4f}")
@@ -134,6 +285,7 @@ def train_stacking_ensemble(
     print(f"Improvement: {improvement:+.2f}%")
 
     # --- 5. Detailed Metrics ---
+    stacking_oof_pred = stacking_results["oof_pred"]
     if len(np.unique(y_encoded)) > 1:
         print("\nStacking Classification Report:")
         print(classification_report(y_encoded, stacking_oof_pred, target_names=list(le_target.classes_)))
@@ -151,11 +303,15 @@ def train_stacking_ensemble(
     cv_results["Stacking"] = stacking_results
 
     # --- 7. Train Final Model on Full Dataset ---
-    print("\n" + "=" * 60)
-    print("TRAINING FINAL STACKING MODEL ON FULL DATASET")
-    print("=" * 60)
-    stacking_final = clone(stacking_clf)
-    stacking_final.fit(X_scaled, y_encoded)
+    if stacking_mode == "refit" and refit_strategy == "bag":
+        stacking_final = FoldBaggedClassifier(stacking_fold_models)
+        print(f"\nBagged {stacking_final.n_models} stacking fold models (no full-data refit)")
+    elif stacking_mode == "refit":
+        print("\n" + "=" * 60)
+        print("TRAINING FINAL STACKING MODEL ON FULL DATASET")
+        print("=" * 60)
+        stacking_final = clone(stacking_clf)
+        stacking_final.fit(X_scaled, y_encoded)
 
     warnings.filterwarnings("default", category=RuntimeWarning)
 
@@ -167,6 +323,7 @@ def train_stacking_ensemble(
         "best_model_name": best_model_name,
         "label_encoder": le_target,
         "model_type": "stacking_ensemble",
+        "refit_strategy": refit_strategy,
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
     }
 
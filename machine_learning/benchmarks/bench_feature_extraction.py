@@ -0,0 +1,51 @@
+"""
+Per-row cost of `create_advanced_features` on catalogs of increasing size.
+
+Rows are resampled (with replacement) from the cleaned Kepler KOI catalog, so the
+value distributions match production data.
+
+Usage:
+    python benchmarks/bench_feature_extraction.py                 # 10k, 1M, 10M rows
+    python benchmarks/bench_feature_extraction.py --rows 10000,1000000 --repeats 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+from dataset_cache import load_base_dataset
+from feature_extraction import create_advanced_features
+from preprocessing import KOIPreprocessor
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), '..', 'dataset', 'kepler_koi.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,1000000,10000000",
+                        help="Comma-separated catalog sizes (default: 10000,1000000,10000000)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per size; the best is reported")
+    args = parser.parse_args()
+
+    df_raw = load_base_dataset(DATASET_PATH, verbose=False)
+    df_clean = KOIPreprocessor(drop_fpflags=True).fit_transform(df_raw, verbose=False).reset_index(drop=True)
+    rng = np.random.default_rng(42)
+
+    print(f"{'rows':>12s} {'best (s)':>10s} {'ns/row':>10s} {'features':>9s}")
+    for n_rows in [int(n) for n in args.rows.split(",")]:
+        df = df_clean.iloc[rng.integers(0, len(df_clean), n_rows)].reset_index(drop=True)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            df_eng = create_advanced_features(df, verbose=False)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{n_rows:>12,d} {best:>10.4f} {best / n_rows * 1e9:>10.1f} {df_eng.shape[1] - df.shape[1]:>9d}")
+        del df, df_eng
+
+
+if __name__ == "__main__":
+    main()
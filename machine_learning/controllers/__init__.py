@@ -1,6 +1,8 @@
 from .train_controller import train
 from .predict_controller import predict as predict_controller
+from .predict_rows_controller import predict_rows as predict_rows_controller
 from .validate_controller import validate_csv
+from .jobs_controller import get_job
 
-__all__ = ['train', 'predict_controller', 'validate_csv']
+__all__ = ['train', 'predict_controller', 'predict_rows_controller', 'validate_csv', 'get_job']
 
@@ -0,0 +1,167 @@
+import csv
+import os
+import sys
+from typing import Dict
+
+import pandas as pd
+
+# Import app module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+import app as ml_app
+from dataset_cache import load_base_dataset
+
+# Upload limits (override with environment variables)
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+CHUNK_ROWS = int(os.environ.get("UPLOAD_CHUNK_ROWS", "50000"))
+SNIFF_BYTES = 64 * 1024
+COPY_BLOCK_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an uploaded file exceeds the configured maximum size."""
+
+
+def sniff_delimiter(sample: bytes) -> str:
+    """
+    Detect the CSV delimiter from the first bytes of an upload.
+
+    Args:
+        sample (bytes): Leading bytes of the file (the header line is enough).
+
+    Returns:
+        str: The detected delimiter (';', ',', '\\t' or '|'). Falls back to ';' if the
+            header contains one, otherwise ','.
+    """
+    text = sample.decode("utf-8", errors="ignore").lstrip("\ufeff")
+    first_line = text.split("\n", 1)[0]
+    try:
+        return csv.Sniffer().sniff(first_line, delimiters=";,\t|").delimiter
+    except csv.Error:
+        return ';' if ';' in first_line else ','
+
+
+def spool_upload(file, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+    """
+    Copy an uploaded file stream to disk block by block, enforcing a size limit.
+
+    Args:
+        file: Werkzeug `FileStorage` (or any object with a binary `.stream`/`.read`).
+        dest_path (str): Target path of the raw copy.
+        max_bytes (int, optional): Maximum accepted size in bytes.
+
+    Returns:
+        int: Number of bytes written.
+
+    Raises:
+        UploadTooLargeError: If the stream is larger than `max_bytes` (partial file is removed).
+    """
+    stream = getattr(file, "stream", file)
+    written = 0
+    try:
+        with open(dest_path, "wb") as out:
+            for block in iter(lambda: stream.read(COPY_BLOCK_BYTES), b""):
+                written += len(block)
+                if written > max_bytes:
+                    raise UploadTooLargeError(
+                        f"Uploaded file exceeds the maximum size of {max_bytes / (1024 * 1024):.0f} MB."
+                    )
+                out.write(block)
+    except UploadTooLargeError:
+        os.remove(dest_path)
+        raise
+    return written
+
+
+def upload_dtypes() -> Dict[str, str]:
+    """
+    Column dtypes for uploads, taken from the cached base catalog schema.
+
+    Float and text columns are pinned so every chunk parses to the same type; integer
+    columns are left to inference because uploads may contain missing values there.
+    """
+    try:
+        base_df = load_base_dataset(ml_app.DATASET_PATH, copy=False, verbose=False)
+    except OSError:
+        return {}
+    dtypes = {}
+    for col, dtype in base_df.dtypes.items():
+        if dtype == "float64":
+            dtypes[col] = "float64"
+        elif dtype == "object":
+            dtypes[col] = "object"
+    return dtypes
+
+
+def _read_chunks(path: str, sep: str, chunksize: int, dtype: Dict[str, str] | None):
+    try:
+        # For pandas >= 1.3.0
+        return pd.read_csv(path, sep=sep, chunksize=chunksize, dtype=dtype, on_bad_lines='skip')
+    except TypeError:
+        # For pandas < 1.3.0
+        return pd.read_csv(path, sep=sep, chunksize=chunksize, dtype=dtype, error_bad_lines=False)
+
+
+def _parse_spooled(raw_path: str, dest_path: str, sep: str, chunksize: int,
+                   dtype: Dict[str, str] | None) -> pd.DataFrame:
+    chunks = []
+    with open(dest_path, "w", newline="") as out:
+        for i, chunk in enumerate(_read_chunks(raw_path, sep, chunksize, dtype)):
+            # Standardize the saved copy to comma-separated, one chunk at a time
+            chunk.to_csv(out, index=False, sep=',', header=(i == 0))
+            chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def ingest_csv_upload(
+        file,
+        dest_path: str,
+        max_bytes: int = MAX_UPLOAD_BYTES,
+        chunksize: int = CHUNK_ROWS,
+        dtype: Dict[str, str] | None = None
+) -> pd.DataFrame:
+    """
+    Stream an uploaded CSV to disk and parse it in chunks into a typed DataFrame.
+
+    Steps
+    -----
+    1. Spool the raw upload to `<dest_path>.raw` (bounded memory, size limit enforced).
+    2. Sniff the delimiter from the first bytes.
+    3. Parse the spooled file in `chunksize`-row chunks (pinned dtypes, bad lines skipped),
+       writing each chunk to `dest_path` as comma-separated CSV.
+
+    Args:
+        file: Werkzeug `FileStorage` from `request.files`.
+        dest_path (str): Where the standardized comma-separated copy is saved.
+        max_bytes (int, optional): Maximum accepted upload size in bytes.
+        chunksize (int, optional): Rows per parsed chunk.
+        dtype (Dict[str, str], optional): Column dtypes. Defaults to `upload_dtypes()`.
+
+    Returns:
+        pd.DataFrame: Parsed upload (empty if the file had no data rows).
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds `max_bytes`.
+    """
+    raw_path = dest_path + ".raw"
+    size = spool_upload(file, raw_path, max_bytes=max_bytes)
+    try:
+        with open(raw_path, "rb") as f:
+            separator = sniff_delimiter(f.read(SNIFF_BYTES))
+        print(f"Spooled upload ({size / (1024 * 1024):.2f} MB), detected CSV separator: '{separator}'")
+
+        if dtype is None:
+            dtype = upload_dtypes()
+        try:
+            df = _parse_spooled(raw_path, dest_path, separator, chunksize, dtype)
+        except (ValueError, TypeError) as e:
+            # A pinned column holds unexpected values: fall back to per-chunk inference
+            print(f"Typed parsing failed ({e}); retrying with inferred dtypes")
+            df = _parse_spooled(raw_path, dest_path, separator, chunksize, None)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    print(f"Saved uploaded CSV to: {dest_path} with comma separator")
+    return df
@@ -0,0 +1,29 @@
+import os
+import sys
+from flask import request, jsonify
+
+# Import app module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+import app as ml_app
+from training_jobs import read_job
+
+
+def get_job(job_id: str):
+    """
+    Job status endpoint controller
+    Reports a training job queued by /train: queued/running/done/failed, the pipeline
+    stages reached so far and, once done, the artifact paths
+    """
+    try:
+        # Get user session ID from header
+        user_session_id = request.headers.get('user-session-id')
+        if not user_session_id:
+            return jsonify({"status": "error", "message": "user-session-id header is required"}), 400
+
+        # Jobs are only visible to the session that submitted them
+        job = read_job(ml_app.OUTPUT_FOLDER, job_id)
+        if job is None or job["parameters"].get("user_session_id") != user_session_id:
+            return jsonify({"status": "error", "message": f"Job {job_id} not found"}), 404
+        return jsonify({"status": "success", "job": job})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
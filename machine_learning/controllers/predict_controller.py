@@ -2,17 +2,27 @@ import os
 import sys
 import pandas as pd
 from flask import request, jsonify
+from werkzeug.exceptions import HTTPException
 
 # Import app module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
 import app as ml_app
 from app import predict as predict_function
+from .csv_ingestion import ingest_csv_upload, UploadTooLargeError
+
+# Model package scored for each model_type (inside the session folder)
+MODEL_FILES = {
+    'ensemble': "stacking_model.pkl",
+    'binary_categories': "binary_categories_model.pkl",
+    'multistep': "multistep_nn_xgb_multistep.pkl"
+}
 
 
 def predict():
     """
     Predict endpoint controller
-    Uses saved CSV and trained model from user-specific folder
+    Scores an optional uploaded CSV (or the CSV saved by /train) with the trained model
+    and fitted preprocessor from the user-specific folder
     """
     try:
         # Get user session ID from header
@@ -32,42 +42,40 @@ def predict():
                 "message": "User session not found. Please train the model first with /train endpoint."
             }), 404
         
-        # Temporarily set OUTPUT_FOLDER for this user
-        original_output_folder = ml_app.OUTPUT_FOLDER
-        ml_app.OUTPUT_FOLDER = user_output_folder + "/"
+        # Explicit run context for this user (module globals stay untouched, safe with threaded workers)
+        ctx = ml_app.default_context(user_output_folder)
         
         # Get parameters from request
         model_type = request.form.get('model_type', 'ensemble')
         drop_fpflags = request.form.get('drop_fpflags', 'false').lower() == 'true'
         
-        # Read CSV file from user-specific folder
-        csv_path = os.path.join(user_output_folder, "uploaded_data.csv")
-        
-        if not os.path.exists(csv_path):
-            ml_app.OUTPUT_FOLDER = original_output_folder
-            return jsonify({
-                "status": "error",
-                "message": "No data file found. Please train the model first with /train endpoint."
-            }), 404
-        
-        # Read the saved CSV file (saved with comma separator)
-        df = pd.read_csv(csv_path, sep=',')
+        # Rows to score: an uploaded file if given, otherwise the CSV saved by /train
+        uploaded_file = request.files.get('file')
+        if uploaded_file is not None and uploaded_file.filename:
+            csv_path = os.path.join(user_output_folder, "predict_data.csv")
+            try:
+                df = ingest_csv_upload(uploaded_file, csv_path)
+            except UploadTooLargeError as e:
+                return jsonify({"status": "error", "message": str(e)}), 413
+        else:
+            csv_path = os.path.join(user_output_folder, "uploaded_data.csv")
+
+            if not os.path.exists(csv_path):
+                return jsonify({
+                    "status": "error",
+                    "message": "No data file found. Please train the model first with /train endpoint."
+                }), 404
+
+            # Read the saved CSV file (saved with comma separator)
+            df = pd.read_csv(csv_path, sep=',')
         print(f"Reading CSV from: {csv_path}")
         print(f"Loaded DataFrame shape: {df.shape}")
         print(f"Loaded DataFrame columns count: {len(df.columns)}")
         
-        # Convert DataFrame to list of dictionaries
-        input_rows = df.to_dict('records')
-        
         # Determine model path based on model_type
-        model_path_map = {
-            'ensemble': os.path.join(user_output_folder, "stacking_model.pkl"),
-            'binary_categories': os.path.join(user_output_folder, "binary_categories_model.pkl"),
-            'multistep': os.path.join(user_output_folder, "multistep_nn_xgb_multistep.pkl")
-        }
+        model_path_map = {name: os.path.join(user_output_folder, fname) for name, fname in MODEL_FILES.items()}
         
         if model_type not in model_path_map:
-            ml_app.OUTPUT_FOLDER = original_output_folder
             return jsonify({
                 "status": "error",
                 "message": f"Invalid model_type: {model_type}. Must be 'ensemble', 'binary_categories', or 'multistep'"
@@ -77,33 +85,32 @@ def predict():
         
         # Check if model exists
         if not os.path.exists(model_path):
-            ml_app.OUTPUT_FOLDER = original_output_folder
             return jsonify({
                 "status": "error",
                 "message": f"Model not found at {model_path}. Please train the model first."
             }), 404
         
         # Call predict function with separator info
-        # Pass None for dataset_path since we're using the preprocessed input_rows
+        # Pass None for dataset_path since we're scoring the saved rows directly
         try:
-            print(f"\n=== Starting prediction with {len(input_rows)} rows ===")
-            print(f"First row keys: {list(input_rows[0].keys())[:10] if input_rows else 'None'}")
-            print(f"Number of columns in input: {len(input_rows[0].keys()) if input_rows else 0}")
+            print(f"\n=== Starting prediction with {len(df)} rows ===")
+            print(f"First columns: {list(df.columns)[:10]}")
+            print(f"Number of columns in input: {len(df.columns)}")
             
             results = predict_function(
                 dataset_path=None,
-                input_rows=input_rows,
+                input_rows=df,
                 model_path=model_path,
-                drop_fpflags=drop_fpflags
+                drop_fpflags=drop_fpflags,
+                ctx=ctx
             )
             
-            print(f"Prediction completed for {len(input_rows)} rows")
+            print(f"Prediction completed for {len(df)} rows")
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
             print(f"❌ Error in predict_function: {e}")
             print(f"Full traceback:\n{error_trace}")
-            ml_app.OUTPUT_FOLDER = original_output_folder
             return jsonify({
                 "status": "error",
                 "message": str(e),
@@ -119,9 +126,9 @@ def predict():
             "results": results
         })
     
+    except HTTPException:
+        # Errors raised by werkzeug while reading the request keep their status (413 above MAX_UPLOAD_MB)
+        raise
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
-    finally:
-        # Restore original output folder
-        ml_app.OUTPUT_FOLDER = original_output_folder
 
@@ -0,0 +1,71 @@
+import os
+import sys
+from flask import request, jsonify
+from werkzeug.exceptions import HTTPException
+
+# Import app module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+import app as ml_app
+from row_prediction import predict_rows as predict_rows_function
+from .predict_controller import MODEL_FILES
+
+
+def predict_rows():
+    """
+    Row prediction endpoint controller
+    Scores a JSON array of KOI records (single rows or small batches) with the trained model
+    and fitted preprocessor from the user-specific folder, without the CSV/DataFrame pipeline
+    """
+    try:
+        # Get user session ID from header
+        user_session_id = request.headers.get('user-session-id')
+        if not user_session_id:
+            return jsonify({"status": "error", "message": "user-session-id header is required"}), 400
+
+        user_output_folder = os.path.join(ml_app.OUTPUT_FOLDER, user_session_id)
+        if not os.path.exists(user_output_folder):
+            return jsonify({
+                "status": "error",
+                "message": "User session not found. Please train the model first with /train endpoint."
+            }), 404
+
+        # Body: {"records": [...], "model_type": "..."} or a bare array of records
+        body = request.get_json(silent=True)
+        if isinstance(body, list):
+            body = {"records": body}
+        if not isinstance(body, dict) or not isinstance(body.get("records"), list) \
+                or not all(isinstance(r, dict) for r in body["records"]):
+            return jsonify({"status": "error", "message": "JSON body must be an array of records "
+                                                          "or {\"records\": [...], \"model_type\": ...}"}), 400
+
+        model_type = body.get("model_type", 'ensemble')
+        if model_type not in MODEL_FILES:
+            return jsonify({
+                "status": "error",
+                "message": f"Invalid model_type: {model_type}. Must be 'ensemble', 'binary_categories', or 'multistep'"
+            }), 400
+
+        model_path = os.path.join(user_output_folder, MODEL_FILES[model_type])
+        if not os.path.exists(model_path):
+            return jsonify({
+                "status": "error",
+                "message": f"Model not found at {model_path}. Please train the model first."
+            }), 404
+
+        try:
+            results = predict_rows_function(body["records"], model_path, user_output_folder)
+        except (ValueError, FileNotFoundError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        return jsonify({
+            "status": "success",
+            "model_type": model_type,
+            "user_session_id": user_session_id,
+            "results": results
+        })
+
+    except HTTPException:
+        # Errors raised by werkzeug while reading the request keep their status (413 above MAX_UPLOAD_MB)
+        raise
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
@@ -1,19 +1,29 @@
 import os
 import sys
-import pandas as pd
 from flask import request, jsonify
-from io import StringIO
+from werkzeug.exceptions import HTTPException
 
 # Import app module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
 import app as ml_app
-from app import ensemble_pipeline, binary_categories_pipeline, multistep_pipeline
+from training_jobs import submit_training_job
+from .csv_ingestion import ingest_csv_upload, UploadTooLargeError
+
+# model_type values accepted by /train and the message of a finished job
+TRAIN_MESSAGES = {
+    'ensemble': "Ensemble pipeline training completed",
+    'binary_categories': "Binary categories pipeline training completed",
+    'multistep': "Multistep pipeline training completed",
+    'all': "Ensemble, binary categories and multistep pipelines training completed"
+}
+TRAIN_MODEL_TYPES = tuple(TRAIN_MESSAGES)
 
 
 def train():
     """
     Train endpoint controller
-    Accepts CSV file and parameters, trains model, and saves to user-specific folder
+    Accepts CSV file and parameters and queues a training job that saves the models
+    to the user-specific folder (returns the job id at once; wait=true blocks until done)
     """
     try:
         # Get user session ID from header
@@ -29,127 +39,89 @@ def train():
         os.makedirs(user_output_folder, exist_ok=True)
         print(f"User output folder: {user_output_folder}")
         
-        # Temporarily set OUTPUT_FOLDER for this user
-        original_output_folder = ml_app.OUTPUT_FOLDER
-        ml_app.OUTPUT_FOLDER = user_output_folder + "/"
+        # Explicit run context for this user (module globals stay untouched, safe with threaded workers)
+        ctx = ml_app.default_context(user_output_folder)
         
         # Get parameters from request
         model_type = request.form.get('model_type', 'ensemble')
         class_weight_penalizing = request.form.get('class_weight_penalizing', 'false').lower() == 'true'
         drop_fpflags = request.form.get('drop_fpflags', 'false').lower() == 'true'
+        # Warm-start this session's existing models on the uploaded rows instead of retraining
+        incremental = request.form.get('incremental', 'false').lower() == 'true'
         
         # Get CSV file
         if 'file' not in request.files:
-            ml_app.OUTPUT_FOLDER = original_output_folder
             return jsonify({"status": "error", "message": "No file provided"}), 400
         
         file = request.files['file']
         if file.filename == '':
-            ml_app.OUTPUT_FOLDER = original_output_folder
             return jsonify({"status": "error", "message": "No file selected"}), 400
         
-        # Read and validate CSV file
+        # Stream the upload to disk and parse it in chunks (standardized comma-separated copy is saved)
+        csv_path = os.path.join(user_output_folder, "uploaded_data.csv")
         try:
-            csv_content = file.read().decode('utf-8')
-            
-            # Detect separator (try semicolon first, then comma)
-            first_line = csv_content.split('\n')[0] if csv_content else ''
-            separator = ';' if ';' in first_line else ','
-            
-            print(f"Detected CSV separator: '{separator}'")
-            
-            # Try to read CSV with multiple parsing strategies
-            parsing_error = None
-            df = None
-            
-            # Strategy 1: Standard parsing with detected separator
-            try:
-                try:
-                    # For pandas >= 1.3.0
-                    df = pd.read_csv(StringIO(csv_content), sep=separator, on_bad_lines='skip')
-                except TypeError:
-                    # For pandas < 1.3.0
-                    df = pd.read_csv(StringIO(csv_content), sep=separator, error_bad_lines=False, warn_bad_lines=True)
-                print(f"CSV parsed successfully with separator '{separator}'")
-            except Exception as e:
-                parsing_error = str(e)
-                print(f"Strategy 1 failed: {e}")
-                
-                # Strategy 2: Try with engine='python' for more flexible parsing
-                try:
-                    df = pd.read_csv(StringIO(csv_content), sep=separator, engine='python')
-                    print(f"CSV parsed successfully with strategy 2 (python engine)")
-                except Exception as e2:
-                    print(f"Strategy 2 failed: {e2}")
-                    parsing_error = str(e2)
-            
-            if df is None or df.empty:
-                ml_app.OUTPUT_FOLDER = original_output_folder
-                error_msg = f"Could not parse CSV file. Error: {parsing_error}" if parsing_error else "CSV file is empty"
-                return jsonify({"status": "error", "message": error_msg}), 400
-            
-            print(f"CSV loaded successfully: {df.shape[0]} rows, {df.shape[1]} columns")
-            print(f"Columns: {list(df.columns)[:10]}")  # Print first 10 columns
-            
+            df = ingest_csv_upload(file, csv_path)
+        except UploadTooLargeError as e:
+            return jsonify({"status": "error", "message": str(e)}), 413
+        except HTTPException:
+            raise
         except Exception as e:
-            ml_app.OUTPUT_FOLDER = original_output_folder
             return jsonify({
                 "status": "error", 
                 "message": f"Error reading CSV file: {str(e)}. Please ensure your CSV is properly formatted."
             }), 400
-        
-        # Save CSV file to user-specific folder with comma separator (standardize)
-        csv_path = os.path.join(user_output_folder, "uploaded_data.csv")
-        df.to_csv(csv_path, index=False, sep=',')
-        print(f"Saved uploaded CSV to: {csv_path} with comma separator")
-        print(f"Saved DataFrame shape: {df.shape}")
-        
-        # Convert DataFrame to list of dictionaries
-        input_rows = df.to_dict('records')
+
+        if df.empty:
+            return jsonify({"status": "error", "message": "CSV file is empty"}), 400
+
+        print(f"CSV loaded successfully: {df.shape[0]} rows, {df.shape[1]} columns")
+        print(f"Columns: {list(df.columns)[:10]}")  # Print first 10 columns
         
         print(f"********* Model Type: {model_type}")
 
-        # Call appropriate pipeline based on model_type
-        if model_type == 'ensemble':
-            ensemble_pipeline(
-                input_rows=input_rows,
-                class_weight_penalizing=class_weight_penalizing,
-                drop_fpflags=drop_fpflags
-            )
-            message = "Ensemble pipeline training completed"
-        elif model_type == 'binary_categories':
-            binary_categories_pipeline(
-                input_rows=input_rows,
-                drop_fpflags=drop_fpflags
-            )
-            message = "Binary categories pipeline training completed"
-        elif model_type == 'multistep':
-            multistep_pipeline(
-                input_rows=input_rows,
-                drop_fpflags=drop_fpflags
-            )
-            message = "Multistep pipeline training completed"
-        else:
+        if model_type not in TRAIN_MODEL_TYPES:
             return jsonify({
                 "status": "error",
-                "message": f"Invalid model_type: {model_type}. Must be 'ensemble', 'binary_categories', or 'multistep'"
+                "message": f"Invalid model_type: {model_type}. "
+                           f"Must be 'ensemble', 'binary_categories', 'multistep', or 'all'"
             }), 400
-        
-        return jsonify({
-            "status": "success",
-            "message": message,
+
+        # Train in the local worker pool (keeps this web worker free); poll GET /jobs/<job_id>
+        parameters = {
+            "class_weight_penalizing": class_weight_penalizing,
+            "drop_fpflags": drop_fpflags,
+            "incremental": incremental
+        }
+        job, future = submit_training_job(
+            output_folder=base_output_folder,
+            ctx=ctx,
+            input_rows=df,
+            params=dict(parameters, model_type=model_type, user_session_id=user_session_id)
+        )
+        print(f"Queued training job {job['job_id']} ({model_type})")
+
+        response = {
+            "status": "queued",
+            "message": f"Training job queued ({model_type}); poll /jobs/{job['job_id']} for progress",
+            "job_id": job["job_id"],
+            "job_url": f"/jobs/{job['job_id']}",
             "model_type": model_type,
             "user_session_id": user_session_id,
             "csv_saved": csv_path,
-            "parameters": {
-                "class_weight_penalizing": class_weight_penalizing,
-                "drop_fpflags": drop_fpflags
-            }
-        })
-    
+            "parameters": parameters
+        }
+        # wait=true: block until the job finishes (previous synchronous behaviour)
+        if request.form.get('wait', 'false').lower() == 'true':
+            job = future.result()
+            response.update(status="success" if job["status"] == "done" else "error",
+                            message=TRAIN_MESSAGES[model_type] if job["status"] == "done" else job["error"],
+                            job=job)
+            return jsonify(response), 200 if job["status"] == "done" else 500
+        return jsonify(response), 202
+
+    except HTTPException:
+        # Errors raised by werkzeug while reading the request keep their status (413 above MAX_UPLOAD_MB)
+        raise
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
-    finally:
-        # Restore original output folder
-        ml_app.OUTPUT_FOLDER = original_output_folder
 
@@ -1,5 +1,6 @@
 import pandas as pd
 from flask import request, jsonify
+from werkzeug.exceptions import HTTPException
 from io import StringIO
 
 # Required columns for Kepler KOI dataset
@@ -88,6 +89,9 @@ def validate_csv():
             "columns": len(df.columns)
         })
     
+    except HTTPException:
+        # Errors raised by werkzeug while reading the request keep their status (413 above MAX_UPLOAD_MB)
+        raise
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -1,3 +1,4 @@
+import gc
 import multiprocessing
 import os
 
@@ -7,12 +8,25 @@ bind = f"0.0.0.0:{port}"
 backlog = 2048
 
 # Worker processes (limit for Railway's resource constraints)
-workers = min(multiprocessing.cpu_count() * 2 + 1, 4)
-worker_class = "sync"
+workers = int(os.environ.get("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 4)))
+# Threaded workers: requests carry an explicit app.RunContext and shared caches are lock-protected
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
 worker_connections = 1000
 timeout = 300  # Increased timeout for long-running ML pipelines
 keepalive = 2
 
+# Preload mode: import the app (and fill its dataset and feature caches) in the master,
+# so workers share the loaded state copy-on-write instead of each loading its own copy
+preload_app = os.environ.get("ML_PRELOAD", "true").lower() == "true"
+
+
+def pre_fork(server, worker):
+    # Move preloaded objects out of the cyclic GC's generations: its bookkeeping writes would
+    # otherwise copy their pages into every worker
+    gc.freeze()
+
+
 # Logging
 accesslog = "-"
 errorlog = "-"
@@ -1,14 +1,18 @@
 import sys
 import os
+import multiprocessing
 from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'controllers'))
 
 import app as ml_app
-from app import ensemble_pipeline, binary_categories_pipeline, multistep_pipeline
-from controllers import train, predict_controller, validate_csv
+from app import all_pipeline, ensemble_pipeline, binary_categories_pipeline, multistep_pipeline
+from controllers import train, predict_controller, predict_rows_controller, validate_csv, get_job
+from controllers.csv_ingestion import MAX_UPLOAD_BYTES
+from preloading import PRELOAD, preload_shared_state
 
 # Paths to work from machine_learning directory
 base_dir = os.path.dirname(__file__)
@@ -18,8 +22,25 @@ ml_app.OUTPUT_FOLDER = os.path.join(base_dir, "outputs") + "/"
 # Create outputs folder if it doesn't exist
 os.makedirs(ml_app.OUTPUT_FOLDER, exist_ok=True)
 
+# Preload mode: fill the dataset and feature caches once. Under gunicorn's preload_app this
+# runs in the master, so forked workers share the loaded state (not in spawned training jobs)
+if PRELOAD and multiprocessing.current_process().name == "MainProcess":
+    preload_shared_state(ml_app.DATASET_PATH)
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
+# Reject oversized uploads before they are read (configurable with MAX_UPLOAD_MB)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    # Raised by werkzeug when a controller reads a body above MAX_CONTENT_LENGTH
+    return jsonify({
+        "status": "error",
+        "message": f"Upload exceeds the maximum size of {MAX_UPLOAD_BYTES / (1024 * 1024):.0f} MB."
+    }), 413
+
 
 @app.route('/')
 def home():
@@ -29,8 +50,11 @@ def home():
             "/ensemble",
             "/binary",
             "/multistep",
+            "/all",
             "POST /train",
+            "GET /jobs/<job_id>",
             "POST /predict",
+            "POST /predict/rows",
             "POST /validate-csv"
         ]
     })
@@ -63,16 +87,35 @@ def run_multistep():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route('/all')
+def run_all():
+    try:
+        all_pipeline(class_weight_penalizing=True, drop_fpflags=True)
+        return jsonify({"status": "success", "message": "Ensemble, binary and multistep pipelines completed"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @app.route('/train', methods=['POST'])
 def train_route():
     return train()
 
 
+@app.route('/jobs/<job_id>')
+def job_route(job_id):
+    return get_job(job_id)
+
+
 @app.route('/predict', methods=['POST'])
 def predict_route():
     return predict_controller()
 
 
+@app.route('/predict/rows', methods=['POST'])
+def predict_rows_route():
+    return predict_rows_controller()
+
+
 @app.route('/validate-csv', methods=['POST'])
 def validate_csv_route():
     return validate_csv()
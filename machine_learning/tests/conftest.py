@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Modules of machine_learning/app are imported flat, as by server.py and the controllers
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), '..', 'dataset', 'kepler_koi.csv')
+CLASSES = np.array(["CANDIDATE", "CONFIRMED", "FALSE POSITIVE"])
+
+
+@pytest.fixture
+def koi_rows():
+    """First 300 rows of the Kepler KOI catalog (skips when the dataset is not checked out)."""
+    if not os.path.exists(DATASET_PATH):
+        pytest.skip("Kepler KOI dataset not available")
+    return pd.read_csv(DATASET_PATH, nrows=300)
+
+
+@pytest.fixture
+def synthetic_data():
+    """Small separable 3-class problem: (X, y_encoded, groups)."""
+    rng = np.random.default_rng(0)
+    n = 240
+    y = np.repeat(np.arange(3), n // 3)
+    X = pd.DataFrame(rng.normal(size=(n, 6)) + y[:, None] * 0.8, columns=[f"f{i}" for i in range(6)])
+    groups = np.arange(n) // 2
+    return X, y, groups
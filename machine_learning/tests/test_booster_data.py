@@ -0,0 +1,63 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMClassifier
+from sklearn.base import clone
+from xgboost import XGBClassifier
+
+from booster_data import dataset_token, fit_on_shared_data
+from early_stopping import fit_with_early_stopping
+from incremental import continue_training
+
+BOOSTERS = [XGBClassifier(n_estimators=40, max_depth=3, random_state=0, verbosity=0),
+            LGBMClassifier(n_estimators=40, num_leaves=7, min_child_samples=5, random_state=0, verbose=-1)]
+
+
+@pytest.mark.parametrize("model", BOOSTERS, ids=lambda m: type(m).__name__)
+def test_full_data_fit_matches_wrapper_fit(synthetic_data, model):
+    X, y, _ = synthetic_data
+    expected = clone(model).fit(X, y)
+    shared = clone(model)
+    fit_on_shared_data(shared, X, y, dataset_token(X, y))
+
+    np.testing.assert_array_equal(shared.predict_proba(X), expected.predict_proba(X))
+    np.testing.assert_array_equal(shared.classes_, expected.classes_)
+    np.testing.assert_array_equal(shared.feature_importances_, expected.feature_importances_)
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(shared)).predict_proba(X), expected.predict_proba(X))
+
+
+@pytest.mark.parametrize("model", BOOSTERS, ids=lambda m: type(m).__name__)
+def test_fold_fit_matches_wrapper_fit(model):
+    # Integer features with few values: the full-matrix bins equal the fold's own bins,
+    # so the shared containers must reproduce the wrapper's fold fit exactly
+    rng = np.random.default_rng(0)
+    y = np.repeat(np.arange(3), 200)
+    X = pd.DataFrame(rng.integers(0, 20, size=(600, 5)) + y[:, None] * 2,
+                     columns=[f"f{i}" for i in range(5)]).astype(float)
+    perm = rng.permutation(len(y))
+    train_idx, val_idx = np.sort(perm[:400]), np.sort(perm[400:])
+    weight = rng.uniform(0.5, 2.0, size=len(y))
+
+    shared = clone(model)
+    best = fit_on_shared_data(shared, X, y, dataset_token(X, y), train_idx, val_idx, weight,
+                              early_stopping_rounds=5)
+    expected = clone(model)
+    expected_best = fit_with_early_stopping(expected, X.iloc[train_idx], y[train_idx], X.iloc[val_idx], y[val_idx],
+                                            rounds=5, sample_weight=weight[train_idx])
+    assert best == expected_best
+    np.testing.assert_array_equal(shared.predict_proba(X.iloc[val_idx]), expected.predict_proba(X.iloc[val_idx]))
+
+
+@pytest.mark.parametrize("model", BOOSTERS, ids=lambda m: type(m).__name__)
+def test_shared_fit_can_be_continued(synthetic_data, model):
+    X, y, _ = synthetic_data
+    shared = clone(model)
+    fit_on_shared_data(shared, X, y, dataset_token(X, y))
+    updated = continue_training(shared, X, y, n_rounds=10)
+    if isinstance(updated, XGBClassifier):
+        assert updated.get_booster().num_boosted_rounds() == 50
+    else:
+        assert updated.booster_.current_iteration() == 50
+    assert updated.predict_proba(X).shape == (len(X), 3)
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+from sklearn.model_selection import StratifiedGroupKFold
+
+import data_splitting
+from data_splitting import CachedFoldSplitter
+
+
+def _folds(splitter, y, groups):
+    return [(train.tolist(), val.tolist()) for train, val in splitter.split(np.empty(len(y)), y, groups=groups)]
+
+
+def test_cached_splits_match_stratified_group_kfold(synthetic_data):
+    _, y, groups = synthetic_data
+    expected = _folds(StratifiedGroupKFold(n_splits=5, shuffle=True, random_state=42), y, groups)
+    assert _folds(CachedFoldSplitter(n_splits=5, random_state=42), y, groups) == expected
+    # Label subsets (e.g. the binary model's rows) get their own assignment
+    subset = y != 0
+    expected = _folds(StratifiedGroupKFold(n_splits=5, shuffle=True, random_state=42), y[subset], groups[subset])
+    assert _folds(CachedFoldSplitter(n_splits=5, random_state=42), y[subset], groups[subset]) == expected
+
+
+def test_fold_assignment_is_persisted_and_reused(synthetic_data, tmp_path, monkeypatch):
+    _, y, groups = synthetic_data
+    splitter = CachedFoldSplitter(n_splits=4, random_state=7, cache_dir=str(tmp_path))
+    expected = _folds(splitter, y, groups)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # New process (empty memory cache): the persisted ids are loaded instead of re-splitting
+    monkeypatch.setattr(data_splitting, "_FOLD_CACHE", {})
+    monkeypatch.setattr(CachedFoldSplitter, "_splitter", lambda self: (_ for _ in ()).throw(AssertionError))
+    assert _folds(CachedFoldSplitter(n_splits=4, random_state=7, cache_dir=str(tmp_path)), y, groups) == expected
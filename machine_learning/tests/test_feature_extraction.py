@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_extraction import ENGINEERED_FEATURES, compute_features, create_advanced_features, resolve_features
+from preprocessing import KOIPreprocessor
+
+
+def _baseline_features(df: pd.DataFrame) -> pd.DataFrame:
+    """The original column-by-column pandas formulas (before the feature registry), as reference."""
+    e = df.copy()
+    e["period_radius_ratio"] = np.log1p(e["koi_period"]) / (np.log1p(e["koi_prad"]) + 1e-8)
+    e["period_prad_product"] = e["koi_period"] * e["koi_prad"]
+    for feat in ["koi_period", "koi_prad", "koi_depth"]:
+        v = pd.to_numeric(e[feat], errors="coerce").fillna(0)
+        e[f"{feat}_log"] = np.log1p(np.abs(v))
+        e[f"{feat}_sqrt"] = np.sqrt(np.abs(v))
+        e[f"{feat}_squared"] = v ** 2
+    e["depth_duration_ratio"] = e["koi_depth"] / (e["koi_duration"] + 1e-8)
+    e["impact_centrality"] = 1 - np.abs(e["koi_impact"])
+    e["is_grazing_transit"] = (e["koi_impact"] > 0.7).astype(int)
+    e["prad_srad_ratio"] = e["koi_prad"] / (e["koi_srad"] + 1e-8)
+    e["prad_srad_ratio_squared"] = e["prad_srad_ratio"] ** 2
+    e["stellar_class"] = e["koi_steff"].apply(
+        lambda t: 0 if t < 3500 else 1 if t < 5200 else 2 if t < 6000 else 3 if t < 7500 else 4)
+    e["temp_ratio"] = e["koi_teq"] / (e["koi_steff"] + 1e-8)
+    e["estimated_distance"] = np.cbrt(e["koi_period"] ** 2)
+    e["insolation_distance_check"] = e["koi_insol"] * e["estimated_distance"] ** 2
+    e["detectability"] = e["koi_prad"] / np.log1p(e["koi_period"])
+    e["snr_per_depth"] = e["koi_model_snr"] / (e["koi_depth"] + 1e-8)
+    error_cols = [c for c in df.columns if "err1" in c or "err2" in c]
+    e["total_uncertainty"] = df[error_cols].abs().sum(axis=1)
+    e["period_relative_error"] = (e["koi_period_err1"].abs() + e["koi_period_err2"].abs()) / (e["koi_period"] + 1e-8)
+    e["depth_relative_error"] = (e["koi_depth_err1"].abs() + e["koi_depth_err2"].abs()) / (e["koi_depth"] + 1e-8)
+    e["duration_fraction"] = e["koi_duration"] / (e["koi_period"] * 24 + 1e-8)
+    e["is_long_transit"] = (e["duration_fraction"] > 0.15).astype(int)
+    e["transit_duration_ratio"] = e["koi_duration"] / (e["koi_period"] * 24 + 1e-8)
+    e["is_multiplanet"] = (e["koi_tce_plnt_num"] > 1).astype(int)
+    e["planet_position_log"] = np.log1p(e["koi_tce_plnt_num"])
+    e["log_snr"] = np.log1p(e["koi_model_snr"])
+    return e
+
+
+@pytest.fixture
+def clean_rows(koi_rows):
+    return KOIPreprocessor(drop_fpflags=True).fit_transform(koi_rows, verbose=False)
+
+
+def test_registry_matches_baseline_formulas(clean_rows):
+    expected = _baseline_features(clean_rows)
+    result = create_advanced_features(clean_rows, verbose=False)
+
+    assert set(result.columns) == set(expected.columns)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False, rtol=1e-12)
+
+
+def test_registry_matches_baseline_with_missing_values(koi_rows):
+    # Uncleaned rows: NaNs propagate (or are filled) exactly as in the pandas formulas
+    raw = koi_rows.select_dtypes(include="number")
+    expected = _baseline_features(raw)
+    result = create_advanced_features(raw, verbose=False)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False, rtol=1e-12)
+
+
+def test_compute_features_matches_frame_path(clean_rows):
+    frame = create_advanced_features(clean_rows, verbose=False)
+    columns = list(clean_rows.select_dtypes(include="number").columns)
+    plan, raw_inputs, outputs = resolve_features(columns, list(frame.columns))
+    env = {c: clean_rows[c].to_numpy(dtype=np.float64) for c in raw_inputs}
+    float_block, float_names, int_block, int_names = compute_features(env, plan, outputs, len(clean_rows))
+
+    assert set(float_names) | set(int_names) == set(ENGINEERED_FEATURES)
+    for i, name in enumerate(float_names):
+        np.testing.assert_array_equal(float_block[i], frame[name].to_numpy())
+    for i, name in enumerate(int_names):
+        np.testing.assert_array_equal(int_block[i], frame[name].to_numpy())
@@ -0,0 +1,124 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from catboost import CatBoostClassifier
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict
+from sklearn.preprocessing import LabelEncoder
+from xgboost import XGBClassifier
+
+import incremental
+from conftest import CLASSES
+from data_splitting import CachedFoldSplitter
+from incremental import INCREMENTAL_ROUNDS, incremental_update, load_training_state, save_training_state
+from training_stacking_ensemble import BASE_ESTIMATORS, OOFStackingClassifier, _stack_probas
+
+DATASET_KEY = "test_key"
+
+
+def _base_models():
+    return {
+        "XGBoost": XGBClassifier(n_estimators=20, max_depth=3, random_state=0),
+        "LightGBM": LGBMClassifier(n_estimators=20, num_leaves=7, random_state=0, verbose=-1),
+        "CatBoost": CatBoostClassifier(iterations=20, depth=3, random_state=0, verbose=False,
+                                       allow_writing_files=False),
+        "RandomForest": RandomForestClassifier(n_estimators=10, random_state=0),
+    }
+
+
+@pytest.fixture
+def ensemble_session(tmp_path, synthetic_data):
+    """Session folder with the ensemble packages and training state of a full run on `synthetic_data`."""
+    X, y, _ = synthetic_data
+    le_target = LabelEncoder().fit(CLASSES)
+    cv_results, trained = {}, {}
+    for name, model in _base_models().items():
+        cv_results[name] = {"oof_proba": cross_val_predict(model, X, y, cv=3, method="predict_proba")}
+        trained[name] = model.fit(X, y)
+        with open(tmp_path / f"trained_{name.lower()}.pkl", "wb") as f:
+            pickle.dump({"model": trained[name]}, f)
+
+    meta_X = _stack_probas([cv_results[name]["oof_proba"] for _, name in BASE_ESTIMATORS])
+    stacking = OOFStackingClassifier(base_models={name: trained[name] for _, name in BASE_ESTIMATORS},
+                                     final_estimator=LogisticRegression(max_iter=1000).fit(meta_X, y))
+    stale_thresholds = {"cand_threshold": 0.2, "conf_threshold": 0.5, "fp_threshold": 0.6}
+    with open(tmp_path / "stacking_model.pkl", "wb") as f:
+        pickle.dump({"trained_models": {"Stacking": stacking}, "cv_results": cv_results,
+                     "class_thresholds": stale_thresholds}, f)
+    save_training_state(str(tmp_path), "ensemble", X, le_target, DATASET_KEY)
+    return str(tmp_path), X, y, le_target
+
+
+def _append_rows(X, y, n_new, seed=1):
+    rng = np.random.default_rng(seed)
+    y_new = rng.integers(0, 3, size=n_new)
+    X_new = pd.DataFrame(rng.normal(size=(n_new, X.shape[1])) + y_new[:, None] * 0.8, columns=X.columns)
+    X_all = pd.concat([X, X_new], ignore_index=True)
+    new_mask = np.r_[np.zeros(len(X), dtype=bool), np.ones(n_new, dtype=bool)]
+    return X_all, np.r_[y, y_new], new_mask
+
+
+def _load(folder, name):
+    with open(os.path.join(folder, name), "rb") as f:
+        return pickle.load(f)
+
+
+def test_incremental_update_continues_ensemble(ensemble_session, monkeypatch):
+    folder, X, y, le_target = ensemble_session
+    # Replay fewer rows than the base set, so the update set differs from the full training set
+    replay = incremental.replay_positions
+    monkeypatch.setattr(incremental, "replay_positions", lambda y_enc, cand: replay(y_enc, cand, n_rows=30))
+    # The synthetic classes overlap too much for the CONFIRMED recall floor of the served search
+    monkeypatch.setitem(incremental.SERVED_THRESHOLD_SEARCH, "conf_min_recall", 0.5)
+    X_all, y_all, new_mask = _append_rows(X, y, n_new=6)
+    groups_all = np.arange(len(X_all)) // 2
+    before = _load(folder, "stacking_model.pkl")["trained_models"]["Stacking"]
+
+    assert incremental_update("ensemble", folder, X_all, y_all, le_target, new_mask, DATASET_KEY,
+                              groups=groups_all, cv=CachedFoldSplitter(n_splits=3, cache_dir=folder))
+
+    forest = _load(folder, "trained_randomforest.pkl")["model"]
+    assert forest.n_estimators == 10 + INCREMENTAL_ROUNDS
+    # Added trees are grown on the full set (bootstrap draws len(X_all) rows), not on the update set
+    assert all(tree.tree_.weighted_n_node_samples[0] == len(X_all) for tree in forest.estimators_[10:])
+
+    xgb = _load(folder, "trained_xgboost.pkl")["model"]
+    assert xgb.get_booster().num_boosted_rounds() == 20 + INCREMENTAL_ROUNDS
+
+    package = _load(folder, "stacking_model.pkl")
+    stacking = package["trained_models"]["Stacking"]
+    assert isinstance(stacking, OOFStackingClassifier)
+    assert not np.allclose(stacking.final_estimator.coef_, before.final_estimator.coef_)
+    assert stacking.predict(X_all).shape == (len(X_all),)
+
+    # Class thresholds re-tuned on the refitted meta-learner's OOF probabilities, not the stale ones kept
+    with open(os.path.join(folder, "threshold_configs.json")) as f:
+        retuned = json.load(f)
+    assert package["threshold_metrics"]["tuned"] == retuned["optimized"]
+    assert package.get("class_thresholds") in (None, retuned["optimized"])
+
+    state = load_training_state(folder)
+    assert state["n_updates"] == 1 and state["n_rows_incremental"] == 6
+
+
+def test_incremental_update_drops_stale_thresholds_without_cv(ensemble_session):
+    folder, X, y, le_target = ensemble_session
+    X_all, y_all, new_mask = _append_rows(X, y, n_new=6)
+
+    assert incremental_update("ensemble", folder, X_all, y_all, le_target, new_mask, DATASET_KEY)
+    assert "class_thresholds" not in _load(folder, "stacking_model.pkl")
+
+
+def test_incremental_update_asks_for_full_retrain_when_too_many_rows(ensemble_session):
+    folder, X, y, le_target = ensemble_session
+    X_all, y_all, new_mask = _append_rows(X, y, n_new=len(X) // 4)
+    mtime = os.path.getmtime(os.path.join(folder, "trained_randomforest.pkl"))
+
+    assert not incremental_update("ensemble", folder, X_all, y_all, le_target, new_mask, DATASET_KEY)
+    assert os.path.getmtime(os.path.join(folder, "trained_randomforest.pkl")) == mtime
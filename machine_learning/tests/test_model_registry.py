@@ -0,0 +1,47 @@
+import os
+import pickle
+
+from model_registry import ModelRegistry
+
+
+def _write(path, payload):
+    with open(path, "wb") as f:
+        pickle.dump(payload, f)
+    return os.path.getsize(path)
+
+
+def test_lru_eviction_and_hits(tmp_path):
+    paths = [str(tmp_path / f"m{i}.pkl") for i in range(3)]
+    sizes = [_write(p, {"model": i, "pad": b"x" * 1000}) for i, p in enumerate(paths)]
+    registry = ModelRegistry(max_bytes=sizes[0] + sizes[1])
+
+    first = registry.load(paths[0], verbose=False)
+    registry.load(paths[1], verbose=False)
+    assert registry.load(paths[0], verbose=False) is first  # hit, m0 becomes most recent
+    registry.load(paths[2], verbose=False)  # over budget: evicts m1, the least recently used
+
+    stats = registry.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 3, 1)
+    assert registry.load(paths[0], verbose=False) is first
+    assert registry.stats()["hits"] == 2
+    registry.load(paths[1], verbose=False)
+    assert registry.stats()["misses"] == 4
+
+
+def test_rewritten_package_is_reloaded(tmp_path):
+    path = str(tmp_path / "m.pkl")
+    _write(path, {"model": "old"})
+    registry = ModelRegistry(max_bytes=10 ** 6)
+    assert registry.load(path, verbose=False)["model"] == "old"
+
+    _write(path, {"model": "retrained"})
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+    assert registry.load(path, verbose=False)["model"] == "retrained"
+
+
+def test_package_over_budget_is_not_cached(tmp_path):
+    path = str(tmp_path / "big.pkl")
+    _write(path, {"pad": b"x" * 5000})
+    registry = ModelRegistry(max_bytes=100)
+    registry.load(path, verbose=False)
+    assert registry.stats()["entries"] == 0
@@ -0,0 +1,56 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier
+
+import app as ml_app
+from feature_extraction import create_advanced_features
+from preprocessing import KOIPreprocessor
+from row_prediction import MAX_PREDICT_ROWS, RowFeaturePlan, predict_rows
+
+
+@pytest.fixture
+def session(tmp_path, koi_rows):
+    """Session folder with a fitted preprocessor, features.json and a small model package."""
+    train, score = koi_rows.iloc[:200], koi_rows.iloc[200:]
+    preprocessor = KOIPreprocessor(drop_fpflags=True).fit(train)
+    preprocessor.save(str(tmp_path / "preprocessor.pkl"))
+    df_engineered = create_advanced_features(preprocessor.transform(train, verbose=False), verbose=False)
+    features = [c for c in df_engineered.columns if c != "koi_disposition"]
+    with open(tmp_path / "features.json", "w") as f:
+        json.dump(features, f)
+
+    le = LabelEncoder().fit(df_engineered["koi_disposition"])
+    model = DecisionTreeClassifier(max_depth=6, random_state=0).fit(
+        df_engineered[features], le.transform(df_engineered["koi_disposition"]))
+    with open(tmp_path / "model.pkl", "wb") as f:
+        pickle.dump({"model": model, "label_encoder": le, "model_type": "test"}, f)
+    return str(tmp_path) + "/", preprocessor, features, score
+
+
+def test_row_plan_matches_dataframe_path(session):
+    _, preprocessor, features, score = session
+    expected = create_advanced_features(preprocessor.transform(score, verbose=False), verbose=False)[features]
+
+    X = RowFeaturePlan(preprocessor, features).transform(score.to_dict("records"))
+    np.testing.assert_array_equal(X, expected.to_numpy(dtype=np.float64))
+
+
+def test_predict_rows_matches_predict(session):
+    folder, _, _, score = session
+    model_path = os.path.join(folder, "model.pkl")
+    expected = ml_app.predict(None, score, model_path, ctx=ml_app.default_context(folder))
+
+    result = predict_rows(score.to_dict("records"), model_path, folder)
+    assert result["decoded_predictions"] == list(expected["decoded_predictions"])
+
+
+def test_predict_rows_rejects_oversized_batches(session):
+    folder, _, _, score = session
+    records = score.to_dict("records")[:1] * (MAX_PREDICT_ROWS + 1)
+    with pytest.raises(ValueError):
+        predict_rows(records, os.path.join(folder, "model.pkl"), folder)
@@ -0,0 +1,38 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+# No catalog / model preloading when the server module is imported
+os.environ.setdefault("ML_PRELOAD", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import server
+
+SESSION = "test-session"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client with a 1 KB upload limit and the session folders under tmp_path."""
+    monkeypatch.setitem(server.app.config, "MAX_CONTENT_LENGTH", 1024)
+    monkeypatch.setattr(server.ml_app, "OUTPUT_FOLDER", str(tmp_path) + "/")
+    os.makedirs(tmp_path / SESSION)
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("route", ["/train", "/predict", "/validate-csv"])
+def test_oversized_upload_returns_413(client, route):
+    data = {"model_type": "ensemble", "file": (io.BytesIO(b"koi_period,koi_prad\n" + b"1.0,2.0\n" * 500), "big.csv")}
+    response = client.post(route, data=data, headers={"user-session-id": SESSION},
+                           content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert response.get_json()["status"] == "error"
+
+
+def test_oversized_json_rows_return_413(client):
+    body = json.dumps({"records": [{"koi_period": 1.0, "koi_prad": 2.0}] * 100})
+    response = client.post("/predict/rows", data=body, headers={"user-session-id": SESSION},
+                           content_type="application/json")
+    assert response.status_code == 413
@@ -0,0 +1,91 @@
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score, recall_score
+
+from threshold_optimization import apply_class_thresholds, optimize_class_thresholds, set_class_thresholds
+
+CAND_RANGE, CONF_RANGE, FP_RANGE = (0.20, 0.50, 0.02), (0.35, 0.70, 0.05), (0.50, 0.90, 0.05)
+
+
+LABELS = ["CANDIDATE", "CONFIRMED", "FALSE POSITIVE"]
+
+
+def _loop_search(y_true, y_proba, conf_min_recall, objective="candidate_recall", min_accuracy=None):
+    """Reference: the nested-loop search the broadcast grid replaced (first best combination wins)."""
+    best, best_score = None, -1.0
+    for cand_t in np.arange(*CAND_RANGE):
+        for conf_t in np.arange(*CONF_RANGE):
+            for fp_t in np.arange(*FP_RANGE):
+                pred = apply_class_thresholds(y_proba, {"cand_threshold": cand_t, "conf_threshold": conf_t,
+                                                        "fp_threshold": fp_t})
+                recalls = recall_score(y_true, pred, labels=[0, 1, 2], average=None, zero_division=0)
+                if objective == "candidate_recall":
+                    score = recalls[0]
+                else:
+                    score = f1_score(y_true, pred, labels=[0, 1, 2], average="macro", zero_division=0)
+                if min_accuracy is not None and accuracy_score(y_true, pred) < min_accuracy:
+                    continue
+                if recalls[1] > conf_min_recall and score > best_score + 1e-12:
+                    best, best_score = (cand_t, conf_t, fp_t), score
+    return best, best_score
+
+
+def _random_proba(seed=3, n=400):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 3, size=n)
+    logits = rng.normal(size=(n, 3)) + np.eye(3)[y_true] * 1.5
+    return y_true, np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+
+
+def test_grid_search_matches_loop_search(tmp_path):
+    y_true, y_proba = _random_proba()
+
+    (cand_t, conf_t, fp_t), cand_recall = _loop_search(y_true, y_proba, conf_min_recall=0.6)
+    configs = optimize_class_thresholds(y_true, y_proba, LABELS, conf_min_recall=0.6, cand_range=CAND_RANGE, conf_range=CONF_RANGE,
+                                        fp_range=FP_RANGE, save_path=str(tmp_path / "thresholds.json"))
+    optimized = configs["optimized"]
+    assert (optimized["cand_threshold"], optimized["conf_threshold"], optimized["fp_threshold"]) == \
+           (cand_t, conf_t, fp_t)
+    assert np.isclose(optimized["candidate_recall"], cand_recall)
+
+
+def test_no_feasible_configuration_returns_empty(tmp_path):
+    y_true = np.array([0, 1, 2, 1])
+    y_proba = np.tile([0.9, 0.05, 0.05], (4, 1))
+    assert optimize_class_thresholds(y_true, y_proba, LABELS, conf_min_recall=0.8, save_path=str(tmp_path / "t.json")) == {}
+
+
+def test_macro_f1_search_with_accuracy_bound_matches_loop_search(tmp_path):
+    y_true, y_proba = _random_proba(seed=5)
+    argmax_accuracy = accuracy_score(y_true, y_proba.argmax(axis=1))
+
+    expected, macro_f1 = _loop_search(y_true, y_proba, conf_min_recall=0.5, objective="macro_f1",
+                                      min_accuracy=argmax_accuracy - 0.01)
+    optimized = optimize_class_thresholds(y_true, y_proba, LABELS, conf_min_recall=0.5, cand_range=CAND_RANGE,
+                                          conf_range=CONF_RANGE, fp_range=FP_RANGE, objective="macro_f1",
+                                          max_accuracy_drop=0.01,
+                                          save_path=str(tmp_path / "thresholds.json"))["optimized"]
+    assert (optimized["cand_threshold"], optimized["conf_threshold"], optimized["fp_threshold"]) == expected
+    assert np.isclose(optimized["macro_f1"], macro_f1)
+    assert optimized["accuracy"] >= argmax_accuracy - 0.01
+
+
+def _configs(cand_t=0.3, on_grid_edge=False, macro_f1=0.75, accuracy=0.78):
+    return {
+        "default": {"mode": "argmax", "macro_f1": 0.74, "accuracy": 0.785},
+        "optimized": {"cand_threshold": cand_t, "conf_threshold": 0.5, "fp_threshold": 0.6, "objective": "macro_f1",
+                      "max_accuracy_drop": 0.01, "on_grid_edge": on_grid_edge, "macro_f1": macro_f1,
+                      "accuracy": accuracy}
+    }
+
+
+def test_set_class_thresholds_attaches_only_improvements():
+    package = {"class_thresholds": {"cand_threshold": 0.2, "conf_threshold": 0.5, "fp_threshold": 0.6}}
+    assert set_class_thresholds(package, _configs())
+    assert package["class_thresholds"]["cand_threshold"] == 0.3
+    assert package["threshold_metrics"]["argmax"]["macro_f1"] == 0.74
+
+    # Grid edge, no objective gain, too much accuracy lost, nothing found: argmax, stale thresholds removed
+    for configs in (_configs(on_grid_edge=True), _configs(macro_f1=0.74), _configs(accuracy=0.77), {}):
+        assert not set_class_thresholds(package, configs)
+        assert "class_thresholds" not in package
+        assert package["threshold_metrics"]["applied"] is False
@@ -0,0 +1,22 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict, cross_validate
+
+from data_splitting import CachedFoldSplitter
+from training_binary import _cross_validate_single_pass
+
+
+def test_single_pass_cv_matches_cross_validate(synthetic_data):
+    X, y, groups = synthetic_data
+    y_bin = (y == 1).astype(int)
+    cv = CachedFoldSplitter(n_splits=4, random_state=42)
+    model = LogisticRegression(max_iter=1000)
+
+    scores, oof_pred, oof_proba, _ = _cross_validate_single_pass(model, X, y_bin, groups, cv, train_diagnostics="full")
+    expected = cross_validate(model, X, y_bin, groups=groups, cv=cv, return_train_score=True,
+                              scoring=["accuracy", "precision", "recall", "f1"])
+    for key, values in scores.items():
+        np.testing.assert_allclose(values, expected[key])
+    np.testing.assert_allclose(oof_proba, cross_val_predict(model, X, y_bin, groups=groups, cv=cv,
+                                                            method="predict_proba"))
+    np.testing.assert_array_equal(oof_pred, cross_val_predict(model, X, y_bin, groups=groups, cv=cv))
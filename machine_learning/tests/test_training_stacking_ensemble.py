@@ -0,0 +1,34 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict
+from sklearn.tree import DecisionTreeClassifier
+
+from data_splitting import CachedFoldSplitter
+from training_stacking_ensemble import BASE_ESTIMATORS, _stack_probas, _train_oof_stacking
+
+
+def test_oof_stacking_trains_meta_learner_on_cached_oof(synthetic_data):
+    X, y, groups = synthetic_data
+    cv = CachedFoldSplitter(n_splits=4, random_state=42)
+    base = {"XGBoost": DecisionTreeClassifier(max_depth=3, random_state=0),
+            "LightGBM": DecisionTreeClassifier(max_depth=5, random_state=1),
+            "CatBoost": LogisticRegression(max_iter=1000),
+            "RandomForest": RandomForestClassifier(n_estimators=10, random_state=0)}
+    cv_results = {name: {"oof_proba": cross_val_predict(m, X, y, groups=groups, cv=cv, method="predict_proba")}
+                  for name, m in base.items()}
+    trained = {name: m.fit(X, y) for name, m in base.items()}
+
+    results, stacking = _train_oof_stacking(y, groups, cv, cv_results, trained, LogisticRegression(max_iter=1000),
+                                            train_diagnostics="off", refit_strategy="refit")
+
+    meta_X = _stack_probas([cv_results[name]["oof_proba"] for _, name in BASE_ESTIMATORS])
+    # Every stacking OOF row is scored by a meta-learner fitted on the other folds only
+    np.testing.assert_allclose(results["oof_proba"], cross_val_predict(LogisticRegression(max_iter=1000), meta_X, y,
+                                                                       groups=groups, cv=cv, method="predict_proba"))
+    # Final meta-learner: all OOF rows; base models: the already-fitted ones, not retrained
+    np.testing.assert_allclose(stacking.final_estimator.coef_,
+                               LogisticRegression(max_iter=1000).fit(meta_X, y).coef_)
+    assert all(stacking.base_models[name] is trained[name] for _, name in BASE_ESTIMATORS)
+    base_proba = _stack_probas([trained[name].predict_proba(X) for _, name in BASE_ESTIMATORS])
+    np.testing.assert_allclose(stacking.predict_proba(X), stacking.final_estimator.predict_proba(base_proba))